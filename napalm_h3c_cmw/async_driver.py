@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+asyncio driver for H3C cmw.
+
+AsyncCMWDriver exposes the getters of CMWDriver as coroutines over an asyncssh session, so
+thousands of devices can be polled from one event loop. Output is parsed by the same
+functions as CMWDriver (napalm_h3c_cmw.parsers). Pass an executor as
+optional_args['parse_executor'] to run that CPU-bound parsing off the event loop; the
+iter_* generators parse each line on the loop as it is read, whatever the executor.
+
+Sample usage:
+    async def poll(hostname):
+        async with AsyncCMWDriver(hostname, 'admin', 'admin') as device:
+            return await device.get_interfaces_counters()
+
+    async def poll_all(hosts):
+        return await asyncio.gather(*map(poll, hosts))
+
+    results = asyncio.run(poll_all(hosts))
+"""
+
+import asyncio
+import re
+
+from napalm.base.exceptions import ConnectionException, CommandErrorException
+from napalm_h3c_cmw import parsers
+from napalm_h3c_cmw.h3c_cmw import FACTS_COMMANDS
+
+try:
+    import asyncssh
+except ImportError:
+    asyncssh = None
+
+# Bytes requested from the SSH channel per read
+READ_SIZE = 65536
+
+_RE_ANY_PROMPT = re.compile(r"[>\]]\s*$")
+
+
+def _parse_interfaces(output):
+    return parsers.parse_interfaces(parsers.separate_sections(parsers.INTERFACE_SEPARATOR, output))
+
+
+def _parse_interfaces_counters(output):
+    return parsers.parse_interfaces_counters(parsers.separate_sections(parsers.INTERFACE_SEPARATOR, output))
+
+
+def _parse_interfaces_ip(output_v4, output_v6):
+    return parsers.parse_interfaces_ip(parsers.separate_sections(parsers.INTERFACE_SEPARATOR, output_v4),
+                                       parsers.separate_sections(parsers.IPV6_INTERFACE_SEPARATOR, output_v6))
+
+
+class AsyncCMWDriver(object):
+    """asyncio driver for H3C cmw, the getters of CMWDriver as coroutines."""
+
+    def __init__(self, hostname, username, password, timeout=60, optional_args=None):
+        """
+        Constructor.
+
+        optional_args: 'port', 'key_file', 'use_keys', 'known_hosts', passed to asyncssh (host
+        keys are not checked when None, like CMWDriver), and 'parse_executor', a
+        concurrent.futures executor used for parsing (parsing runs on the event loop when None).
+        """
+        if optional_args is None:
+            optional_args = {}
+        self.hostname = hostname
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.port = optional_args.get('port', 22)
+        self.key_file = optional_args.get('key_file')
+        self.use_keys = optional_args.get('use_keys', False)
+        self.known_hosts = optional_args.get('known_hosts')
+        self.parse_executor = optional_args.get('parse_executor')
+
+        self.base_prompt = None
+        self._conn = None
+        self._process = None
+        self._prompt = None
+        self._lock = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def open(self):
+        """Open the SSH session, find the prompt and disable paging."""
+        if asyncssh is None:
+            raise ConnectionException('AsyncCMWDriver requires asyncssh, install napalm-h3c-cmw[async]')
+
+        client_keys = None
+        if self.use_keys or self.key_file:
+            client_keys = [self.key_file] if self.key_file else ()
+        try:
+            self._conn = await asyncio.wait_for(
+                asyncssh.connect(self.hostname, port=self.port, username=self.username,
+                                 password=self.password, client_keys=client_keys, known_hosts=self.known_hosts),
+                self.timeout)
+            self._process = await self._conn.create_process(term_type='vt100')
+            self._lock = asyncio.Lock()
+            self._process.stdin.write('\n')
+            output = await self._read_until(_RE_ANY_PROMPT)
+            # <hostname> or [hostname]
+            self.base_prompt = output.strip().splitlines()[-1].strip()[1:-1]
+            self._prompt = parsers.prompt_pattern(self.base_prompt)
+            await self.send_command('screen-length disable')
+        except (OSError, asyncio.TimeoutError, asyncssh.Error, CommandErrorException) as e:
+            connected = self._process is not None
+            await self.close()
+            if connected:
+                raise ConnectionException('No prompt from {}: {}'.format(self.hostname, e))
+            raise ConnectionException('Cannot connect to {}: {}'.format(self.hostname, e))
+        except BaseException:
+            # ConnectionException at EOF, cancellation: the connection is not left open either
+            await self.close()
+            raise
+
+    async def close(self):
+        """Close the SSH session."""
+        if self._conn is not None:
+            self._conn.close()
+            await self._conn.wait_closed()
+        self._conn = None
+        self._process = None
+
+    def is_alive(self):
+        """Returns a flag with the state of the connection."""
+        return {'is_alive': self._process is not None and not self._process.stdout.at_eof()}
+
+    async def _read_chunk(self):
+        chunk = await asyncio.wait_for(self._process.stdout.read(READ_SIZE), self.timeout)
+        if not chunk:
+            raise ConnectionException('Connection to {} closed'.format(self.hostname))
+        return chunk
+
+    async def _read_until(self, pattern):
+        output = ''
+        while not pattern.search(output):
+            output += await self._read_chunk()
+            if '---- More ----' in output:
+                output = parsers.MORE_PROMPT.sub('', output)
+                self._process.stdin.write(' ')
+        return output
+
+    async def iter_command_lines(self, command):
+        """
+        Send command and yield its output line by line as it is read from the channel.
+
+        Commands of one session are serialized, the echo of the command and the trailing
+        prompt are left out. The session stays locked until the generator is exhausted or
+        closed: a consumer stopping early should await its aclose(), which reads the rest of
+        the output.
+        """
+        async with self._lock:
+            if self._process is None:
+                raise ConnectionException('Session to {} is closed'.format(self.hostname))
+            self._process.stdin.write(command + '\n')
+            finished = False
+            echo = True
+            pending = ''
+            try:
+                while not finished:
+                    try:
+                        pending += await self._read_chunk()
+                    except asyncio.TimeoutError:
+                        # the rest of the output may still come, the next command would read it as its own
+                        await self.close()
+                        msg = "Timed out reading the output of '{}', session closed".format(command)
+                        raise CommandErrorException(msg)
+                    if '---- More ----' in pending:
+                        pending = parsers.MORE_PROMPT.sub('', pending)
+                        self._process.stdin.write(' ')
+                    lines = pending.split('\n')
+                    pending = lines.pop()
+                    finished = self._prompt.search(pending) is not None
+                    for line in lines:
+                        line = line.rstrip('\r')
+                        if echo:
+                            echo = False
+                            if command in line:
+                                continue
+                        yield line
+            except GeneratorExit:
+                if not finished:
+                    # the consumer stopped early, do not leave the rest of the output in the channel
+                    await self._read_until(self._prompt)
+                raise
+
+    async def send_command(self, command):
+        """Send command and return its output."""
+        lines = []
+        async for line in self.iter_command_lines(command):
+            lines.append(line)
+        return '\n'.join(lines)
+
+    async def _parse(self, func, *args):
+        """Run a parser, in parse_executor when one is set."""
+        if self.parse_executor is None:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.parse_executor, func, *args)
+
+    async def cli(self, commands):
+        """Execute a list of commands and return the output in a dictionary format using the command."""
+        if type(commands) is not list:
+            raise TypeError("Please enter a valid list of commands!")
+        cli_output = dict()
+        for command in commands:
+            cli_output[command] = await self.send_command(command)
+        return cli_output
+
+    async def get_facts(self):
+        """Return a set of facts from the devices."""
+        outputs = []
+        for command in FACTS_COMMANDS:
+            outputs.append(await self.send_command(command))
+        return await self._parse(parsers.parse_facts, *outputs)
+
+    async def get_config(self, retrieve="all", full=False):
+        """Get config from device, only the running configuration is supported."""
+        config = {
+            'startup': '',
+            'running': '',
+            'candidate': ''
+        }
+        if retrieve.lower() in ('running', 'all'):
+            config['running'] = await self.send_command('display current-configuration')
+        return config
+
+    async def get_interfaces(self):
+        """Get interface details (last_flapped is not implemented)."""
+        output = await self.send_command('display interface')
+        return await self._parse(_parse_interfaces, output)
+
+    async def get_interfaces_counters(self):
+        """Return interfaces counters."""
+        output = await self.send_command('display interface')
+        return await self._parse(_parse_interfaces_counters, output)
+
+    async def get_interfaces_ip(self):
+        """Get interface IP details."""
+        output_v4 = await self.send_command('display ip interface')
+        output_v6 = await self.send_command('display ipv6 interface')
+        return await self._parse(_parse_interfaces_ip, output_v4, output_v6)
+
+    async def get_lldp_neighbors(self):
+        """Return LLDP neighbors brief info."""
+        output = await self.send_command('display lldp neighbor-information list')
+        return await self._parse(parsers.parse_lldp_neighbors, output)
+
+    async def iter_arp_table(self, vrf=""):
+        """
+        Yield the entries of get_arp_table() while the output is read, see iter_command_lines().
+
+        Lines are parsed on the event loop, parse_executor is not used.
+        """
+        lines = self.iter_command_lines('display arp')
+        try:
+            async for line in lines:
+                entry = parsers.parse_arp_line(line)
+                if entry is not None:
+                    yield entry
+        finally:
+            # closing this generator closes the one holding the session lock
+            await lines.aclose()
+
+    async def get_arp_table(self, vrf=""):
+        """Get arp table information."""
+        output = await self.send_command('display arp')
+        return await self._parse(parsers.parse_arp_table, output)
+
+    async def iter_mac_address_table(self):
+        """
+        Yield the entries of get_mac_address_table() while the output is read, see iter_command_lines().
+
+        Lines are parsed on the event loop, parse_executor is not used.
+        """
+        lines = self.iter_command_lines('display mac-address')
+        try:
+            async for line in lines:
+                entry = parsers.parse_mac_address_line(line)
+                if entry is not None:
+                    yield entry
+        finally:
+            await lines.aclose()
+
+    async def get_mac_address_table(self):
+        """Return the MAC address table."""
+        output = await self.send_command('display mac-address')
+        return await self._parse(parsers.parse_mac_address_table, output)
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Hierarchical view of CMW configurations.
+
+parse_config() turns a configuration into a tree following its indentation: every line is
+a node, and the lines indented below it are its children, kept in a dictionary keyed by
+the stripped line. Looking a line up in its section is a hash lookup, so merge_diff()
+compares a candidate with the running configuration in time linear in their sizes.
+
+CMWConfig indexes the sections of a whole configuration by their offsets in the text and
+parses each kind of section the first time it is asked for.
+
+Sample usage:
+    running = parse_config(device.get_config(retrieve='running')['running'])
+    print('\\n'.join(merge_diff(running, parse_config(candidate))))
+
+    config = CMWConfig(device.get_config(retrieve='running')['running'])
+    print(config.sysname, list(config.interfaces), config.ntp_servers)
+"""
+
+from collections import OrderedDict
+
+from napalm.base.utils import py23_compat
+
+
+def _is_skipped(stripped):
+    """Separators, comments and the end marker carry no configuration."""
+    return not stripped or stripped[0] in '#!' or stripped == 'return'
+
+
+class ConfigNode(object):
+    """One configuration line and the section below it."""
+
+    __slots__ = ('line', 'children')
+
+    def __init__(self, line):
+        self.line = line
+        # created on the first child, most lines have none
+        self.children = None
+
+    def add(self, line):
+        """Return the child for line, added at the end of the section if missing."""
+        if self.children is None:
+            self.children = OrderedDict()
+        child = self.children.get(line)
+        if child is None:
+            child = self.children[line] = ConfigNode(line)
+        return child
+
+    def get(self, line):
+        """Return the child for line, or None."""
+        if self.children is None:
+            return None
+        return self.children.get(line)
+
+    def __contains__(self, line):
+        return self.children is not None and line in self.children
+
+    def __iter__(self):
+        if self.children is not None:
+            for child in self.children.values():
+                yield child
+
+    def __len__(self):
+        return 0 if self.children is None else len(self.children)
+
+    def find(self, *path):
+        """Return the node at path, lines from this section down, or None."""
+        node = self
+        for line in path:
+            node = node.get(line)
+            if node is None:
+                return None
+        return node
+
+    def lines(self, depth=0):
+        """Yield the lines of the section below this node, indented one space per level."""
+        for child in self:
+            yield ' ' * depth + child.line
+            for line in child.lines(depth + 1):
+                yield line
+
+
+def parse_config(text):
+    """Return the root ConfigNode of the configuration in text."""
+    root = ConfigNode(None)
+    # (indentation, node) of the sections the current line may belong to
+    stack = [(-1, root)]
+    for line in text.splitlines():
+        stripped = line.strip()
+        if line[:1] == '#':
+            # the end of a top-level section, global commands follow indented by one space
+            del stack[1:]
+        if _is_skipped(stripped):
+            continue
+        indent = len(line) - len(line.lstrip())
+        while stack[-1][0] >= indent:
+            stack.pop()
+        node = stack[-1][1].add(stripped)
+        stack.append((indent, node))
+    return root
+
+
+def merge_diff(running, candidate):
+    """
+    Return the lines of candidate missing from running, both ConfigNode trees.
+
+    A missing line comes with the section lines above it, so the result can be applied as
+    is; a missing section comes with all its lines.
+    """
+    diff = []
+    _merge_diff(running, candidate, [], diff)
+    return diff
+
+
+def _merge_diff(running, candidate, context, diff):
+    for node in candidate:
+        existing = running.get(node.line)
+        if existing is not None:
+            if node.children:
+                context.append(node.line)
+                _merge_diff(existing, node, context, diff)
+                context.pop()
+            continue
+        # the sections above this line were not written yet for a previous line
+        depth = len(context)
+        for index, line in enumerate(context):
+            if line is not None:
+                diff.append(' ' * index + line)
+                context[index] = None
+        diff.append(' ' * depth + node.line)
+        diff.extend(node.lines(depth + 1))
+
+
+class CMWConfig(object):
+    """
+    A running configuration, its sections indexed by offset and parsed on first access.
+
+    Sections start with a line at column 0 ('interface ...', 'vlan ...', 'bgp ...') and are
+    indexed by their first word. Global commands, indented by one space between '#'
+    separators ('sysname', 'ntp-service', 'snmp-agent'), are indexed by their first word too.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        # first word -> [(start, end)] of the sections and of the global lines
+        self._sections = None
+        self._globals = None
+        self._parsed = {}
+        self._tree = None
+
+    @property
+    def tree(self):
+        """The whole configuration as a ConfigNode tree, see parse_config()."""
+        if self._tree is None:
+            self._tree = parse_config(self.text)
+        return self._tree
+
+    def _index(self):
+        if self._sections is not None:
+            return
+        sections = {}
+        global_lines = {}
+        current = None
+        offset = 0
+        for line in self.text.splitlines(True):
+            end = offset + len(line)
+            first = line[:1]
+            if first == '#' or line.rstrip() == 'return':
+                if current is not None:
+                    sections.setdefault(current[0], []).append((current[1], offset))
+                    current = None
+            elif first and not first.isspace():
+                if current is not None:
+                    sections.setdefault(current[0], []).append((current[1], offset))
+                current = (line.split(None, 1)[0], offset)
+            elif current is None:
+                words = line.split(None, 1)
+                if words:
+                    global_lines.setdefault(words[0], []).append((offset, end))
+            offset = end
+        if current is not None:
+            sections.setdefault(current[0], []).append((current[1], offset))
+        self._sections = sections
+        self._globals = global_lines
+
+    def sections(self, kind):
+        """Return the ConfigNode of each section whose first word is kind, e.g. 'interface'."""
+        if kind not in self._parsed:
+            self._index()
+            nodes = []
+            for start, end in self._sections.get(kind, ()):
+                nodes.extend(parse_config(self.text[start:end]))
+            self._parsed[kind] = nodes
+        return self._parsed[kind]
+
+    def global_lines(self, keyword):
+        """Return the global commands starting with keyword, stripped."""
+        self._index()
+        return [self.text[start:end].strip() for start, end in self._globals.get(keyword, ())]
+
+    def _named_sections(self, kind):
+        key = ('named', kind)
+        if key not in self._parsed:
+            self._parsed[key] = OrderedDict(
+                (node.line.split(None, 1)[1] if ' ' in node.line else '', node) for node in self.sections(kind))
+        return self._parsed[key]
+
+    @property
+    def sysname(self):
+        """The sysname of the device, '' when not configured."""
+        for line in self.global_lines('sysname'):
+            return line.split(None, 1)[1] if ' ' in line else ''
+        return ''
+
+    @property
+    def interfaces(self):
+        """Interface sections by interface name."""
+        return self._named_sections('interface')
+
+    @property
+    def vlans(self):
+        """VLAN sections by the text after 'vlan', e.g. '10'."""
+        return self._named_sections('vlan')
+
+    @property
+    def acls(self):
+        """ACL sections by the text after 'acl', e.g. 'advanced 3000'."""
+        return self._named_sections('acl')
+
+    @property
+    def bgp(self):
+        """The BGP section, None when BGP is not configured."""
+        sections = self.sections('bgp')
+        return sections[0] if sections else None
+
+    def _ntp_addresses(self, command):
+        addresses = []
+        for line in self.global_lines('ntp-service'):
+            words = line.split()
+            if len(words) > 2 and words[1] == command:
+                addresses.append(words[2])
+        return addresses
+
+    @property
+    def ntp_servers(self):
+        """Addresses of the 'ntp-service unicast-server' commands."""
+        return self._ntp_addresses('unicast-server')
+
+    @property
+    def ntp_peers(self):
+        """Addresses of the 'ntp-service unicast-peer' commands."""
+        return self._ntp_addresses('unicast-peer')
+
+    def snmp_information(self):
+        """Return the 'snmp-agent' commands in the get_snmp_information() schema."""
+        snmp_information = {
+            'contact': py23_compat.text_type(''),
+            'location': py23_compat.text_type(''),
+            'community': {},
+            'chassis_id': py23_compat.text_type('')
+        }
+        for line in self.global_lines('snmp-agent'):
+            words = line.split()
+            if words[1:3] == ['sys-info', 'contact'] and len(words) > 3:
+                snmp_information['contact'] = py23_compat.text_type(' '.join(words[3:]))
+            elif words[1:3] == ['sys-info', 'location'] and len(words) > 3:
+                snmp_information['location'] = py23_compat.text_type(' '.join(words[3:]))
+            elif words[1:2] == ['community'] and len(words) > 3:
+                # snmp-agent community {read|write} [simple|cipher] name [mib-view view] [acl number]
+                mode = 'rw' if words[2] == 'write' else 'ro'
+                options = words[3:]
+                if options[0] in ('simple', 'cipher') and len(options) > 1:
+                    options = options[1:]
+                acl = 'N/A'
+                if 'acl' in options[1:] and options.index('acl', 1) + 1 < len(options):
+                    acl = options[options.index('acl', 1) + 1]
+                snmp_information['community'][py23_compat.text_type(options[0])] = {
+                    'acl': py23_compat.text_type(acl),
+                    'mode': py23_compat.text_type(mode),
+                }
+        return snmp_information
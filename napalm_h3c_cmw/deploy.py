@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Push a configuration change to many CMW devices in two phases.
+
+Stage: every device is opened, the candidate loaded and compared with the running
+configuration, all in parallel. Commit: the devices with a diff are committed in a wave
+of at most commit_workers at a time. Once more devices failed than failure_budget allows,
+no further commit is started and the devices already committed are rolled back. A device
+whose commit failed is rolled back to its checkpoint in any case, its lines may be partly
+applied. Replace candidates stay on the flash of the devices, where the transfer index finds
+them on the next run.
+
+Sample usage:
+    deployment = StagedDeployment(username='admin', password='admin', commit_workers=8, failure_budget=2)
+    result = deployment.run({'10.0.0.1': 'ntp-service unicast-server 10.0.0.100',
+                             '10.0.0.2': 'ntp-service unicast-server 10.0.0.100'})
+    for change in result.devices.values():
+        print(change.hostname, change.status, change.error or '')
+"""
+
+from collections import Counter, namedtuple, OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import time
+
+from napalm_h3c_cmw.fleet import device_params
+from napalm_h3c_cmw.h3c_cmw import CMWDriver
+
+# DeviceChange.status values
+STAGE_FAILED = 'stage_failed'
+UNCHANGED = 'unchanged'
+NOT_COMMITTED = 'not_committed'
+COMMITTED = 'committed'
+COMMIT_FAILED = 'commit_failed'
+ROLLED_BACK = 'rolled_back'
+ROLLBACK_FAILED = 'rollback_failed'
+
+DeviceChange = namedtuple('DeviceChange', ['hostname', 'status', 'diff', 'error', 'elapsed'])
+DeviceChange.__doc__ = """
+Outcome of one device.
+
+status is one of the constants of this module, diff the output of compare_config() after
+staging, error the exception of the failed step, and elapsed the seconds from the start
+of the deployment to the end of the last step on the device. A device whose commit failed
+stays COMMIT_FAILED once rolled back, and becomes ROLLBACK_FAILED if that fails too, its
+error then the pair (commit exception, rollback exception).
+"""
+
+DeploymentResult = namedtuple('DeploymentResult', ['devices', 'aborted', 'failures'])
+DeploymentResult.__doc__ = """
+Outcome of a deployment.
+
+devices maps each hostname to its DeviceChange, in the order given. aborted is True when
+the failure budget was exceeded, failures the number of devices that failed to stage or
+to commit.
+"""
+
+
+class StagedDeployment(object):
+    """Stage a change on every target in parallel, then commit it in a bounded wave."""
+
+    def __init__(self, username=None, password=None, optional_args=None, stage_workers=64, commit_workers=8,
+                 failure_budget=0, timeout=120, driver=CMWDriver):
+        """
+        :param username, password, optional_args: defaults for targets lacking them
+        :param stage_workers: maximum number of devices staged at the same time
+        :param commit_workers: maximum number of devices committed at the same time
+        :param failure_budget: devices allowed to fail, or a fraction of the targets when below 1
+        :param timeout: driver timeout
+        :param driver: driver class, CMWDriver or a subclass
+        """
+        self.username = username
+        self.password = password
+        self.optional_args = optional_args or {}
+        self.stage_workers = stage_workers
+        self.commit_workers = commit_workers
+        self.failure_budget = failure_budget
+        self.timeout = timeout
+        self.driver = driver
+
+    def run(self, changes, replace=False):
+        """
+        Deploy changes and return a DeploymentResult.
+
+        changes maps targets to their candidate configuration, or is a list of (target,
+        configuration) pairs. Targets are hostnames or dictionaries as in FleetRunner. The
+        candidate replaces the running configuration when replace is True, it is merged
+        otherwise. Each hostname may be given once only.
+        """
+        if isinstance(changes, dict):
+            changes = list(changes.items())
+        targets = [(device_params(device, self.username, self.password, self.timeout, self.optional_args), config)
+                   for device, config in changes]
+        duplicates = [hostname for hostname, count in Counter(params['hostname'] for params, _ in targets).items()
+                      if count > 1]
+        if duplicates:
+            raise ValueError('targets given more than once: {}'.format(', '.join(sorted(duplicates))))
+        budget = self.failure_budget
+        if 0 < budget < 1:
+            budget = int(budget * len(targets))
+
+        devices = OrderedDict((params['hostname'], None) for params, _ in targets)
+        start = dict((hostname, time.time()) for hostname in devices)
+        drivers = {}
+        try:
+            staged = self._stage(targets, replace, devices, drivers, start)
+            failures = sum(1 for change in devices.values() if change.status == STAGE_FAILED)
+            aborted = failures > budget
+            if not aborted:
+                committed, failures = self._commit(staged, devices, drivers, start, budget, failures)
+                aborted = failures > budget
+                failed = [hostname for hostname in staged if devices[hostname].status == COMMIT_FAILED]
+                self._rollback((committed if aborted else []) + failed, devices, drivers, start)
+        finally:
+            self._close(drivers)
+        return DeploymentResult(devices, aborted, failures)
+
+    def _stage(self, targets, replace, devices, drivers, start):
+        """Open, load and compare every target, return the hostnames with a diff to commit."""
+        staged = []
+        with ThreadPoolExecutor(max_workers=self.stage_workers) as executor:
+            futures = dict((executor.submit(self._stage_device, params, config, replace), params['hostname'])
+                           for params, config in targets)
+            for future in futures:
+                hostname = futures[future]
+                try:
+                    driver, diff = future.result()
+                except Exception as e:
+                    devices[hostname] = DeviceChange(hostname, STAGE_FAILED, '', e, time.time() - start[hostname])
+                    continue
+                if diff.strip():
+                    status = NOT_COMMITTED
+                    drivers[hostname] = driver
+                    staged.append(hostname)
+                else:
+                    status = UNCHANGED
+                    self._close({hostname: driver})
+                devices[hostname] = DeviceChange(hostname, status, diff, None, time.time() - start[hostname])
+        return staged
+
+    def _stage_device(self, params, config, replace):
+        driver = self.driver(params['hostname'], params['username'], params['password'],
+                             timeout=params['timeout'], optional_args=params['optional_args'])
+        try:
+            # a session half set up by a failed open() is closed too
+            driver.open()
+            if replace:
+                driver.load_replace_candidate(config=config)
+            else:
+                driver.load_merge_candidate(config=config)
+            diff = driver.compare_config()
+        except Exception:
+            self._close({params['hostname']: driver})
+            raise
+        return driver, diff
+
+    def _commit(self, staged, devices, drivers, start, budget, failures):
+        """Commit staged devices, commit_workers at a time, until failures exceed budget."""
+        committed = []
+        queue = list(staged)
+        with ThreadPoolExecutor(max_workers=self.commit_workers) as executor:
+            pending = {}
+            while queue or pending:
+                while queue and len(pending) < self.commit_workers and failures <= budget:
+                    hostname = queue.pop(0)
+                    pending[executor.submit(drivers[hostname].commit_config)] = hostname
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    hostname = pending.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        status = COMMITTED
+                        committed.append(hostname)
+                    else:
+                        status = COMMIT_FAILED
+                        failures += 1
+                    devices[hostname] = devices[hostname]._replace(
+                        status=status, error=error, elapsed=time.time() - start[hostname])
+        return committed, failures
+
+    def _rollback(self, hostnames, devices, drivers, start):
+        """Roll devices back to their checkpoint, commit_workers at a time."""
+        with ThreadPoolExecutor(max_workers=self.commit_workers) as executor:
+            futures = dict((executor.submit(drivers[hostname].rollback), hostname) for hostname in hostnames)
+            for future in futures:
+                hostname = futures[future]
+                error = future.exception()
+                change = devices[hostname]
+                if error is not None:
+                    # the commit error of a failed device is kept along with that of its rollback
+                    change = change._replace(status=ROLLBACK_FAILED,
+                                             error=error if change.error is None else (change.error, error))
+                elif change.status == COMMITTED:
+                    change = change._replace(status=ROLLED_BACK)
+                devices[hostname] = change._replace(elapsed=time.time() - start[hostname])
+
+    def _close(self, drivers):
+        for hostname in list(drivers):
+            driver = drivers.pop(hostname)
+            try:
+                # discarding a replace candidate deletes a file on the device, it is left there
+                if driver.loaded and not driver.replace:
+                    driver.discard_config()
+                driver.close()
+            except Exception:
+                pass
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Run getters over a fleet of CMW devices concurrently.
+
+Sample usage:
+    runner = FleetRunner(username='admin', password='admin', max_workers=64, timeout=120)
+    for result in runner.run(['10.0.0.1', {'hostname': '10.0.0.2', 'optional_args': {'port': 2222}}],
+                             ['get_facts', 'get_interfaces_counters']):
+        print(result.hostname, result.elapsed, result.error or result.results)
+"""
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import heapq
+import itertools
+import socket
+import threading
+import time
+
+from napalm.base.exceptions import ConnectionException
+import paramiko
+
+from napalm_h3c_cmw.h3c_cmw import CMWDriver
+
+# Errors of open() worth a new connection attempt, authentication failures excepted
+RETRY_ERRORS = (ConnectionException, ConnectionError, socket.timeout, EOFError, paramiko.SSHException)
+# Errors of a getter meaning the session is lost, the remaining getters are not run
+SESSION_ERRORS = (ConnectionError, socket.timeout, EOFError, paramiko.SSHException)
+
+DeviceResult = namedtuple('DeviceResult', ['hostname', 'results', 'errors', 'error', 'elapsed', 'attempts'])
+DeviceResult.__doc__ = """
+Outcome of one device.
+
+results maps each getter that succeeded to its return value and errors each getter that
+raised to the exception. error is the exception that failed the whole device (connection
+after the last attempt, lost session, timeout), or None. elapsed is the wall time in seconds
+spent on the device, retries and backoff included.
+"""
+
+
+def device_params(device, username, password, timeout, optional_args):
+    """Return the driver arguments of an inventory entry, filling what it lacks with the defaults given."""
+    if not isinstance(device, dict):
+        device = {'hostname': device}
+    merged_args = dict(optional_args)
+    merged_args.update(device.get('optional_args') or {})
+    return {
+        'hostname': device['hostname'],
+        'username': device.get('username', username),
+        'password': device.get('password', password),
+        'timeout': device.get('timeout', timeout),
+        'optional_args': merged_args,
+    }
+
+
+class DeviceTimeout(Exception):
+    """The device did not answer every getter within the per-device timeout."""
+
+
+class Watchdog(object):
+    """
+    One thread closing the drivers whose deadline has passed, so that their blocked read fails.
+
+    watch() returns an entry whose 'fired' tells whether the driver was closed for its
+    deadline; unwatch() it once the driver is done with. The thread is started on the first
+    watch() and ends with stop().
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._entries = []
+        self._order = itertools.count()
+        self._thread = None
+        self._stopped = False
+
+    def watch(self, device, deadline):
+        entry = {'device': device, 'fired': False, 'done': False}
+        with self._condition:
+            heapq.heappush(self._entries, (deadline, next(self._order), entry))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='fleet-watchdog')
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify()
+        return entry
+
+    def unwatch(self, entry):
+        """Stop watching the driver of entry, return whether it was closed for its deadline."""
+        with self._condition:
+            entry['done'] = True
+            return entry['fired']
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    # entries unwatched in time are dropped as they come up
+                    while self._entries and self._entries[0][2]['done']:
+                        heapq.heappop(self._entries)
+                    if self._entries and self._entries[0][0] <= time.time():
+                        break
+                    self._condition.wait(self._entries[0][0] - time.time() if self._entries else None)
+                if self._stopped:
+                    return
+                _, _, entry = heapq.heappop(self._entries)
+                entry['fired'] = True
+            _close(entry['device'])
+
+
+def _close(device):
+    try:
+        device.close()
+    except Exception:
+        pass
+
+
+class FleetRunner(object):
+    """
+    Run a list of getters on many devices over a bounded pool of threads.
+
+    Each device gets its own driver instance and SSH session. A device that cannot be reached
+    is retried with exponential backoff; once connected, getters are run once each. Every
+    attempt gets the time left to the device as driver timeout, which bounds open(): a
+    session opened past the deadline is closed and the device fails with DeviceTimeout.
+    Getters are bounded as a whole: one watchdog thread per run() closes the driver of a
+    device past its deadline, which ends the blocked read of its pool thread. No other
+    thread is started, whatever the number of devices that time out.
+    """
+
+    def __init__(self, username=None, password=None, optional_args=None, max_workers=32, timeout=120,
+                 retries=2, backoff=1.0, max_backoff=30.0, driver=CMWDriver):
+        """
+        :param username, password, optional_args: defaults for inventory entries lacking them
+        :param max_workers: maximum number of devices polled at the same time
+        :param timeout: seconds allowed per device, retries included
+        :param retries: new connection attempts after the first one
+        :param backoff: seconds before the first retry, doubled for every further retry
+        :param max_backoff: upper bound of the delay between two attempts
+        :param driver: driver class, CMWDriver or a subclass
+        """
+        self.username = username
+        self.password = password
+        self.optional_args = optional_args or {}
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.driver = driver
+
+    def run(self, inventory, getters):
+        """
+        Run getters on every device of inventory and yield a DeviceResult as each one finishes.
+
+        inventory entries are hostnames or dictionaries with a 'hostname' and optionally
+        'username', 'password', 'timeout' and 'optional_args'. getters are method names, or
+        (name, kwargs) pairs.
+        """
+        getters = [getter if isinstance(getter, tuple) else (getter, {}) for getter in getters]
+        for name, _ in getters:
+            if not callable(getattr(self.driver, name, None)):
+                raise ValueError('{} has no getter {}'.format(self.driver.__name__, name))
+
+        watchdog = Watchdog()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = [executor.submit(self._poll, self._device_params(device), getters, watchdog)
+                   for device in inventory]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # on GeneratorExit, devices not started yet are dropped instead of polled for nobody
+            for future in futures:
+                future.cancel()
+            executor.shutdown()
+            watchdog.stop()
+
+    def _device_params(self, device):
+        return device_params(device, self.username, self.password, self.timeout, self.optional_args)
+
+    def _poll(self, params, getters, watchdog):
+        """Run getters on one device, retrying the connection until it opens or time runs out."""
+        start = time.time()
+        deadline = start + params['timeout']
+        results = {}
+        errors = {}
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                device = self._open(params, deadline)
+            except paramiko.AuthenticationException as e:
+                error = e
+                break
+            except RETRY_ERRORS as e:
+                error = e
+            except Exception as e:
+                error = e
+                break
+            else:
+                error = self._run_getters(device, params, getters, results, errors, deadline, watchdog)
+                break
+            delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+            if attempts > self.retries or time.time() + delay >= deadline:
+                break
+            time.sleep(delay)
+        return DeviceResult(params['hostname'], results, errors, error, time.time() - start, attempts)
+
+    def _open(self, params, deadline):
+        """Return an open driver for the device, its timeout being the time left until deadline."""
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise DeviceTimeout(self._timeout_message(params))
+        device = self.driver(params['hostname'], params['username'], params['password'],
+                             timeout=remaining, optional_args=params['optional_args'])
+        try:
+            device.open()
+        except Exception:
+            # a session half opened by netmiko would otherwise leak on every retry
+            _close(device)
+            raise
+        if time.time() >= deadline:
+            _close(device)
+            raise DeviceTimeout(self._timeout_message(params))
+        return device
+
+    def _run_getters(self, device, params, getters, results, errors, deadline, watchdog):
+        """Run getters on the open device, return the error that stopped them, or None."""
+        watched = watchdog.watch(device, deadline)
+        try:
+            for name, kwargs in getters:
+                if time.time() >= deadline:
+                    return DeviceTimeout(self._timeout_message(params))
+                try:
+                    result = getattr(device, name)(**kwargs)
+                except SESSION_ERRORS as e:
+                    if watched['fired'] or time.time() >= deadline:
+                        return DeviceTimeout(self._timeout_message(params))
+                    return e
+                except Exception as e:
+                    if watched['fired']:
+                        return DeviceTimeout(self._timeout_message(params))
+                    errors[name] = e
+                    continue
+                if watched['fired']:
+                    # the driver was closed under the getter, its result may be cut short
+                    return DeviceTimeout(self._timeout_message(params))
+                results[name] = result
+            return None
+        finally:
+            if not watchdog.unwatch(watched):
+                _close(device)
+
+    @staticmethod
+    def _timeout_message(params):
+        return '{} timed out after {}s'.format(params['hostname'], params['timeout'])
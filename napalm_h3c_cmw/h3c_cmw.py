@@ -20,7 +20,6 @@ Read https://napalm.readthedocs.io for more information.
 """
 
 from napalm.base import NetworkDriver
-import napalm.base.helpers
 from napalm.base.utils import py23_compat
 from napalm.base.netmiko_helpers import netmiko_args
 import napalm.base.constants as c
@@ -29,23 +28,67 @@ from napalm.base.exceptions import (
     ReplaceConfigException,
     CommandErrorException,
     CommitError,
+    ConnectionException,
 )
-
+from napalm_h3c_cmw import config as cmw_config
+from napalm_h3c_cmw import instrumentation
+from napalm_h3c_cmw import netconf
+from napalm_h3c_cmw import parsers
+from napalm_h3c_cmw import records
+from napalm_h3c_cmw import snmp
+from napalm_h3c_cmw import pool
+from napalm_h3c_cmw.utils import config_cache
+from napalm_h3c_cmw.utils.snapshot import CommandSnapshot
+from napalm_h3c_cmw.utils.transfer_index import TransferIndex
+
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 import socket
 import re
 import telnetlib
 import os
 import tempfile
+import shutil
 import paramiko
 import uuid
 import hashlib
+import time
+
+# Seconds to wait between two reads of a streamed command output
+STREAM_READ_INTERVAL = 0.05
+
+# Bytes per SFTP write request, the largest packet most SFTP servers accept
+SFTP_CHUNK_SIZE = 32768
+
+# How commit_config() keeps the configuration rollback() returns to:
+#   'save'     save it to a file on flash, then save again after the change (two flash writes)
+#   'archive'  'archive configuration', then 'save force' after the change (still two flash writes,
+#              it saves round trips and backup file housekeeping, not flash wear)
+#   'running'  keep the running configuration in memory, uploaded only on rollback (one flash write,
+#              the mode to use where flash wear matters)
+CHECKPOINTS = ('save', 'archive', 'running')
+
+# Getters timed when optional_args['instrumentation'] is set
+INSTRUMENTED_GETTERS = (
+    'get_facts', 'get_config', 'get_parsed_config', 'ping', 'get_interfaces', 'get_interfaces_ip',
+    'get_interfaces_counters', 'get_lldp_neighbors', 'get_arp_table', 'get_mac_address_table',
+    'get_snmp_information', 'get_ntp_peers', 'get_ntp_servers',
+)
+
+# Candidate lines _commit_merge() writes to the device before reading their output back
+MERGE_WINDOW = 100
 
-# Easier to store these as constants
-HOUR_SECONDS = 3600
-DAY_SECONDS = 24 * HOUR_SECONDS
-WEEK_SECONDS = 7 * DAY_SECONDS
-YEAR_SECONDS = 365 * DAY_SECONDS
+# Commands whose output get_facts() parses, in the order parsers.parse_facts() takes them
+FACTS_COMMANDS = [
+    'display version',
+    'display current-configuration | inc sysname',
+    'display ip interface brief',
+    'dis device manuinfo',
+]
+
+# 'display' and its abbreviations, commands of cli() that leave the snapshot and config cache valid
+_RE_DISPLAY_COMMAND = re.compile(r"^\s*dis(p(l(ay?)?)?)?(\s|$)")
 
 
 class CMWDriver(NetworkDriver):
@@ -91,8 +134,13 @@ class CMWDriver(NetworkDriver):
             for k, v in netmiko_argument_map.items()
         }
 
-        self.transport = optional_args.get('transport', 'ssh')
+        # 'netconf' serves the structured getters over NETCONF, the CLI session then runs over ssh
+        self.use_netconf = optional_args.get('transport') == 'netconf'
+        self.transport = 'ssh' if self.use_netconf else optional_args.get('transport', 'ssh')
         self.port = optional_args.get('port', 22)
+        self.netconf_port = optional_args.get('netconf_port', netconf.NETCONF_PORT)
+        # netconf.NetconfSession while the driver is open with the netconf transport
+        self.netconf = None
 
         self.changed = False
         self.loaded = False
@@ -100,6 +148,22 @@ class CMWDriver(NetworkDriver):
         self.replace = False
         self.merge_candidate = ''
         self.replace_file = ''
+        self.merge_window = optional_args.get('merge_window', MERGE_WINDOW)
+        self.checkpoint = optional_args.get('checkpoint', 'save')
+        if self.checkpoint not in CHECKPOINTS:
+            raise ValueError('checkpoint must be one of {}'.format(', '.join(CHECKPOINTS)))
+        # running configuration kept by the 'running' checkpoint
+        self.backup_config = ''
+        # seconds spent on each step of the last commit_config()
+        self.commit_timings = OrderedDict()
+        self._archive_location = None
+        # Statistics of the last file upload, see _transfer_file()
+        self.transfer_stats = {}
+        # Local index of uploaded files, skips the upload and the on-device md5 of unchanged files
+        transfer_index = optional_args.get('transfer_index')
+        self.transfer_index = TransferIndex(transfer_index) if transfer_index else None
+        # Always compare md5 on the device, before and after an upload
+        self.verify_transfer = optional_args.get('verify_transfer', False)
         self.profile = ["h3c_cmw"]
 
         # netmiko args
@@ -117,49 +181,151 @@ class CMWDriver(NetworkDriver):
         # Track whether 'file prompt quiet' is known to be configured
         self.prompt_quiet_configured = None
 
+        # Seconds the output of expensive commands is shared between getters, 0 disables it
+        self.snapshot_ttl = optional_args.get('snapshot_ttl', 0)
+        self._snapshot = CommandSnapshot(ttl=self.snapshot_ttl)
+
+        # Running configuration kept while the fingerprint command output does not change,
+        # a config_cache.RunningConfigCache or True for the process-wide one
+        self.config_cache = optional_args.get('config_cache')
+        if self.config_cache is True:
+            self.config_cache = config_cache.default_cache()
+        # Command whose output changes whenever the running configuration does, see _config_fingerprint().
+        # Comware has none that catches every change, so the one suited to the network is required.
+        self.config_fingerprint_command = optional_args.get('config_fingerprint_command')
+        if self.config_cache is not None and not self.config_fingerprint_command:
+            raise ValueError('config_cache needs a config_fingerprint_command')
+        # config.CMWConfig of the last running configuration parsed
+        self._parsed_config = None
+
+        # Send the commands of cli() and multi-command getters in a single channel write
+        self.batch_commands = optional_args.get('batch_commands', False)
+
+        # Session state set up once by open(): pager off and the prompt of the device
+        self._paging_disabled = False
+        self._prompt = None
+
+        # Sessions shared between driver instances, a pool.ConnectionPool or True for the process-wide one
+        self.connection_pool = optional_args.get('connection_pool')
+        if self.connection_pool is True:
+            self.connection_pool = pool.default_pool()
+
+        # Timings of commands and getters, an instrumentation.DriverStats or True for one of this driver
+        self.stats = optional_args.get('instrumentation')
+        if self.stats is True:
+            self.stats = instrumentation.DriverStats()
+        if self.stats is not None:
+            instrumentation.instrument(self, INSTRUMENTED_GETTERS)
+
+        # Source of get_interfaces_counters(), None for the device session, 'snmp' for an
+        # snmp.SnmpCounterBackend, or any object with a get_interfaces_counters() method
+        self.counters_backend = optional_args.get('counters_backend')
+        # the SNMP backend made here is closed with the driver, one passed in belongs to the caller
+        self._owns_counters_backend = self.counters_backend == 'snmp'
+        if self._owns_counters_backend:
+            self.counters_backend = snmp.SnmpCounterBackend(
+                hostname, community=optional_args.get('snmp_community', 'public'),
+                port=optional_args.get('snmp_port', snmp.SNMP_PORT),
+                timeout=optional_args.get('snmp_timeout', 2))
+        # ConnectionException or CommandErrorException of the last counters_backend failure, the counters then
+        # came from the device session
+        self.counters_backend_error = None
+
+        # View of the device in a telemetry.TelemetryCollector, by its name or address, answering
+        # get_interfaces() and get_interfaces_counters() while its data is fresh
+        collector = optional_args.get('telemetry')
+        self.telemetry = None
+        if collector is not None:
+            self.telemetry = collector.device(optional_args.get('telemetry_device', hostname))
+        # ConnectionException of the last getter the telemetry view could not answer
+        self.telemetry_error = None
+
     # ok
     def open(self):
         """Open a connection to the device.
         """
+        if self.connection_pool is not None:
+            self.device = self.connection_pool.acquire(self._pool_key(), self._open_session, self._session_alive)
+            self._netmiko_device = self.device
+            self._paging_disabled = True
+            self._prompt = parsers.prompt_pattern(self.device.base_prompt)
+        else:
+            self._open_session()
+        if self.use_netconf:
+            self._open_netconf()
+
+    def _open_session(self):
         device_type = "h3c"
         self.device = self._netmiko_open(
             device_type, netmiko_optional_args=self.netmiko_optional_args
         )
         # self.device.enable()
+        self._prepare_session()
+        return self.device
+
+    def _open_netconf(self):
+        self.netconf = netconf.NetconfSession(
+            self.hostname, self.username, self.password, port=self.netconf_port, timeout=self.timeout,
+            key_file=self.netmiko_optional_args.get('key_file'),
+            use_keys=self.netmiko_optional_args.get('use_keys', False))
+        self.netconf.open()
 
     # ok
     def close(self):
         """Close the connection to the device and do the necessary cleanup."""
 
+        reusable = True
         # Return file prompt quiet to the original state
         if self.auto_file_prompt and self.prompt_quiet_changed is True:
-            self.device.send_config_set(["no file prompt quiet"])
+            try:
+                self.device.send_config_set(["no file prompt quiet"])
+            except Exception:
+                if self.connection_pool is None:
+                    raise
+                reusable = False
             self.prompt_quiet_changed = False
             self.prompt_quiet_configured = False
-        self._netmiko_close()
+        self._snapshot.invalidate()
+        if self.netconf is not None:
+            self.netconf.close()
+            self.netconf = None
+        if self._owns_counters_backend:
+            # its UDP socket, opened again by the next request if the driver is reopened
+            self.counters_backend.close()
+        if self.connection_pool is not None and self.device is not None:
+            if reusable and self._session_reusable():
+                # keep the session open for the next driver of this device
+                self.connection_pool.release(self._pool_key(), self.device)
+            else:
+                self.connection_pool.discard(self._pool_key(), self.device)
+            self.device = None
+            self._netmiko_device = None
+        else:
+            self._netmiko_close()
 
     # ok
     def is_alive(self):
         """ Returns a flag with the state of the connection."""
         if self.device is None:
             return {'is_alive': False}
+        return {'is_alive': self._session_alive(self.device)}
+
+    def _session_alive(self, device):
         try:
             if self.transport == 'telnet':
                 # Try sending IAC + NOP (IAC is telnet way of sending command
                 # IAC = Interpret as Command (it comes before the NOP)
-                self.device.write_channel(telnetlib.IAC + telnetlib.NOP)
-                return {'is_alive': True}
+                device.write_channel(telnetlib.IAC + telnetlib.NOP)
+                return True
             else:
                 # SSH
                 # Try sending ASCII null byte to maintain the connection alive
                 null = chr(0)
-                self.device.write_channel(null)
-                return {
-                    'is_alive': self.device.remote_conn.transport.is_active()
-                }
+                device.write_channel(null)
+                return device.remote_conn.transport.is_active()
         except (socket.error, EOFError, OSError):
             # If unable to send, we can tell for sure that the connection is unusable
-            return {'is_alive': False}
+            return False
 
     # ok
     def cli(self, commands):
@@ -172,74 +338,29 @@ class CMWDriver(NetworkDriver):
         if type(commands) is not list:
             raise TypeError("Please enter a valid list of commands!")
 
-        for command in commands:
-            output = self.device.send_command(command)
+        if self.batch_commands:
+            outputs = self._send_command_batch(commands)
+        else:
+            outputs = [self._send_command(command) for command in commands]
+        for command, output in zip(commands, outputs):
             cli_output.setdefault(command, {})
             cli_output[command] = output
 
+        # other commands may change what the device reports
+        if not all(_RE_DISPLAY_COMMAND.match(command) for command in commands):
+            self._running_state_changed()
         return cli_output
 
     # ok
     def get_facts(self):
         """Return a set of facts from the devices."""
-        # default values.
-        vendor = u'H3C'
-        uptime = -1
-        serial_number, fqdn, os_version, hostname, model = (u'Unknown', u'Unknown', u'Unknown', u'Unknown', u'Unknown')
-
-        # obtain output from device
-        show_ver = self.device.send_command('display version')
-        show_hostname = self.device.send_command('display current-configuration | inc sysname')
-        show_int_status = self.device.send_command('display ip interface brief')
-        show_esn = self.device.send_command('dis device manuinfo')
-
-        # os_version/uptime/model
-        for line in show_ver.splitlines():
-            if 'H3C Comware Software' in line:
-                search_result = re.search(r"(?P<os_version>V\S+\s+\S+\s+\S+\s+\S+)", line)
-                if search_result is not None:
-                    os_version = search_result.group('os_version')
-
-            if 'H3C' in line and 'uptime is' in line:
-                search_result = re.search(r"S\S+", line)
-                if search_result is not None:
-                    model = search_result.group(0)
-                uptime = self._parse_uptime(line)
-                break
-
-        # get serial_number,due to the stack have multiple SN, so show it in a list
-        # 由于堆叠设备会有多少个SN，所以这里用列表展示
-        for line in show_esn.splitlines():
-            if 'DEVICE_SERIAL_NUMBER' in line:
-                _, serial = line.split("DEVICE_SERIAL_NUMBER : ")
-                if serial_number != 'Unknown':
-                    serial_number += " / " + serial.strip()
-                else:
-                    serial_number = serial.strip()
-
-        if 'sysname ' in show_hostname:
-            _, hostname = show_hostname.split("sysname ")
-            hostname = hostname.strip()
-
-        # interface_list filter
-        interface_list = []
-
-        if 'Interface' in show_int_status:
-            _, interface_part = show_int_status.split("Interface")
-            for line in interface_part.splitlines()[1:]:
-                interface = line.split()[0]
-                interface_list.append(interface)
-
-        return {
-            'uptime': int(uptime),
-            'vendor': vendor,
-            'os_version': py23_compat.text_type(os_version),
-            'serial_number': serial_number,
-            'model': py23_compat.text_type(model),
-            'hostname': py23_compat.text_type(hostname),
-            'fqdn': fqdn,  # ? fqdn(fully qualified domain name)
-            'interface_list': interface_list
-        }
+        config = self._get_parsed_config(fetch=False)
+        if config is None:
+            return parsers.parse_facts(*self._send_snapshot_commands(FACTS_COMMANDS))
+        # the hostname comes from the cached configuration
+        commands = [command for command in FACTS_COMMANDS if 'sysname' not in command]
+        show_ver, show_int_status, show_esn = self._send_snapshot_commands(commands)
+        return parsers.parse_facts(show_ver, '\n'.join(config.global_lines('sysname')), show_int_status, show_esn)
 
     # ok
     def get_config(self, retrieve="all", full=False):
@@ -257,14 +378,21 @@ class CMWDriver(NetworkDriver):
         }
 
         if retrieve.lower() in ('running', 'all'):
-            command = 'display current-configuration'
-            config['running'] = py23_compat.text_type(self.device.send_command(command))
+            config['running'] = py23_compat.text_type(self._get_running_config())
         if retrieve.lower() in ('startup', 'all'):
             # command = 'display saved-configuration last'
             # config['startup'] = py23_compat.text_type(self.device.send_command(command))
             pass
         return config
 
+    def get_parsed_config(self):
+        """
+        Return the running configuration as a config.CMWConfig.
+
+        Its sections are parsed when first accessed, e.g. config.interfaces, config.ntp_servers.
+        """
+        return self._get_parsed_config()
+
     # ok
     def ping(self, destination, source=c.PING_SOURCE, ttl=c.PING_TTL, timeout=c.PING_TIMEOUT, size=c.PING_SIZE,
              count=c.PING_COUNT, vrf=c.PING_VRF):
@@ -280,7 +408,7 @@ class CMWDriver(NetworkDriver):
         if source != '':
             command += ' -a {}'.format(source)
         command += ' {}'.format(destination)
-        output = self.device.send_command(command)
+        output = self._send_command(command)
 
         if 'Error' in output:
             ping_dict['error'] = output
@@ -324,9 +452,12 @@ class CMWDriver(NetworkDriver):
         return ping_dict
 
     # develop
-    def get_interfaces(self):
+    def get_interfaces(self, interfaces=None):
         """
-        Get interface details (last_flapped is not implemented).
+        Get interface details (last_flapped is not implemented, mtu is -1 when not shown).
+
+        With interfaces, a list of names and ranges such as 'GE1/0/1 to GE1/0/4' or
+        'GE1/0/1-4', only those are read, with 'display interface <name>' each.
 
         Sample Output:
         {
@@ -336,6 +467,7 @@ class CMWDriver(NetworkDriver):
                 "last_flapped": -1.0,
                 "is_up": false,
                 "mac_address": "0C:45:BA:7D:83:E6",
+                "mtu": 1500,
                 "speed": -1
             },
             "Vlanif100": {
@@ -344,67 +476,22 @@ class CMWDriver(NetworkDriver):
                 "last_flapped": -1.0,
                 "is_up": false,
                 "mac_address": "0C:45:BA:7D:83:E4",
+                "mtu": 1500,
                 "speed": -1
             }
         }
         """
-        interfaces = {}
-        output = self.device.send_command('display interface')
-        if not output:
-            return {}
-
-        separator = r"(^(?!Line protocol).*current state.*$)"
-        re_intf_name_state = r"^(?!Line protocol)(?P<intf_name>\S+).+current state\W+(?P<intf_state>.+)$"
-        re_protocol = r"Line protocol current state\W+(?P<protocol>.+)$"
-        re_mac = r"Hardware address is\W+(?P<mac_address>\S+)"
-        re_speed = r"^Speed\W+(?P<speed>\d+|\w+)"
-        re_description = r"^Description\W+(?P<description>.*)$"
-
-        new_interfaces = self._separate_section(separator, output)
-        for interface in new_interfaces:
-            interface = interface.strip()
-            match_intf = re.search(re_intf_name_state, interface, flags=re.M)
-            match_proto = re.search(re_protocol, interface, flags=re.M)
-
-            if match_intf is None or match_proto is None:
-                msg = "Unexpected interface format: {}".format(interface)
-                raise ValueError(msg)
-            intf_name = match_intf.group('intf_name')
-            intf_state = match_intf.group('intf_state')
-            is_enabled = bool('up' in intf_state.lower())
-
-            protocol = match_proto.group('protocol')
-            is_up = bool('up' in protocol.lower())
-
-            match_mac = re.search(re_mac, interface, flags=re.M)
-            if match_mac:
-                mac_address = match_mac.group('mac_address')
-                mac_address = napalm.base.helpers.mac(mac_address)
-            else:
-                mac_address = ""
-
-            speed = -1
-            match_speed = re.search(re_speed, interface, flags=re.M)
-            if match_speed:
-                speed = match_speed.group('speed')
-                if speed.isdigit():
-                    speed = int(speed)
-
-            description = ''
-            match = re.search(re_description, interface, flags=re.M)
-            if match:
-                description = match.group('description')
-
-            interfaces.update({
-                intf_name: {
-                    'description': description,
-                    'is_enabled': is_enabled,
-                    'is_up': is_up,
-                    'last_flapped': -1.0,
-                    'mac_address': mac_address,
-                    'speed': speed}
-            })
-        return interfaces
+        if self.telemetry is not None:
+            try:
+                return self._select_interfaces(self.telemetry.get_interfaces(), interfaces)
+            except ConnectionException as e:
+                self.telemetry_error = e
+        if self.netconf is not None:
+            return self._select_interfaces(self.netconf.get_interfaces(), interfaces)
+        if interfaces is not None:
+            return parsers.parse_interfaces(self._interface_sections(interfaces))
+        new_interfaces = self._snapshot_sections('display interface', parsers.INTERFACE_SEPARATOR)
+        return parsers.parse_interfaces(new_interfaces)
 
     # ok
     def get_interfaces_ip(self):
@@ -440,163 +527,83 @@ class CMWDriver(NetworkDriver):
             }
         }
         """
-        interfaces_ip = {}
-        output_v4 = self.device.send_command('display ip interface')
-        output_v6 = self.device.send_command('display ipv6 interface')
-
-        v4_interfaces = {}
-        separator = r"(^(?!Line protocol).*current state.*$)"
-        new_v4_interfaces = self._separate_section(separator, output_v4)
-        for interface in new_v4_interfaces:
-            re_intf_name_state = r"^(?!Line protocol)(?P<intf_name>\S+).+current state\W+(?P<intf_state>.+)$"
-            re_intf_ip = r"Internet Address is\s+(?P<ip_address>\d+.\d+.\d+.\d+)\/(?P<prefix_length>\d+)"
-
-            match_intf = re.search(re_intf_name_state, interface, flags=re.M)
-            if match_intf is None:
-                msg = "Unexpected interface format: {}".format(interface)
-                raise ValueError(msg)
-            intf_name = match_intf.group('intf_name')
-            # v4_interfaces[intf_name] = {}
-            match_ip = re.findall(re_intf_ip, interface, flags=re.M)
-
-            for ip_info in match_ip:
-                val = {'prefix_length': int(ip_info[1])}
-                # v4_interfaces[intf_name][ip_info[0]] = val
-                v4_interfaces.setdefault(intf_name, {})[ip_info[0]] = val
-
-        v6_interfaces = {}
-        separator = r"(^(?!IPv6 protocol).*current state.*$)"
-        new_v6_interfaces = self._separate_section(separator, output_v6)
-        for interface in new_v6_interfaces:
-            re_intf_name_state = r"^(?!IPv6 protocol)(?P<intf_name>\S+).+current state\W+(?P<intf_state>.+)$"
-            re_intf_ip = r"(?P<ip_address>\S+), subnet is.+\/(?P<prefix_length>\d+)"
-
-            match_intf = re.search(re_intf_name_state, interface, flags=re.M)
-            if match_intf is None:
-                msg = "Unexpected interface format: {}".format(interface)
-                raise ValueError(msg)
-            intf_name = match_intf.group('intf_name')
-            match_ip = re.findall(re_intf_ip, interface, flags=re.M)
-
-            for ip_info in match_ip:
-                val = {'prefix_length': int(ip_info[1])}
-                v6_interfaces.setdefault(intf_name, {})[ip_info[0]] = val
-
-        # Join data from intermediate dictionaries.
-        for interface, data in v4_interfaces.items():
-            interfaces_ip.setdefault(interface, {'ipv4': {}})['ipv4'] = data
-
-        for interface, data in v6_interfaces.items():
-            interfaces_ip.setdefault(interface, {'ipv6': {}})['ipv6'] = data
-
-        return interfaces_ip
+        output_v4, output_v6 = self._send_snapshot_commands(['display ip interface', 'display ipv6 interface'])
+        new_v4_interfaces = self._separate_section(parsers.INTERFACE_SEPARATOR, output_v4)
+        new_v6_interfaces = self._separate_section(parsers.IPV6_INTERFACE_SEPARATOR, output_v6)
+        return parsers.parse_interfaces_ip(new_v4_interfaces, new_v6_interfaces)
 
     # develop
-    def get_interfaces_counters(self):
-        """Return interfaces counters."""
-        def process_counts(tup):
-            for item in tup:
-                if item != "":
-                    return int(item)
-            return 0
-
-        interfaces = {}
-        # command "display interface counters" lacks of some keys
-        output = self.device.send_command('display interface')
-        if not output:
-            return {}
-
-        separator = r"(^(?!Line protocol).*current state.*$)"
-        re_intf_name_state = r"^(?!Line protocol)(?P<intf_name>\S+).+current state\W+(?P<intf_state>.+)$"
-        re_unicast = r"Unicast:\s+(\d+)|(\d+)\s+unicast"
-        re_multicast = r"Multicast:\s+(\d+)|(\d+)\s+multicast"
-        re_broadcast = r"Broadcast:\s+(\d+)|(\d+)\s+broadcast"
-        re_dicards = r"Discard:\s+(\d+)|(\d+)\s+discard"
-        re_rx_octets = r"Input.+\s+(\d+)\sbytes|Input:.+,(\d+)\sbytes"
-        re_tx_octets = r"Output.+\s+(\d+)\sbytes|Output:.+,(\d+)\sbytes"
-        re_errors = r"Total Error:\s+(\d+)|(\d+)\s+errors"
-
-        new_interfaces = self._separate_section(separator, output)
-        for interface in new_interfaces:
-            interface = interface.strip()
-            match_intf = re.search(re_intf_name_state, interface, flags=re.M)
-
-            if match_intf is None:
-                msg = "Unexpected interface format: {}".format(interface)
-                raise ValueError(msg)
-            intf_name = match_intf.group('intf_name')
-            intf_counter = {
-                    'tx_errors': 0,
-                    'rx_errors': 0,
-                    'tx_discards': 0,
-                    'rx_discards': 0,
-                    'tx_octets': 0,
-                    'rx_octets': 0,
-                    'tx_unicast_packets': 0,
-                    'rx_unicast_packets': 0,
-                    'tx_multicast_packets': 0,
-                    'rx_multicast_packets': 0,
-                    'tx_broadcast_packets': 0,
-                    'rx_broadcast_packets': 0
-                }
+    def get_interfaces_counters(self, interfaces=None):
+        """
+        Return interfaces counters, from the telemetry view or counters_backend when they answer.
 
-            match = re.findall(re_errors, interface, flags=re.M)
-            if match:
-                intf_counter['rx_errors'] = process_counts(match[0])
-            if len(match) == 2:
-                intf_counter['tx_errors'] = process_counts(match[1])
-
-            match = re.findall(re_dicards, interface, flags=re.M)
-            if len(match) == 2:
-                intf_counter['rx_discards'] = process_counts(match[0])
-                intf_counter['tx_discards'] = process_counts(match[1])
-
-            match = re.findall(re_unicast, interface, flags=re.M)
-            if len(match) == 2:
-                intf_counter['rx_unicast_packets'] = process_counts(match[0])
-                intf_counter['tx_unicast_packets'] = process_counts(match[1])
-
-            match = re.findall(re_multicast, interface, flags=re.M)
-            if len(match) == 2:
-                intf_counter['rx_multicast_packets'] = process_counts(match[0])
-                intf_counter['tx_multicast_packets'] = process_counts(match[1])
-
-            match = re.findall(re_broadcast, interface, flags=re.M)
-            if len(match) == 2:
-                intf_counter['rx_broadcast_packets'] = process_counts(match[0])
-                intf_counter['tx_broadcast_packets'] = process_counts(match[1])
-
-            match = re.findall(re_rx_octets, interface, flags=re.M)
-            if match:
-                intf_counter['rx_octets'] = process_counts(match[0])
+        With interfaces, names and ranges as get_interfaces() takes them, only those are read.
+        """
+        if self.telemetry is not None:
+            try:
+                return self._select_interfaces(self.telemetry.get_interfaces_counters(), interfaces)
+            except ConnectionException as e:
+                self.telemetry_error = e
+        if self.counters_backend is not None:
+            try:
+                return self._select_interfaces(self.counters_backend.get_interfaces_counters(), interfaces)
+            except (ConnectionException, CommandErrorException) as e:
+                # unreachable, or an agent answering errors or a looping walk
+                self.counters_backend_error = e
+        if self.netconf is not None:
+            return self._select_interfaces(self.netconf.get_interfaces_counters(), interfaces)
+        if interfaces is not None:
+            return parsers.parse_interfaces_counters(self._interface_sections(interfaces))
+        # command "display interface counters" lacks of some keys
+        new_interfaces = self._snapshot_sections('display interface', parsers.INTERFACE_SEPARATOR)
+        return parsers.parse_interfaces_counters(new_interfaces)
 
-            match = re.findall(re_tx_octets, interface, flags=re.M)
-            if match:
-                intf_counter['tx_octets'] = process_counts(match[0])
+    # develop
+    def load_replace_candidate(self, filename=None, config=None):
+        """Upload the candidate configuration to the device, replaces the running one on commit."""
+        self.replace = True
+        self._replace_candidate(filename, config)
+        self.loaded = True
 
-            interfaces.update({
-                intf_name: intf_counter
-            })
-        return interfaces
+    # develop
+    def load_merge_candidate(self, filename=None, config=None):
+        """Add the lines of filename or config to the candidate merged on commit."""
+        if not filename and not config:
+            raise MergeConfigException('filename or config param must be provided.')
+
+        self.merge_candidate += '\n'
+        if filename is not None:
+            with open(filename, 'r') as f:
+                self.merge_candidate += f.read()
+        else:
+            self.merge_candidate += config
+        self.replace = False
+        self.loaded = True
 
     # ok
     def commit_config(self, message=""):
         """Commit configuration."""
         if self.loaded:
+            # the running state changes from here on, even if the commit fails halfway
+            self._running_state_changed()
+            self.commit_timings = OrderedDict()
             try:
-                self.backup_file = 'config_' + datetime.now().strftime("%Y%m%d_%H%M") + '.cfg'
-                if self._check_file_exists(self.backup_file):
-                    self._delete_file(self.backup_file)
-                self._save_config(self.backup_file)
-                if self.replace:
-                    self._load_config(self.replace_file.split('/')[-1])
-                else:
-                    self._commit_merge()
-                    self.merge_candidate = ''  # clear the merge buffer
-
+                with self._timed('backup'):
+                    self._save_checkpoint()
+                # rollback() returns to the checkpoint from here on, a failed apply may have changed lines
                 self.changed = True
+                with self._timed('apply'):
+                    if self.replace:
+                        self._load_config(self.replace_file.split('/')[-1])
+                    else:
+                        self._commit_merge()
+                        self.merge_candidate = ''  # clear the merge buffer
+
                 self.loaded = False
-                self._save_config()
+                with self._timed('save'):
+                    self._save_config(force=self.checkpoint != 'save')
+                # the configuration may have renamed the device
+                self._refresh_prompt()
             except Exception as e:
                 raise CommitError(str(e))
         else:
@@ -626,9 +633,14 @@ class CMWDriver(NetworkDriver):
     def rollback(self):
         """Rollback to previous commit."""
         if self.changed:
-            self._load_config(self.backup_file)
+            self._running_state_changed()
+            if self.checkpoint == 'running':
+                self._restore_running_checkpoint()
+            else:
+                self._load_config(self.backup_file)
             self.changed = False
-            self._save_config()
+            self._save_config(force=self.checkpoint != 'save')
+            self._refresh_prompt()
 
     # ok
     def get_lldp_neighbors(self):
@@ -659,27 +671,19 @@ class CMWDriver(NetworkDriver):
             ]
         }
         """
-        results = {}
+        if self.netconf is not None:
+            return self.netconf.get_lldp_neighbors()
         command = 'display lldp neighbor-information list'
-        output = self.device.send_command(command)
-        re_lldp = r"(?P<hostname>\S+)\s+(?P<local>\S+)\s+\S+\s+(?P<port>[G,T]\S+)\s+"
-        match = re.findall(re_lldp, output, re.M)
-        for neighbor in match:
-            local_intf = neighbor[1]
-            if local_intf not in results:
-                results[local_intf] = []
-
-            neighbor_dict = dict()
-            neighbor_dict['hostname'] = py23_compat.text_type(neighbor[0])
-            neighbor_dict['port'] = py23_compat.text_type(neighbor[2])
-            results[local_intf].append(neighbor_dict)
-        return results
+        return parsers.parse_lldp_neighbors(self._send_snapshot_command(command))
 
     # develop
-    def get_arp_table(self, vrf=""):
+    def get_arp_table(self, vrf="", compact=False):
         """
                 Get arp table information.
 
+                With compact=True a column-oriented records.ARPTable is returned instead,
+                its to_dicts() gives the list below.
+
                 Return a list of dictionaries having the following set of keys:
                     * interface (string)
                     * mac (string)
@@ -702,32 +706,35 @@ class CMWDriver(NetworkDriver):
                         }
                     ]
                 """
-        arp_table = []
-        output = self.device.send_command('display arp')
-        re_arp = r"(?P<ip_address>\d+\.\d+\.\d+\.\d+)\s+(?P<mac>\S+)\s+(?P<exp>\d+|)\s+" \
-                 r"(?P<type>I|D|S|O)\S+\s+(?P<interface>\S+)"
-        match = re.findall(re_arp, output, flags=re.M)
-
-        for arp in match:
-            # if arp[2].isdigit():
-            #     exp = float(arp[2]) * 60
-            # else:
-            #     exp = 0
-
-            entry = {
-                'interface': arp[4],
-                'mac': napalm.base.helpers.mac(arp[1]),
-                'ip': arp[0],
-                'age': -1.0,
-            }
-            arp_table.append(entry)
-        return arp_table
+        if compact:
+            return records.ARPTable.from_fields(self._arp_fields())
+        return list(self.iter_arp_table(vrf))
+
+    def iter_arp_table(self, vrf=""):
+        """
+        Yield the entries of get_arp_table() one at a time.
+
+        The output of 'display arp' is parsed line by line while it is read from the channel,
+        so memory stays bounded however large the table is. Over NETCONF the rows of the
+        reply are cleared as they are read.
+        """
+        for fields in self._arp_fields():
+            yield parsers.arp_entry(fields)
+
+    def _arp_fields(self):
+        """Yield the raw (ip, mac, interface) fields of the ARP table."""
+        if self.netconf is not None:
+            return self.netconf.iter_arp_fields()
+        return self._iter_command_fields('display arp', parsers.split_arp_line)
 
     # develop
-    def get_mac_address_table(self):
+    def get_mac_address_table(self, compact=False):
         """
         Return the MAC address table.
 
+        With compact=True a column-oriented records.MACTable is returned instead, its
+        to_dicts() gives the list below.
+
         Sample output:
         [
             {
@@ -763,25 +770,26 @@ class CMWDriver(NetworkDriver):
                 pre-authen： 用户使能NAC认证功能后，处于预连接状态且未获取到IP地址的NAC认证用户对应的MAC地址表项。
                 evpn：       标识EVPN网络中存在的MAC地址表项。
         """
-        mac_address_table = []
-        command = 'display mac-address'
-        output = self.device.send_command(command)
-        re_mac = r"(?P<mac>\S+)\s+(?P<vlan>\d+|-)\S+\s+(?P<interface>\S+)\s+(?P<type>\w+)\s+"
-        match = re.findall(re_mac, output, re.M)
-
-        for mac_info in match:
-            mac_dict = {
-                'mac': napalm.base.helpers.mac(mac_info[0]),
-                'interface': mac_info[2],
-                'vlan': int(mac_info[1]),
-                'static': True if mac_info[3] == "static" else False,
-                'active': True if mac_info[3] == "dynamic" else False,
-                'authen': True if mac_info[3] == "authen" else False,
-                'moves': -1,
-                'last_move': -1.0
-            }
-            mac_address_table.append(mac_dict)
-        return mac_address_table
+        if compact:
+            return records.MACTable.from_fields(self._mac_address_fields())
+        return list(self.iter_mac_address_table())
+
+    def iter_mac_address_table(self):
+        """
+        Yield the entries of get_mac_address_table() one at a time.
+
+        The output of 'display mac-address' is parsed line by line while it is read from the
+        channel, so memory stays bounded however large the table is. Over NETCONF the rows
+        of the reply are cleared as they are read.
+        """
+        for fields in self._mac_address_fields():
+            yield parsers.mac_address_entry(fields)
+
+    def _mac_address_fields(self):
+        """Yield the raw (mac, vlan, interface, type) fields of the MAC address table."""
+        if self.netconf is not None:
+            return self.netconf.iter_mac_address_fields()
+        return self._iter_command_fields('display mac-address', parsers.split_mac_address_line)
 
     # develop
     def pre_connection_tests(self):
@@ -801,18 +809,8 @@ class CMWDriver(NetworkDriver):
 
     # develop
     def get_snmp_information(self):
-        # snmp_information = {}
-        # command = 'display snmp-agent sys-info'
-        # output = self.device.send_command(command)
-
-        snmp_information = {
-            'contact': py23_compat.text_type(''),
-            'location': py23_compat.text_type(''),
-            'community': {},
-            'chassis_id': py23_compat.text_type('')
-        }
-        return snmp_information
-        pass
+        """Return the SNMP contact, location and communities configured (chassis_id is not implemented)."""
+        return self._get_config_lines('snmp-agent').snmp_information()
 
     # develop
     def get_probes_config(self):
@@ -856,10 +854,7 @@ class CMWDriver(NetworkDriver):
             '162.158.20.18': {}
         }
         """
-        ntp_server = {}
-        # command = "display ntp session"
-        # output = self.device.send_command(command)
-        return ntp_server
+        return {py23_compat.text_type(peer): {} for peer in self._get_config_lines('ntp-service').ntp_peers}
 
     # develop
     def get_ntp_servers(self):
@@ -874,10 +869,7 @@ class CMWDriver(NetworkDriver):
             '162.158.20.18': {}
         }
         """
-        ntp_server = {}
-        # command = "display ntp trace"
-        # output = self.device.send_command(command)
-        return ntp_server
+        return {py23_compat.text_type(server): {} for server in self._get_config_lines('ntp-service').ntp_servers}
 
     # develop
     def get_ntp_stats(self):
@@ -888,45 +880,358 @@ class CMWDriver(NetworkDriver):
 
 
 
-    @staticmethod
-    def _separate_section(separator, content):
-        if content == "":
-            return []
+    def _running_state_changed(self):
+        """Forget the outputs kept for this device, its state may have changed."""
+        self._snapshot.invalidate()
+        if self.config_cache is not None:
+            self.config_cache.invalidate(self.hostname)
 
-        # Break output into per-interface sections
-        interface_lines = re.split(separator, content, flags=re.M)
+    def _get_running_config(self, fetch=True):
+        """
+        Return the running configuration, from the config cache while the fingerprint holds.
 
-        if len(interface_lines) == 1:
-            msg = "Unexpected output data:\n{}".format(interface_lines)
-            raise ValueError(msg)
+        With fetch=False, return None instead of fetching it from the device.
+        """
+        command = 'display current-configuration'
+        if self.config_cache is None or (not fetch and self.hostname not in self.config_cache):
+            # nothing cached to check the fingerprint against
+            return self._send_command(command) if fetch else None
+        # taken before the configuration, a change in between is caught by the next call
+        fingerprint = self._config_fingerprint()
+        if fingerprint is None:
+            self.config_cache.invalidate(self.hostname)
+            return self._send_command(command) if fetch else None
+        config = self.config_cache.get(self.hostname, fingerprint)
+        if config is None and fetch:
+            config = self._send_command(command)
+            self.config_cache.put(self.hostname, fingerprint, config)
+        return config
 
-        # Get rid of the blank data at the beginning
-        interface_lines.pop(0)
+    def _get_parsed_config(self, fetch=True):
+        """Return _get_running_config() as a config.CMWConfig, parsed once per configuration text."""
+        running_config = self._get_running_config(fetch)
+        if running_config is None:
+            return None
+        if self._parsed_config is None or self._parsed_config.text != running_config:
+            self._parsed_config = cmw_config.CMWConfig(running_config)
+        return self._parsed_config
 
-        # Must be pairs of data (the separator and section corresponding to it)
-        if len(interface_lines) % 2 != 0:
-            msg = "Unexpected output data:\n{}".format(interface_lines)
-            raise ValueError(msg)
+    def _get_config_lines(self, keyword):
+        """
+        Return a config.CMWConfig holding at least the global commands starting with keyword.
+
+        The whole configuration when the config cache is on, else only the matching lines.
+        """
+        if self.config_cache is not None:
+            return self._get_parsed_config()
+        output = self._send_command('display current-configuration | include {}'.format(keyword))
+        return cmw_config.CMWConfig(output)
+
+    def _config_fingerprint(self):
+        """Return the hash of the output of config_fingerprint_command, None when the device rejects it."""
+        output = self._send_command(self.config_fingerprint_command)
+        if parsers.COMMAND_ERROR.search(output):
+            return None
+        return hashlib.md5(output.encode('utf-8')).hexdigest()
+
+    def _pool_key(self):
+        """Key of the session in the pool, a driver with other credentials never gets this session."""
+        credentials = u'{}\0{}'.format(self.password, self.netmiko_optional_args.get('key_file'))
+        digest = hashlib.sha256(credentials.encode('utf-8')).hexdigest()
+        return self.hostname, self.netmiko_optional_args['port'], self.username, digest
+
+    def _session_reusable(self):
+        """Tell whether the session is idle at a user-view prompt, fit for the next driver."""
+        try:
+            if self.device.read_channel():
+                # left by a command that timed out, the next driver would read it as its output
+                return False
+            return self.device.find_prompt().startswith('<')
+        except Exception:
+            return False
 
-        # Combine the separator and section into one string
-        intf_iter = iter(interface_lines)
+    def _prepare_session(self):
+        """
+        Put the session in user view with the pager off, and remember the prompt.
+
+        Done once per connection: commands then read the channel up to that prompt, without
+        looking for the prompt again nor answering '---- More ----' pages.
+        """
+        # napalm's _netmiko_open() leaves the session in system-view
+        self._netmiko_send('return', expect_string=r'<.+>')
+        self._netmiko_send('screen-length disable', expect_string=r'<.+>')
+        self._paging_disabled = True
+        self._prompt = parsers.prompt_pattern(self.device.base_prompt)
+
+    def _refresh_prompt(self):
+        """Read the prompt of the device again, needed after its sysname changed."""
+        if self._prompt is not None:
+            self._prompt = parsers.prompt_pattern(self.device.set_base_prompt())
+
+    def _send_command(self, command):
+        """Send command and return its output, read up to the prompt found by open()."""
+        if self._prompt is None:
+            return self._netmiko_send(command)
+        return '\n'.join(self._iter_command_lines(command))
+
+    def _netmiko_send(self, command, **kwargs):
+        """Send command with netmiko's send_command(), which waits for expect_string if given."""
+        if self.stats is None:
+            return self.device.send_command(command, **kwargs)
+        # netmiko returns the whole output at once, its first byte is not seen
+        timer = self.stats.start_command(command)
+        output = self.device.send_command(command, **kwargs)
+        timer.chunk(output, timer.started)
+        timer.done()
+        return output
+
+    def _get_prompt(self):
+        if self._prompt is None:
+            return parsers.prompt_pattern(self.device.base_prompt)
+        return self._prompt
+
+    def _send_snapshot_command(self, command):
+        """Send command, reusing its output while the session snapshot is fresh."""
+        output = self._snapshot.get(command)
+        if output is None:
+            output = self._send_command(command)
+            self._snapshot.put(command, output)
+        return output
+
+    def _iter_command_lines(self, command):
+        """
+        Send command and yield its output line by line as it is read from the channel.
 
+        Only the trailing partial line is buffered. Paging prompts are answered on the fly and
+        the output ends at the device prompt.
+        """
+        prompt = self._get_prompt()
+        self.device.clear_buffer()
+        self.device.write_channel(self.device.normalize_cmd(command))
+        timer = None if self.stats is None else self.stats.start_command(command)
+
+        finished = False
+        echo = True
+        pending = ''
         try:
-            new_interfaces = [line + next(intf_iter, '') for line in intf_iter]
-        except TypeError:
-            raise ValueError()
-        return new_interfaces
+            while not finished:
+                pending = self._answer_pager(pending + self._read_channel_chunk(command, timer))
+                lines = pending.split('\n')
+                pending = lines.pop()
+                finished = prompt.search(pending) is not None
+                for line in lines:
+                    line = line.rstrip('\r')
+                    if echo:
+                        # the first line is the echo of the command
+                        echo = False
+                        if command in line:
+                            continue
+                    yield line
+        except GeneratorExit:
+            if not finished:
+                # the consumer stopped early, do not leave the rest of the output in the channel
+                self.device.read_until_prompt()
+            raise
+        finally:
+            if timer is not None:
+                timer.done()
+
+    def _read_channel_chunk(self, command, timer=None):
+        """Wait for the next data on the channel, at most self.timeout seconds, counted by timer if any."""
+        start = time.time()
+        deadline = start + self.timeout
+        while True:
+            chunk = self.device.read_channel()
+            if chunk:
+                if timer is not None:
+                    timer.chunk(chunk, start)
+                return chunk
+            if time.time() > deadline:
+                msg = "Timed out reading the output of '{}'".format(command)
+                raise CommandErrorException(msg)
+            time.sleep(STREAM_READ_INTERVAL)
+
+    def _answer_pager(self, output):
+        """Request the next page when output ends with the pager prompt, and remove the prompt."""
+        if not self._paging_disabled and '---- More ----' in output:
+            output = parsers.MORE_PROMPT.sub('', output)
+            self.device.write_channel(' ')
+        return output
+
+    def _send_command_batch(self, commands):
+        """
+        Send commands in a single channel write and return their outputs, in order.
+
+        The device runs them back to back; the combined output is split per command on the
+        prompt that precedes each echo, so the prompt round trip is paid once per batch.
+        """
+        if not commands:
+            return []
+        self.device.clear_buffer()
+        self.device.write_channel(''.join(self.device.normalize_cmd(command) for command in commands))
+        output = self._read_prompts(len(commands), commands[-1], '; '.join(commands))
+
+        sections = parsers.split_by_prompt(output.replace('\r\n', '\n'), self.device.base_prompt)
+        if len(sections) > len(commands) + 1 and not sections[0].strip():
+            # the prompt of the previous command was still in the channel
+            sections.pop(0)
+        outputs = []
+        for command, section in zip(commands, sections):
+            echo, _, section_output = section.partition('\n')
+            if command not in echo:
+                section_output = section
+            outputs.append(section_output.rstrip('\n'))
+        return outputs
+
+    def _read_prompts(self, count, command, label, prompt_start=None):
+        """
+        Read the channel until count prompts started a line, the last one ending the output.
+
+        command is the last command written, label the name the read is instrumented under.
+        prompt_start is the pattern of the prompts, those of base_prompt by default.
+        """
+        if prompt_start is None:
+            prompt_start = parsers.prompt_start_pattern(self.device.base_prompt)
+        timer = None if self.stats is None else self.stats.start_command(label)
+        output = ''
+        seen = 0
+        # only what follows the last prompt found is searched again
+        scanned = 0
+        while True:
+            output = self._answer_pager(output + self._read_channel_chunk(command, timer))
+            for match in prompt_start.finditer(output, scanned):
+                seen += 1
+                scanned = match.end()
+            if seen >= count and not output[scanned:].strip():
+                if timer is not None:
+                    timer.done()
+                return output
+
+    def _send_snapshot_commands(self, commands):
+        """Send commands, reusing fresh snapshots, in one batch when batch_commands is set."""
+        outputs = {command: self._snapshot.get(command) for command in commands}
+        missing = [command for command in commands if outputs[command] is None]
+        if self.batch_commands and len(missing) > 1:
+            fetched = self._send_command_batch(missing)
+        else:
+            fetched = [self._send_command(command) for command in missing]
+        for command, output in zip(missing, fetched):
+            self._snapshot.put(command, output)
+            outputs[command] = output
+        return [outputs[command] for command in commands]
+
+    def _iter_command_fields(self, command, split_line):
+        """Yield the fields split_line finds in each line of the streamed output of command."""
+        for line in self._iter_command_lines(command):
+            fields = split_line(line)
+            if fields is not None:
+                yield fields
+
+    def _snapshot_sections(self, command, separator):
+        """Return the output of command split by separator, reusing the session snapshot."""
+        sections = self._snapshot.get_sections(command, separator)
+        if sections is None:
+            sections = self._separate_section(separator, self._send_snapshot_command(command))
+            self._snapshot.put_sections(command, separator, sections)
+        return sections
+
+    @staticmethod
+    def _separate_section(separator, content):
+        return parsers.separate_sections(separator, content)
+
+    def _interface_sections(self, interfaces):
+        """Return the 'display interface' sections of interfaces, names or ranges, one command per interface."""
+        names = parsers.expand_interfaces(interfaces)
+        outputs = self._send_snapshot_commands(['display interface {}'.format(name) for name in names])
+        sections = []
+        for name, output in zip(names, outputs):
+            if parsers.COMMAND_ERROR.search(output):
+                msg = "Cannot display interface {}: {}".format(name, output.strip())
+                raise CommandErrorException(msg)
+            sections.extend(self._separate_section(parsers.INTERFACE_SEPARATOR, output))
+        return sections
+
+    @staticmethod
+    def _select_interfaces(result, interfaces):
+        """
+        Return the entries of result named in interfaces, names or ranges, all of them when None.
+
+        Names are compared in full and regardless of case, 'GE1/0/1' selects 'GigabitEthernet1/0/1'.
+        """
+        if interfaces is None:
+            return result
+        names = dict((parsers.canonical_interface_name(name).lower(), name) for name in result)
+        selected = {}
+        for wanted in parsers.expand_interfaces(interfaces):
+            name = names.get(parsers.canonical_interface_name(wanted).lower())
+            if name is not None:
+                selected[name] = result[name]
+        return selected
 
     def _delete_file(self, filename):
         command = 'delete /unreserved /quiet {0}'.format(filename)
-        self.device.send_command(command)
+        self._send_command(command)
 
-    def _save_config(self, filename=''):
-        """Save the current running config to the given file."""
+    @contextmanager
+    def _timed(self, step):
+        """Add the seconds spent in the block to commit_timings[step]."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.commit_timings[step] = self.commit_timings.get(step, 0.0) + time.time() - start
+
+    def _save_checkpoint(self):
+        """Keep the running configuration for rollback(), as the checkpoint option says."""
+        if self.checkpoint == 'running':
+            # read from the device, never from the config cache: rollback() must restore what runs
+            self.backup_config = self._send_command('display current-configuration')
+        elif self.checkpoint == 'archive':
+            self.backup_file = self._archive_config()
+        else:
+            self.backup_file = 'config_' + datetime.now().strftime("%Y%m%d_%H%M") + '.cfg'
+            if self._check_file_exists(self.backup_file):
+                self._delete_file(self.backup_file)
+            self._save_config(self.backup_file)
+
+    def _archive_config(self):
+        """Archive the running configuration, return the path of the archive file."""
+        output = self._netmiko_send('archive configuration', expect_string=r'Y/N|<.+>')
+        if 'Y/N' in output:
+            output += self._netmiko_send('y', expect_string=r'<.+>')
+        match = re.search(r"(\S+\.cfg)", output)
+        if match is None:
+            msg = "Failed to archive config. Command output:{}".format(output)
+            raise CommandErrorException(msg)
+        if self._archive_location is None:
+            location = re.search(r"Location\s*:\s*(\S+)", self._send_command('display archive configuration'))
+            self._archive_location = location.group(1).rstrip('/') if location else ''
+        if not self._archive_location:
+            return match.group(1)
+        return '{}/{}'.format(self._archive_location, match.group(1).split('/')[-1])
+
+    def _restore_running_checkpoint(self):
+        """Upload the configuration kept by the 'running' checkpoint and roll back to it."""
+        filename = self._create_tmp_file(self.backup_config)
+        dest = 'napalm_rollback.cfg'
+        try:
+            self._transfer_file(filename, dest)
+        finally:
+            os.remove(filename)
+        self._load_config(dest)
+
+    def _save_config(self, filename='', force=False):
+        """Save the current running config to the given file, to the startup file without confirmation if force."""
+        if force:
+            save_log = self._netmiko_send('save force', expect_string=r'<.+>')
+            if re.search("successfully", save_log, re.M) is None:
+                msg = "Failed to save config. Command output:{}".format(save_log)
+                raise CommandErrorException(msg)
+            return
         command = 'save {}'.format(filename)
-        save_log = self.device.send_command(command, max_loops=10, expect_string=r'Y/N')
+        save_log = self._netmiko_send(command, max_loops=10, expect_string=r'Y/N')
         # Search pattern will not be detected when set a new hostname, so don't use auto_find_prompt=False
-        save_log += self.device.send_command('y', expect_string=r'<.+>')
+        save_log += self._netmiko_send('y', expect_string=r'<.+>')
         search_result = re.search("successfully", save_log, re.M)
         if search_result is None:
             msg = "Failed to save config. Command output:{}".format(save_log)
@@ -934,11 +1239,11 @@ class CMWDriver(NetworkDriver):
 
     def _load_config(self, config_file):
         command = 'rollback configuration to file {0}'.format(config_file)
-        rollback_result = self.device.send_command(command, expect_string=r'Y/N')
-        rollback_result += self.device.send_command('y', expect_string=r'[<\[].+[>\]]')
+        rollback_result = self._netmiko_send(command, expect_string=r'Y/N')
+        rollback_result += self._netmiko_send('y', expect_string=r'[<\[].+[>\]]')
         search_result = re.search("clear the information", rollback_result, re.M)
         if search_result is not None:
-            rollback_result += self.device.send_command('y', expect_string=r'<.+>')
+            rollback_result += self._netmiko_send('y', expect_string=r'<.+>')
 
         search_result = re.search("succeeded|finished", rollback_result, re.M)
         if search_result is None:
@@ -946,55 +1251,167 @@ class CMWDriver(NetworkDriver):
             raise CommandErrorException(msg)
 
     def _replace_candidate(self, filename, config):
-        if not filename:
-            filename = self._create_tmp_file(config)
+        tmp_file = not filename
+        if tmp_file:
+            # named after its content: loading the same config again finds it on the device
+            name = 'napalm_{}.cfg'.format(hashlib.md5(config.encode('utf-8')).hexdigest())
+            filename = self._create_tmp_file(config, name)
         else:
             if not os.path.isfile(filename):
                 raise ReplaceConfigException("File {} not found".format(filename))
 
         self.replace_file = filename
+        try:
+            self._upload_candidate()
+        finally:
+            if tmp_file:
+                shutil.rmtree(os.path.dirname(filename), ignore_errors=True)
+        self.config_replace = True
 
+    def _upload_candidate(self):
+        """Upload replace_file to the device, unless the same file is already there."""
         if not self._enough_space(self.replace_file):
             msg = 'Could not transfer file. Not enough space on device.'
             raise ReplaceConfigException(msg)
 
-        need_transfer = True
-        if self._check_file_exists(self.replace_file):
-            if self._check_md5(self.replace_file):
-                need_transfer = False
-        if need_transfer:
-            dest = os.path.basename(self.replace_file)
+        dest = os.path.basename(self.replace_file)
+        local_md5 = self._get_local_md5(self.replace_file)
+        if not self._remote_file_matches(dest, local_md5):
             # full_remote_path = 'flash:/{}'.format(dest)
-            with paramiko.SSHClient() as ssh:
-                ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-                ssh.connect(hostname=self.hostname, username=self.username, password=self.password, port=self.port,
-                            look_for_keys=False)
-
-                try:
-                    with paramiko.SFTPClient.from_transport(ssh.get_transport()) as sftp_client:
-                        sftp_client.put(self.replace_file, dest)
-                    # with SCPClient(ssh.get_transport()) as scp_client:
-                    #     scp_client.put(self.replace_file, dest)
-                except Exception as e:
-                    msg = 'Could not transfer file. There was an error during transfer:' + str(e)
-                    raise ReplaceConfigException(msg)
-        self.config_replace = True
-        if config and os.path.isfile(self.replace_file):
-            os.remove(self.replace_file)
+            try:
+                self._transfer_file(self.replace_file, dest)
+            except Exception as e:
+                msg = 'Could not transfer file. There was an error during transfer:' + str(e)
+                raise ReplaceConfigException(msg)
+            if self.verify_transfer and self._get_remote_md5(dest) != local_md5:
+                raise ReplaceConfigException('Could not transfer file. md5 differs after transfer.')
+            self._index_remote_file(dest, local_md5)
+
+    def _transfer_file(self, filename, dest):
+        """
+        Upload filename to dest on the device over SFTP and return the transfer statistics.
+
+        The SFTP channel is opened on the transport of the open session, pooled or not. A
+        second login, with the key_file/use_keys arguments, is only made when there is no
+        such transport (telnet) or the device refuses the channel.
+        """
+        start = time.time()
+        ssh = None
+        sftp_client = None
+        transport = self._session_transport()
+        if transport is not None:
+            try:
+                sftp_client = paramiko.SFTPClient.from_transport(transport)
+            except (paramiko.SSHException, EOFError, socket.error):
+                sftp_client = None
+        reused_transport = sftp_client is not None
+        try:
+            if sftp_client is None:
+                ssh = self._ssh_login()
+                sftp_client = paramiko.SFTPClient.from_transport(ssh.get_transport())
+            with sftp_client:
+                size = self._sftp_put(sftp_client, filename, dest)
+        finally:
+            if ssh is not None:
+                ssh.close()
+
+        seconds = time.time() - start
+        self.transfer_stats = {
+            'file': dest,
+            'bytes': size,
+            'seconds': seconds,
+            'bytes_per_second': size / seconds if seconds else 0.0,
+            'reused_transport': reused_transport,
+        }
+        return self.transfer_stats
+
+    def _session_transport(self):
+        """Return the paramiko transport of the open SSH session, None when there is none."""
+        if self.transport != 'ssh':
+            return None
+        remote_conn_pre = getattr(self.device, 'remote_conn_pre', None)
+        if remote_conn_pre is None:
+            return None
+        transport = remote_conn_pre.get_transport()
+        if transport is None or not transport.is_active():
+            return None
+        return transport
+
+    def _ssh_login(self):
+        """Open a new SSH connection with the credentials and keys of the driver."""
+        use_keys = self.netmiko_optional_args.get('use_keys', False)
+        ssh = paramiko.SSHClient()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        ssh.connect(hostname=self.hostname, username=self.username, password=self.password, port=self.port,
+                    key_filename=self.netmiko_optional_args.get('key_file') if use_keys else None,
+                    look_for_keys=use_keys, allow_agent=self.netmiko_optional_args.get('allow_agent', False),
+                    timeout=self.timeout)
+        return ssh
+
+    @staticmethod
+    def _sftp_put(sftp_client, filename, dest):
+        """Write filename to dest with pipelined requests, return the number of bytes sent."""
+        size = 0
+        with open(filename, 'rb') as local_file:
+            with sftp_client.open(dest, 'wb', SFTP_CHUNK_SIZE) as remote_file:
+                # do not wait for the status of each write, they are all checked on close
+                remote_file.set_pipelined(True)
+                data = local_file.read(SFTP_CHUNK_SIZE)
+                while data:
+                    remote_file.write(data)
+                    size += len(data)
+                    data = local_file.read(SFTP_CHUNK_SIZE)
+        remote_size = sftp_client.stat(dest).st_size
+        if remote_size != size:
+            raise IOError('{} is {} bytes on the device, {} were sent'.format(dest, remote_size, size))
+        return size
 
     def _verify_remote_file_exists(self, dst, file_system='flash:'):
         command = 'dir {0}/{1}'.format(file_system, dst)
-        output = self.device.send_command(command)
+        output = self._send_command(command)
         if 'No file found' in output:
             raise ReplaceConfigException('Could not transfer file.')
 
     def _check_file_exists(self, cfg_file):
         command = 'dir {}'.format(cfg_file)
-        output = self.device.send_command(command)
+        output = self._send_command(command)
         if 'No file found' in output:
             return False
         return True
 
+    def _get_remote_file_listing(self, filename):
+        """Return (size, mtime) of filename on the device, None when it does not exist."""
+        return parsers.parse_dir_entry(self._send_command('dir {}'.format(filename)), filename)
+
+    def _remote_file_matches(self, filename, md5):
+        """
+        Tell whether filename on the device has md5.
+
+        The transfer index answers from a 'dir' listing when the size and mtime of the file
+        did not change since it was indexed, otherwise the md5 is computed on the device.
+        """
+        listing = self._get_remote_file_listing(filename)
+        if listing is None:
+            return False
+        size, mtime = listing
+        if (self.transfer_index is not None and not self.verify_transfer and
+                self.transfer_index.matches(self.hostname, filename, size, mtime, md5)):
+            return True
+        if self._get_remote_md5(filename) != md5:
+            return False
+        self._index_remote_file(filename, md5, listing)
+        return True
+
+    def _index_remote_file(self, filename, md5, listing=None):
+        """Record filename on the device in the transfer index, when there is one."""
+        if self.transfer_index is None:
+            return
+        if listing is None:
+            listing = self._get_remote_file_listing(filename)
+        if listing is not None:
+            size, mtime = listing
+            self.transfer_index.record(self.hostname, filename, size, mtime, md5)
+
     def _check_md5(self, dst):
         dst_hash = self._get_remote_md5(dst)
         src_hash = self._get_local_md5(dst)
@@ -1015,7 +1432,7 @@ class CMWDriver(NetworkDriver):
 
     def _get_remote_md5(self, dst):
         command = 'display system file-md5 {0}'.format(dst)
-        output = self.device.send_command(command)
+        output = self._send_command(command)
         filename = os.path.basename(dst)
         match = re.search(filename + r'\s+(?P<md5>\w+)', output, re.M)
         if match is None:
@@ -1028,42 +1445,90 @@ class CMWDriver(NetworkDriver):
         output = ''
 
         try:
-            output += self.device.send_command('system-view', expect_string=r'\[.+\]')
-            for command in commands:
-                output += self.device.send_command(command, expect_string=r'\[.+\]')
+            output += self._netmiko_send('system-view', expect_string=r'\[.+\]')
+            error = None
+            for start in range(0, len(commands), self.merge_window):
+                window = commands[start:start + self.merge_window]
+                window_output, rejected = self._send_config_window(window)
+                output += window_output
+                if rejected is not None:
+                    if rejected >= 0:
+                        error = 'line {}: {}'.format(start + rejected + 1, window[rejected])
+                    else:
+                        error = 'lines {} to {}'.format(start + 1, start + len(window))
+                    # nothing after a failing window is sent
+                    break
 
             if self.device.check_config_mode():
-                check_error = re.search("error", output, re.IGNORECASE)
-                if check_error is not None:
-                    return_log = self.device.send_command('return', expect_string=r'[<\[].+[>\]]')
-                    if 'Uncommitted configurations' in return_log:
-                        # Discard uncommitted configuration
-                        return_log += self.device.send_command('n', expect_string=r'<.+>')
-                    output += return_log
-                    raise MergeConfigException('Error while applying config!')
-                output += self.device.send_command('commit', expect_string=r'\[.+\]')
-                output += self.device.send_command('return', expect_string=r'<.+>')
+                if error is not None:
+                    output += self._leave_system_view()
+                    raise MergeConfigException('Error while applying config, {}'.format(error))
+                output += self._netmiko_send('commit', expect_string=r'\[.+\]')
+                output += self._netmiko_send('return', expect_string=r'<.+>')
             else:
                 raise MergeConfigException('Not in configuration mode.')
+        except MergeConfigException as e:
+            raise MergeConfigException(str(e) + '\nconfiguration output: ' + output)
+        except Exception as e:
+            # a window that timed out leaves the session in system-view
+            output += self._leave_system_view()
+            raise MergeConfigException(str(e) + '\nconfiguration output: ' + output)
+
+    def _leave_system_view(self):
+        """Return to user view, discarding uncommitted configuration, and return the output; best effort."""
+        try:
+            output = self._netmiko_send('return', expect_string=r'[<\[].+[>\]]')
+            if 'Uncommitted configurations' in output:
+                output += self._netmiko_send('n', expect_string=r'<.+>')
+            return output
         except Exception as e:
-            msg = str(e) + '\nconfiguration output: ' + output
-            raise MergeConfigException(msg)
+            return '\ncannot return to user view: {}'.format(e)
+
+    def _send_config_window(self, window):
+        """
+        Write the configuration lines of window at once, and read their output back.
+
+        Return the output and the index in window of the first line the device rejected,
+        None when all were accepted. The output is split per line on the prompt that follows
+        each one; when it cannot be, any error in the window gives -1. Prompts of any name are
+        counted, a sysname line renaming the device within the window. The prompt expected
+        next follows the last sysname line the device accepted, or is read back when the
+        output cannot be split.
+        """
+        self.device.write_channel(''.join(self.device.normalize_cmd(line) for line in window))
+        output = self._read_prompts(len(window), window[-1], 'configuration window', parsers.ANY_PROMPT_START)
+
+        sections = parsers.ANY_PROMPT_START.split(output.replace('\r\n', '\n'))[:-1]
+        if len(sections) > len(window) and not sections[0].strip():
+            # the prompt of the previous command was still in the channel
+            sections.pop(0)
+        if len(sections) == len(window):
+            rejected = None
+            for index, (line, section) in enumerate(zip(window, sections)):
+                # the echo of the line may contain 'error' itself
+                if parsers.CONFIG_ERROR.search(section.partition('\n')[2]):
+                    if rejected is None:
+                        rejected = index
+                elif line.startswith('sysname '):
+                    self.device.base_prompt = line.split(None, 1)[1].strip()
+            return output, rejected
+        if any(line.startswith('sysname ') for line in window):
+            self.device.set_base_prompt()
+        lines = [line for line in output.splitlines() if not any(command in line for command in window)]
+        if parsers.CONFIG_ERROR.search('\n'.join(lines)):
+            return output, -1
+        return output, None
 
     def _get_merge_diff(self):
-        diff = []
-        running_config = self.get_config(retrieve='running')['running']
-        running_lines = running_config.splitlines()
-        for line in self.merge_candidate.splitlines():
-            if line not in running_lines and line:
-                if line[0].strip() != '!':
-                    diff.append(line)
+        running = self._get_parsed_config().tree
+        diff = cmw_config.merge_diff(running, cmw_config.parse_config(self.merge_candidate))
         return '\n'.join(diff)
 
     def _get_diff(self, filename=None):
         """Get a diff between running config and a proposed file."""
         if filename is None:
-            return self.device.send_command('display configuration changes')
-        return self.device.send_command('display configuration changes running file ' + filename)
+            return self._send_command('display configuration changes')
+        return self._send_command('display configuration changes running file ' + filename)
 
     def _enough_space(self, filename):
         flash_size = self._get_flash_size()
@@ -1074,7 +1539,7 @@ class CMWDriver(NetworkDriver):
 
     def _get_flash_size(self):
         command = 'dir {}'.format('flash:')
-        output = self.device.send_command(command)
+        output = self._send_command(command)
 
         match = re.search(r'\(\d.*KB free\)', output, re.M)
         if match is None:
@@ -1083,7 +1548,7 @@ class CMWDriver(NetworkDriver):
 
         kbytes_free = 0
         num_list = map(int, re.findall(r'\d+', match.group()))
-        for index, val in enumerate(reversed([num_list])):
+        for index, val in enumerate(reversed(list(num_list))):
             kbytes_free += val * (1000 ** index)
         bytes_free = kbytes_free * 1024
         return bytes_free
@@ -1091,36 +1556,17 @@ class CMWDriver(NetworkDriver):
     @staticmethod
     def _parse_uptime(uptime_str):
         """Return the uptime in seconds as an integer."""
-        (years, weeks, days, hours, minutes, seconds) = (0, 0, 0, 0, 0, 0)
-
-        years_regx = re.search(r"(?P<year>\d+)\syear", uptime_str)
-        if years_regx is not None:
-            years = int(years_regx.group(1))
-        weeks_regx = re.search(r"(?P<week>\d+)\sweek", uptime_str)
-        if weeks_regx is not None:
-            weeks = int(weeks_regx.group(1))
-        days_regx = re.search(r"(?P<day>\d+)\sday", uptime_str)
-        if days_regx is not None:
-            days = int(days_regx.group(1))
-        hours_regx = re.search(r"(?P<hour>\d+)\shour", uptime_str)
-        if hours_regx is not None:
-            hours = int(hours_regx.group(1))
-        minutes_regx = re.search(r"(?P<minute>\d+)\sminute", uptime_str)
-        if minutes_regx is not None:
-            minutes = int(minutes_regx.group(1))
-        seconds_regx = re.search(r"(?P<second>\d+)\ssecond", uptime_str)
-        if seconds_regx is not None:
-            seconds = int(seconds_regx.group(1))
-
-        uptime_sec = (years * YEAR_SECONDS) + (weeks * WEEK_SECONDS) + (days * DAY_SECONDS) + \
-                     (hours * 3600) + (minutes * 60) + seconds
-        return uptime_sec
+        return parsers.parse_uptime(uptime_str)
 
     @staticmethod
-    def _create_tmp_file(config):
-        tmp_dir = tempfile.gettempdir()
-        rand_fname = py23_compat.text_type(uuid.uuid4())
-        filename = os.path.join(tmp_dir, rand_fname)
+    def _create_tmp_file(config, name=None):
+        """Write config to a temporary file, named name in a directory of its own when given."""
+        if name is None:
+            tmp_dir = tempfile.gettempdir()
+            name = py23_compat.text_type(uuid.uuid4())
+        else:
+            tmp_dir = tempfile.mkdtemp()
+        filename = os.path.join(tmp_dir, name)
         with open(filename, 'wt') as fobj:
             fobj.write(config)
         return filename
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Timings of the commands a CMWDriver sends and of the getters parsing their output.
+
+For every command: the bytes received, the time to the first byte after the command was
+written, and the channel time, spent waiting for output. For every getter: the time of the
+call, the channel time of the commands it sent, and the rest, spent parsing. A slow getter
+with a small parse time is waiting for the device.
+
+Instrumentation is off unless optional_args['instrumentation'] is set, to True or to a
+DriverStats shared by several drivers. Without it the getters are not wrapped, and reading
+the channel only checks that there is no timer.
+
+Sample usage:
+    device = CMWDriver('10.0.0.1', 'admin', 'admin', optional_args={'instrumentation': True})
+    device.open()
+    device.get_interfaces_counters()
+    print(device.stats.to_dict()['getters']['get_interfaces_counters'])
+    print(device.stats.to_prometheus())
+"""
+
+from collections import OrderedDict
+import functools
+import re
+import threading
+import time
+
+COMMAND_FIELDS = ('count', 'bytes', 'ttfb_seconds', 'channel_seconds')
+GETTER_FIELDS = ('count', 'seconds', 'channel_seconds', 'parse_seconds')
+
+# Key of the commands recorded once DriverStats holds max_commands of them
+OTHER_COMMANDS = 'other'
+
+# Arguments holding a digit: interface names, VLAN ids, addresses, file names with a hash
+_RE_NUMBERED_ARGUMENT = re.compile(r"(?<=\s)\S*\d\S*")
+
+# (metric suffix, field, type, help) of the Prometheus export
+COMMAND_METRICS = (
+    ('command_total', 'count', 'counter', 'Commands sent.'),
+    ('command_received_bytes_total', 'bytes', 'counter', 'Bytes of command output received.'),
+    ('command_ttfb_seconds_total', 'ttfb_seconds', 'counter',
+     'Seconds from writing a command to the first byte of its output.'),
+    ('command_channel_seconds_total', 'channel_seconds', 'counter', 'Seconds spent waiting for command output.'),
+)
+GETTER_METRICS = (
+    ('getter_calls_total', 'count', 'counter', 'Getter calls.'),
+    ('getter_seconds_total', 'seconds', 'counter', 'Seconds spent in getters.'),
+    ('getter_channel_seconds_total', 'channel_seconds', 'counter',
+     'Seconds getters spent waiting for command output.'),
+    ('getter_parse_seconds_total', 'parse_seconds', 'counter', 'Seconds getters spent out of the channel.'),
+)
+
+
+def instrument(driver, names):
+    """
+    Time the getters names of driver in driver.stats.
+
+    The bound methods are replaced on the instance only, the class and the drivers
+    without instrumentation are left untouched.
+    """
+    for name in names:
+        setattr(driver, name, _timed(driver.stats, name, getattr(driver, name)))
+
+
+def normalize_command(command):
+    """Return the key command is totalled under, its arguments holding a digit replaced by '*'."""
+    return _RE_NUMBERED_ARGUMENT.sub('*', ' '.join(command.split()))
+
+
+def _timed(stats, name, getter):
+    @functools.wraps(getter)
+    def wrapper(*args, **kwargs):
+        return stats.time_getter(name, getter, *args, **kwargs)
+    return wrapper
+
+
+class CommandTimer(object):
+    """Measures one command, from the write to the end of its output."""
+
+    __slots__ = ('stats', 'command', 'started', 'first_byte', 'received', 'channel_seconds')
+
+    def __init__(self, stats, command):
+        self.stats = stats
+        self.command = command
+        self.started = time.time()
+        self.first_byte = None
+        self.received = 0
+        self.channel_seconds = 0.0
+
+    def chunk(self, data, waited_since):
+        """Count data, read from the channel after waiting since waited_since."""
+        now = time.time()
+        if self.first_byte is None:
+            self.first_byte = now - self.started
+        self.received += len(data.encode('utf-8'))
+        self.channel_seconds += now - waited_since
+
+    def done(self):
+        self.stats.record_command(self.command, self.received, self.first_byte or 0.0, self.channel_seconds)
+
+
+class DriverStats(object):
+    """
+    Totals per command and per getter, safe to share between drivers in several threads.
+
+    Commands are totalled under normalize_command(), so that 'display interface GE1/0/1'
+    and 'display interface GE1/0/2' share a key, and beyond max_commands keys under
+    OTHER_COMMANDS. callback, when given, is called with (kind, name, values) for every
+    command and getter recorded, kind being 'command' or 'getter', name the command as sent
+    or the getter, and values a dictionary of their fields.
+    """
+
+    def __init__(self, callback=None, max_commands=256):
+        self.callback = callback
+        self.max_commands = max_commands
+        self._lock = threading.Lock()
+        # channel time of the current thread, read before and after a getter
+        self._local = threading.local()
+        self.commands = OrderedDict()
+        self.getters = OrderedDict()
+
+    def start_command(self, command):
+        """Return a CommandTimer for command, just written to the channel."""
+        return CommandTimer(self, command)
+
+    def record_command(self, command, received, ttfb, channel_seconds):
+        self._local.channel_seconds = self._channel_seconds() + channel_seconds
+        values = (1, received, ttfb, channel_seconds)
+        self._add(self.commands, normalize_command(command), COMMAND_FIELDS, values, self.max_commands)
+        if self.callback is not None:
+            self.callback('command', command, dict(zip(COMMAND_FIELDS[1:], values[1:])))
+
+    def time_getter(self, name, getter, *args, **kwargs):
+        """Call getter and record its time under name."""
+        channel_start = self._channel_seconds()
+        start = time.time()
+        try:
+            return getter(*args, **kwargs)
+        finally:
+            self.record_getter(name, time.time() - start, self._channel_seconds() - channel_start)
+
+    def _channel_seconds(self):
+        """Channel time of the commands recorded by the current thread so far."""
+        return getattr(self._local, 'channel_seconds', 0.0)
+
+    def record_getter(self, name, seconds, channel_seconds):
+        values = (1, seconds, channel_seconds, max(seconds - channel_seconds, 0.0))
+        self._add(self.getters, name, GETTER_FIELDS, values)
+        if self.callback is not None:
+            self.callback('getter', name, dict(zip(GETTER_FIELDS[1:], values[1:])))
+
+    def _add(self, totals, name, fields, values, max_names=None):
+        with self._lock:
+            if name not in totals and max_names is not None and len(totals) >= max_names:
+                name = OTHER_COMMANDS
+            entry = totals.get(name)
+            if entry is None:
+                entry = totals[name] = dict.fromkeys(fields, 0)
+            for field, value in zip(fields, values):
+                entry[field] += value
+
+    def reset(self):
+        """Forget every total."""
+        with self._lock:
+            self.commands.clear()
+            self.getters.clear()
+
+    def to_dict(self):
+        """Return {'commands': {command: totals}, 'getters': {getter: totals}}."""
+        with self._lock:
+            return {
+                'commands': dict((name, dict(entry)) for name, entry in self.commands.items()),
+                'getters': dict((name, dict(entry)) for name, entry in self.getters.items()),
+            }
+
+    def to_prometheus(self, prefix='napalm_h3c_cmw', labels=None):
+        """
+        Return the totals in the Prometheus text exposition format.
+
+        labels is a dictionary of labels added to every sample, e.g. {'device': '10.0.0.1'}.
+        """
+        totals = self.to_dict()
+        extra = ''.join('{}="{}",'.format(key, _escape(value)) for key, value in sorted((labels or {}).items()))
+        lines = []
+        for metrics, label, entries in ((COMMAND_METRICS, 'command', totals['commands']),
+                                        (GETTER_METRICS, 'getter', totals['getters'])):
+            for suffix, field, metric_type, description in metrics:
+                name = '{}_{}'.format(prefix, suffix)
+                lines.append('# HELP {} {}'.format(name, description))
+                lines.append('# TYPE {} {}'.format(name, metric_type))
+                for key in sorted(entries):
+                    lines.append('{}{{{}{}="{}"}} {}'.format(name, extra, label, _escape(key), entries[key][field]))
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
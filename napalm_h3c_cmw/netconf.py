@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+NETCONF transport for the structured getters of CMWDriver.
+
+Comware 7 serves the tables behind 'display interface', 'display arp', 'display mac-address'
+and 'display lldp neighbor-information' over NETCONF. NetconfSession sends one <get> per
+getter, its subtree filter asking only for the columns the getter uses, and reads the rows
+of the reply with lxml's iterparse, clearing each row once read, instead of parsing CLI
+text with regexes. ncclient is used for the session only: the reply is handed over as
+received, without the tree ncclient would otherwise build. ncclient buffers the whole
+reply before handing it over, so the reply text itself is held in memory and no row is
+read before it has fully arrived; what iterparse bounds is the parsed tree, freed row by
+row rather than built for the whole reply.
+
+With optional_args['transport'] = 'netconf', CMWDriver serves get_interfaces(),
+get_interfaces_counters(), get_arp_table(), get_mac_address_table() and
+get_lldp_neighbors() from a NetconfSession on optional_args['netconf_port'] (830), the
+CLI session being opened over ssh for everything else.
+
+Sample usage:
+    session = NetconfSession('10.0.0.1', 'admin', 'admin')
+    session.open()
+    print(session.get_interfaces_counters())
+    session.close()
+"""
+
+import io
+import socket
+
+import napalm.base.helpers
+from napalm.base.exceptions import ConnectionException, CommandErrorException
+from napalm.base.utils import py23_compat
+from napalm_h3c_cmw import parsers
+
+try:
+    from lxml import etree
+    from ncclient import manager, NCClientError
+    from ncclient.operations.retrieve import Get
+    from ncclient.operations.rpc import RPCReply
+except ImportError:
+    manager = None
+
+NETCONF_PORT = 830
+
+BASE_NS = 'urn:ietf:params:xml:ns:netconf:base:1.0'
+DATA_NS = 'http://www.h3c.com/netconf/data:1.0'
+
+# Value of AdminStatus and OperStatus of an interface that is up
+STATUS_UP = '1'
+
+# Tables read by the getters, the path of their rows under <top> and the columns used
+INTERFACES = ('Ifmgr/Interfaces/Interface',
+              ('IfIndex', 'Name', 'AbbreviatedName', 'Description', 'AdminStatus', 'OperStatus',
+               'ActualSpeed', 'MAC', 'MTU'))
+INTERFACE_NAMES = ('Ifmgr/Interfaces/Interface', ('IfIndex', 'AbbreviatedName'))
+STATISTICS = ('Ifmgr/Statistics/Interface',
+              ('IfIndex', 'Name', 'InOctets', 'InUcastPkts', 'InDiscards', 'InErrors',
+               'OutOctets', 'OutUcastPkts', 'OutDiscards', 'OutErrors'))
+ETH_STATISTICS = ('Ifmgr/EthPortStatistics/Interface',
+                  ('IfIndex', 'InBrdcastPkts', 'InMulticastPkts', 'OutBrdcastPkts', 'OutMulticastPkts'))
+ARP = ('ARP/ArpTable/ArpEntry', ('IfIndex', 'PortIndex', 'Ipv4Addr', 'MacAddress'))
+MAC_ADDRESSES = ('MAC/MacUnicastTable/Unicast', ('VLANID', 'MacAddress', 'PortIndex', 'Status'))
+LLDP_NEIGHBORS = ('LLDP/NeighborSystems/Neighbor', ('IfIndex', 'SystemName', 'PortId'))
+
+# get_interfaces_counters() key of the columns of STATISTICS and ETH_STATISTICS
+COUNTER_COLUMNS = {
+    'InOctets': 'rx_octets',
+    'InUcastPkts': 'rx_unicast_packets',
+    'InDiscards': 'rx_discards',
+    'InErrors': 'rx_errors',
+    'OutOctets': 'tx_octets',
+    'OutUcastPkts': 'tx_unicast_packets',
+    'OutDiscards': 'tx_discards',
+    'OutErrors': 'tx_errors',
+    'InBrdcastPkts': 'rx_broadcast_packets',
+    'InMulticastPkts': 'rx_multicast_packets',
+    'OutBrdcastPkts': 'tx_broadcast_packets',
+    'OutMulticastPkts': 'tx_multicast_packets',
+}
+
+# 'display mac-address' type of the Status of a MacUnicastTable row
+MAC_STATUS = {
+    '1': 'dynamic',
+    '2': 'static',
+    '3': 'blackhole',
+    '4': 'security',
+    '5': 'sec-config',
+    '6': 'sticky',
+}
+
+
+def subtree_filter(tables):
+    """Return the <top> subtree filter element selecting the columns of tables, (path, columns) pairs."""
+    top = etree.Element('{{{}}}top'.format(DATA_NS), nsmap={None: DATA_NS})
+    for path, columns in tables:
+        node = top
+        for name in path.split('/'):
+            tag = '{{{}}}{}'.format(DATA_NS, name)
+            child = node.find(tag)
+            if child is None:
+                child = etree.SubElement(node, tag)
+            node = child
+        for column in columns:
+            if node.find('{{{}}}{}'.format(DATA_NS, column)) is None:
+                etree.SubElement(node, '{{{}}}{}'.format(DATA_NS, column))
+    return top
+
+
+def iter_rows(reply, tables):
+    """
+    Yield (table, row) for every row of tables found in reply, a raw <rpc-reply>.
+
+    table is the name of the element holding the rows, e.g. 'Statistics' for
+    'Ifmgr/Statistics/Interface', and row a dictionary of the columns. Rows are cleared
+    once yielded, so the parsed tree does not grow with the reply; reply itself is held
+    whole by the caller. An <rpc-error> raises CommandErrorException.
+    """
+    parents = {}
+    for path, _ in tables:
+        names = path.split('/')
+        row_tag = '{{{}}}{}'.format(DATA_NS, names[-1])
+        parents.setdefault(row_tag, set()).add('{{{}}}{}'.format(DATA_NS, names[-2]))
+    error_tag = '{{{}}}rpc-error'.format(BASE_NS)
+    prefix = len(DATA_NS) + 2
+
+    rows = etree.iterparse(io.BytesIO(reply), events=('end',), tag=list(parents) + [error_tag], huge_tree=True)
+    for _, element in rows:
+        if element.tag == error_tag:
+            message = element.findtext('{{{}}}error-message'.format(BASE_NS)) or 'rpc-error'
+            raise CommandErrorException(message.strip())
+        parent = element.getparent()
+        if parent.tag in parents[element.tag]:
+            yield parent.tag[prefix:], dict((column.tag[prefix:], column.text) for column in element)
+        element.clear()
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+if manager is not None:
+    class _RawReply(RPCReply):
+        """An <rpc-reply> left unparsed, iter_rows() reads it."""
+
+        def parse(self):
+            self._parsed = True
+
+    class _RawGet(Get):
+        REPLY_CLS = _RawReply
+
+
+def interface_entry(row):
+    """Return the get_interfaces() entry of a row of INTERFACES, speed read in kbit/s and returned in Mbit/s."""
+    speed = row.get('ActualSpeed')
+    return {
+        'description': py23_compat.text_type(row.get('Description') or ''),
+        'is_enabled': row.get('AdminStatus') == STATUS_UP,
+        'is_up': row.get('OperStatus') == STATUS_UP,
+        'last_flapped': -1.0,
+        'mac_address': napalm.base.helpers.mac(row['MAC']) if row.get('MAC') else '',
+        'mtu': int(row['MTU']) if row.get('MTU') else -1,
+        'speed': int(speed) // 1000 if speed else -1,
+    }
+
+
+def interfaces_counters(rows):
+    """
+    Return get_interfaces_counters() of (table, row) pairs of STATISTICS and ETH_STATISTICS.
+
+    Interfaces are named by the Statistics rows, broadcast and multicast are counted on the
+    Ethernet ports only. Rows are left unchanged.
+    """
+    counters = {}
+    names = {}
+    for table, row in rows:
+        index = row['IfIndex']
+        if table == 'Statistics':
+            names[index] = row['Name']
+        counter = counters.get(index)
+        if counter is None:
+            counter = counters[index] = parsers.interface_counters({})
+        for column, value in row.items():
+            key = COUNTER_COLUMNS.get(column)
+            if key is not None and value:
+                counter[key] = int(value)
+    return dict((names[index], counter) for index, counter in counters.items() if index in names)
+
+
+class NetconfSession(object):
+    """NETCONF session to a Comware 7 device, the structured getters of CMWDriver over it."""
+
+    def __init__(self, hostname, username, password, port=NETCONF_PORT, timeout=60, key_file=None,
+                 use_keys=False):
+        self.hostname = hostname
+        self.username = username
+        self.password = password
+        self.port = port
+        self.timeout = timeout
+        self.key_file = key_file
+        self.use_keys = use_keys
+        self.manager = None
+        # AbbreviatedName of the interfaces by IfIndex, read once per session
+        self._names = None
+
+    def open(self):
+        if manager is None:
+            raise ConnectionException('the netconf transport requires ncclient, install napalm-h3c-cmw[netconf]')
+        try:
+            self.manager = manager.connect(
+                host=self.hostname, port=self.port, username=self.username, password=self.password,
+                timeout=self.timeout, key_filename=self.key_file if self.use_keys else None,
+                look_for_keys=self.use_keys, allow_agent=False, hostkey_verify=False,
+                device_params={'name': 'h3c'})
+        except (NCClientError, socket.error) as e:
+            raise ConnectionException('Cannot open a NETCONF session to {}:{}: {}'.format(self.hostname, self.port, e))
+        self.manager.timeout = self.timeout
+        self._names = None
+
+    def close(self):
+        if self.manager is not None:
+            try:
+                self.manager.close_session()
+            except (NCClientError, socket.error):
+                pass
+            self.manager = None
+
+    def is_alive(self):
+        return self.manager is not None and self.manager.connected
+
+    def get(self, tables):
+        """
+        Return the raw <rpc-reply> of a <get> of the columns of tables, (path, columns) pairs.
+
+        The reply is returned once ncclient has received all of it, encoded to bytes.
+        """
+        try:
+            reply = self.manager.execute(_RawGet, filter=('subtree', subtree_filter(tables)))
+        except NCClientError as e:
+            raise ConnectionException('NETCONF <get> failed on {}: {}'.format(self.hostname, e))
+        return reply.xml.encode('utf-8')
+
+    def rows(self, *tables):
+        """Yield (table, row) for the rows of tables, see iter_rows()."""
+        return iter_rows(self.get(tables), tables)
+
+    def _interface_namer(self):
+        """
+        Return a function giving the abbreviated name of an interface index, 'GE1/0/1' as in the CLI.
+
+        The names are read once per session, and read again at most once per call on an
+        unknown index; an index still unknown is returned as is.
+        """
+        refreshed = [self._names is None]
+        if self._names is None:
+            self._names = self._read_interface_names()
+
+        def name(index):
+            if index not in self._names and not refreshed[0]:
+                self._names = self._read_interface_names()
+                refreshed[0] = True
+            return self._names.get(index, index)
+        return name
+
+    def _read_interface_names(self):
+        return dict((row['IfIndex'], row['AbbreviatedName']) for _, row in self.rows(INTERFACE_NAMES))
+
+    def get_interfaces(self):
+        """Return get_interfaces(), see interface_entry()."""
+        interfaces = {}
+        names = {}
+        for _, row in self.rows(INTERFACES):
+            names[row['IfIndex']] = row['AbbreviatedName']
+            interfaces[row['Name']] = interface_entry(row)
+        self._names = names
+        return interfaces
+
+    def get_interfaces_counters(self):
+        """Return get_interfaces_counters(), see interfaces_counters()."""
+        return interfaces_counters(self.rows(STATISTICS, ETH_STATISTICS))
+
+    def iter_arp_fields(self):
+        """Yield raw (ip, mac, interface) fields of the ARP table, the port of VLAN interfaces."""
+        name = self._interface_namer()
+        for _, row in self.rows(ARP):
+            port = row.get('PortIndex')
+            index = port if port and port != '0' else row['IfIndex']
+            yield row['Ipv4Addr'], row['MacAddress'], name(index)
+
+    def iter_mac_address_fields(self):
+        """Yield raw (mac, vlan, interface, type) fields of the MAC address table."""
+        name = self._interface_namer()
+        for _, row in self.rows(MAC_ADDRESSES):
+            status = row.get('Status')
+            yield (row['MacAddress'], row['VLANID'], name(row['PortIndex']),
+                   MAC_STATUS.get(status, status))
+
+    def get_lldp_neighbors(self):
+        """Return get_lldp_neighbors()."""
+        neighbors = {}
+        name = self._interface_namer()
+        for _, row in self.rows(LLDP_NEIGHBORS):
+            neighbors.setdefault(name(row['IfIndex']), []).append({
+                'hostname': py23_compat.text_type(row.get('SystemName') or ''),
+                'port': py23_compat.text_type(row.get('PortId') or ''),
+            })
+        return neighbors
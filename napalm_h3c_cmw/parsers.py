@@ -0,0 +1,536 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Text parsers for CMW CLI output.
+
+Every pattern is compiled once at import time, and each 'display interface' block is
+scanned a single time to pull the name, state, protocol, MAC, speed, description and
+all counters together.
+"""
+
+import re
+
+import napalm.base.helpers
+from napalm.base.utils import py23_compat
+
+# Easier to store these as constants
+HOUR_SECONDS = 3600
+DAY_SECONDS = 24 * HOUR_SECONDS
+WEEK_SECONDS = 7 * DAY_SECONDS
+YEAR_SECONDS = 365 * DAY_SECONDS
+
+# Section separators, used with CMWDriver._separate_section
+INTERFACE_SEPARATOR = re.compile(r"(^(?!Line protocol).*current state.*$)", flags=re.M)
+IPV6_INTERFACE_SEPARATOR = re.compile(r"(^(?!IPv6 protocol).*current state.*$)", flags=re.M)
+
+# Comware pager prompt, with the escape sequences it uses to erase itself
+MORE_PROMPT = re.compile(r" *---- More ----(?:\x1b\[\d+D| )*")
+
+# A configuration command was rejected: 'Error: ...' or ' % Unrecognized command found at ...'
+CONFIG_ERROR = re.compile(r"error|^\s*%", flags=re.I | re.M)
+
+# A display command was rejected: ' % Wrong parameter found at '^' position.'
+COMMAND_ERROR = re.compile(r"^\s*%", flags=re.M)
+
+# 'GE1/0/1 to GE1/0/4' and 'GE1/0/1-4', ranges of the last number of an interface name
+_RE_INTERFACE_RANGE = re.compile(
+    r"^(?P<prefix>\S*?)(?P<start>\d+)(?:-(?P<end>\d+)|\s+to\s+(?P<last>\S*?)(?P<last_end>\d+))$")
+
+# Interface types as abbreviated by 'display interface brief', lower case, and their full names
+INTERFACE_ABBREVIATIONS = {
+    'ge': 'GigabitEthernet',
+    'mge': 'M-GigabitEthernet',
+    'xge': 'Ten-GigabitEthernet',
+    'wge': 'Twenty-FiveGigE',
+    'fge': 'FortyGigE',
+    'hge': 'HundredGigE',
+    'bagg': 'Bridge-Aggregation',
+    'ragg': 'Route-Aggregation',
+    'vlan': 'Vlan-interface',
+    'loop': 'LoopBack',
+    'tun': 'Tunnel',
+}
+
+_RE_OS_VERSION = re.compile(r"(?P<os_version>V\S+\s+\S+\s+\S+\s+\S+)")
+_RE_MODEL = re.compile(r"S\S+")
+_RE_UPTIME = tuple(
+    (re.compile(r"(\d+)\s" + unit), seconds) for unit, seconds in (
+        ('year', YEAR_SECONDS), ('week', WEEK_SECONDS), ('day', DAY_SECONDS),
+        ('hour', HOUR_SECONDS), ('minute', 60), ('second', 1)))
+# one neighbor per line, columns never span lines
+_RE_LLDP = re.compile(r"^(?P<hostname>\S+)[ \t]+(?P<local>\S+)[ \t]+\S+[ \t]+(?P<port>[G,T]\S+)", flags=re.M)
+
+_RE_INTF_NAME_STATE = re.compile(
+    r"^(?!Line protocol)(?P<intf_name>\S+).+current state\W+(?P<intf_state>.+)$", flags=re.M)
+_RE_IPV6_INTF_NAME_STATE = re.compile(
+    r"^(?!IPv6 protocol)(?P<intf_name>\S+).+current state\W+(?P<intf_state>.+)$", flags=re.M)
+_RE_INTF_IPV4 = re.compile(
+    r"Internet Address is\s+(?P<ip_address>\d+.\d+.\d+.\d+)\/(?P<prefix_length>\d+)", flags=re.M)
+_RE_INTF_IPV6 = re.compile(r"(?P<ip_address>\S+), subnet is.+\/(?P<prefix_length>\d+)", flags=re.M)
+
+# Per-line patterns of a 'display interface' block. A line is only matched against the
+# patterns whose marker it contains, so each block costs one pass over its lines.
+_RE_PROTOCOL = re.compile(r"Line protocol current state\W+(?P<protocol>.+)$")
+_RE_MAC = re.compile(r"Hardware address is\W+(?P<mac_address>\S+)")
+_RE_SPEED = re.compile(r"^Speed\W+(?P<speed>\d+|\w+)")
+_RE_DESCRIPTION = re.compile(r"^Description\W+(?P<description>.*)$")
+_RE_MTU = re.compile(r"Maximum Transmit Unit\W+(?:is\s+)?(?P<mtu>\d+)")
+
+# (marker, counter, pattern), a counter is spelled "Unicast: 10" or "10 unicasts" by release
+_COUNTER_PATTERNS = (
+    ('nicast', 'unicast', re.compile(r"Unicast:\s+(\d+)|(\d+)\s+unicast")),
+    ('ulticast', 'multicast', re.compile(r"Multicast:\s+(\d+)|(\d+)\s+multicast")),
+    ('roadcast', 'broadcast', re.compile(r"Broadcast:\s+(\d+)|(\d+)\s+broadcast")),
+    ('iscard', 'discard', re.compile(r"Discard:\s+(\d+)|(\d+)\s+discard")),
+    ('rror', 'errors', re.compile(r"Total Error:\s+(\d+)|(\d+)\s+errors")),
+    ('Input', 'input', re.compile(r"Input.+\s+(\d+)\sbytes|Input:.+,(\d+)\sbytes")),
+    ('Output', 'output', re.compile(r"Output.+\s+(\d+)\sbytes|Output:.+,(\d+)\sbytes")),
+)
+
+# Counters reported as an "rx, tx" pair, and the NAPALM keys they map to
+_PAIRED_COUNTERS = (
+    ('discard', 'rx_discards', 'tx_discards'),
+    ('unicast', 'rx_unicast_packets', 'tx_unicast_packets'),
+    ('multicast', 'rx_multicast_packets', 'tx_multicast_packets'),
+    ('broadcast', 'rx_broadcast_packets', 'tx_broadcast_packets'),
+)
+
+
+def prompt_pattern(base_prompt):
+    """Return a pattern matching the CMW prompt of base_prompt on the last line of a buffer, in any view."""
+    # anchored to the start of the line, '<H3C>' at the end of a description is output
+    return re.compile(r"(?:^|[\r\n])[<\[]{}[^<>\[\]]*[>\]]\s*$".format(re.escape(base_prompt)))
+
+
+def prompt_start_pattern(base_prompt):
+    """Return a pattern matching the CMW prompt of base_prompt at the start of a line."""
+    return re.compile(r"^[<\[]{}[^<>\[\]]*[>\]]".format(re.escape(base_prompt)), flags=re.M)
+
+
+# A CMW prompt of any device name at the start of a line, '<H3C>' or '[H3C-vlan10]'
+ANY_PROMPT_START = re.compile(r"^[<\[][^<>\[\]\r\n]+[>\]]", flags=re.M)
+
+
+def split_by_prompt(output, base_prompt):
+    """Split output on every CMW prompt of base_prompt found at the start of a line."""
+    return prompt_start_pattern(base_prompt).split(output)
+
+
+def separate_sections(separator, content):
+    """Split content into sections, each starting with a line matching separator."""
+    if content == "":
+        return []
+
+    # Break output into per-interface sections
+    if isinstance(separator, py23_compat.string_types):
+        separator = re.compile(separator, flags=re.M)
+    interface_lines = separator.split(content)
+
+    if len(interface_lines) == 1:
+        msg = "Unexpected output data:\n{}".format(interface_lines)
+        raise ValueError(msg)
+
+    # Get rid of the blank data at the beginning
+    interface_lines.pop(0)
+
+    # Must be pairs of data (the separator and section corresponding to it)
+    if len(interface_lines) % 2 != 0:
+        msg = "Unexpected output data:\n{}".format(interface_lines)
+        raise ValueError(msg)
+
+    # Combine the separator and section into one string
+    intf_iter = iter(interface_lines)
+
+    try:
+        new_interfaces = [line + next(intf_iter, '') for line in intf_iter]
+    except TypeError:
+        raise ValueError()
+    return new_interfaces
+
+
+def expand_interfaces(interfaces):
+    """Return the names of interfaces, names or ranges 'GE1/0/1 to GE1/0/4' and 'GE1/0/1-4', in order, once each."""
+    names = []
+    seen = set()
+    for interface in interfaces:
+        interface = interface.strip()
+        match = _RE_INTERFACE_RANGE.match(interface)
+        if match is None:
+            members = [interface]
+        else:
+            prefix, start, end = match.group('prefix'), int(match.group('start')), match.group('end')
+            if end is None:
+                if match.group('last') != prefix:
+                    raise ValueError("Unexpected interface range: {}".format(interface))
+                end = match.group('last_end')
+            if int(end) < start:
+                raise ValueError("Unexpected interface range: {}".format(interface))
+            members = ['{}{}'.format(prefix, number) for number in range(start, int(end) + 1)]
+        for name in members:
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+    return names
+
+
+def canonical_interface_name(name):
+    """Return the full name of an interface named in full or abbreviated, 'GE1/0/1' or 'Vlan10'."""
+    interface_type, number = napalm.base.helpers.split_interface(name.strip())
+    full_type = INTERFACE_ABBREVIATIONS.get(interface_type.lower())
+    if full_type is None:
+        return name.strip()
+    return full_type + number
+
+
+def parse_uptime(uptime_str):
+    """Return the uptime in seconds as an integer."""
+    uptime_sec = 0
+    for pattern, seconds in _RE_UPTIME:
+        match = pattern.search(uptime_str)
+        if match is not None:
+            uptime_sec += int(match.group(1)) * seconds
+    return uptime_sec
+
+
+def parse_facts(show_ver, show_hostname, show_int_status, show_esn):
+    """
+    Build the get_facts() dictionary.
+
+    From the output of 'display version', 'display current-configuration | inc sysname',
+    'display ip interface brief' and 'dis device manuinfo'.
+    """
+    # default values.
+    vendor = u'H3C'
+    uptime = -1
+    serial_number, fqdn, os_version, hostname, model = (u'Unknown', u'Unknown', u'Unknown', u'Unknown', u'Unknown')
+
+    # os_version/uptime/model
+    for line in show_ver.splitlines():
+        if 'H3C Comware Software' in line:
+            search_result = _RE_OS_VERSION.search(line)
+            if search_result is not None:
+                os_version = search_result.group('os_version')
+
+        if 'H3C' in line and 'uptime is' in line:
+            search_result = _RE_MODEL.search(line)
+            if search_result is not None:
+                model = search_result.group(0)
+            uptime = parse_uptime(line)
+            break
+
+    # get serial_number,due to the stack have multiple SN, so show it in a list
+    # 由于堆叠设备会有多少个SN，所以这里用列表展示
+    for line in show_esn.splitlines():
+        if 'DEVICE_SERIAL_NUMBER' in line:
+            _, serial = line.split("DEVICE_SERIAL_NUMBER : ")
+            if serial_number != 'Unknown':
+                serial_number += " / " + serial.strip()
+            else:
+                serial_number = serial.strip()
+
+    if 'sysname ' in show_hostname:
+        _, hostname = show_hostname.split("sysname ")
+        hostname = hostname.strip()
+
+    # interface_list filter
+    interface_list = []
+
+    if 'Interface' in show_int_status:
+        _, interface_part = show_int_status.split("Interface")
+        for line in interface_part.splitlines()[1:]:
+            interface = line.split()[0]
+            interface_list.append(interface)
+
+    return {
+        'uptime': int(uptime),
+        'vendor': vendor,
+        'os_version': py23_compat.text_type(os_version),
+        'serial_number': serial_number,
+        'model': py23_compat.text_type(model),
+        'hostname': py23_compat.text_type(hostname),
+        'fqdn': fqdn,  # ? fqdn(fully qualified domain name)
+        'interface_list': interface_list
+    }
+
+
+def parse_lldp_neighbors(output):
+    """Build the get_lldp_neighbors() dictionary from 'display lldp neighbor-information list'."""
+    results = {}
+    for hostname, local_intf, port in _RE_LLDP.findall(output):
+        results.setdefault(local_intf, []).append({
+            'hostname': py23_compat.text_type(hostname),
+            'port': py23_compat.text_type(port),
+        })
+    return results
+
+
+def parse_interface_block(block, counters=True):
+    """
+    Parse one 'display interface' section in a single pass.
+
+    Return a dictionary with the raw 'name', 'state', 'protocol', 'mac_address', 'speed', 'mtu'
+    and 'description' of the interface (None when absent) and a 'counters' dictionary mapping
+    unicast/multicast/broadcast/discard/errors/input/output to the values found, in order.
+    With counters=False the pass stops as soon as the descriptive fields are known.
+    """
+    block = block.strip()
+    match_intf = _RE_INTF_NAME_STATE.search(block)
+    if match_intf is None:
+        msg = "Unexpected interface format: {}".format(block)
+        raise ValueError(msg)
+
+    fields = {
+        'name': match_intf.group('intf_name'),
+        'state': match_intf.group('intf_state'),
+        'protocol': None,
+        'mac_address': None,
+        'speed': None,
+        'mtu': None,
+        'description': None,
+    }
+    found_counters = {}
+    missing = 5
+    for line in block[match_intf.end():].splitlines():
+        if fields['protocol'] is None and 'Line protocol' in line:
+            match = _RE_PROTOCOL.search(line)
+            if match:
+                fields['protocol'] = match.group('protocol')
+                missing -= 1
+                continue
+        if fields['mac_address'] is None and 'Hardware address' in line:
+            match = _RE_MAC.search(line)
+            if match:
+                fields['mac_address'] = match.group('mac_address')
+                missing -= 1
+        if fields['speed'] is None and line.startswith('Speed'):
+            match = _RE_SPEED.match(line)
+            if match:
+                fields['speed'] = match.group('speed')
+                missing -= 1
+        if fields['mtu'] is None and 'Maximum Transmit Unit' in line:
+            match = _RE_MTU.search(line)
+            if match:
+                fields['mtu'] = match.group('mtu')
+                missing -= 1
+        if fields['description'] is None and line.startswith('Description'):
+            match = _RE_DESCRIPTION.match(line)
+            if match:
+                fields['description'] = match.group('description')
+                missing -= 1
+        if not counters:
+            if not missing:
+                break
+            continue
+        for marker, counter, pattern in _COUNTER_PATTERNS:
+            if marker in line:
+                for values in pattern.findall(line):
+                    found_counters.setdefault(counter, []).append(int(values[0] or values[1]))
+    fields['counters'] = found_counters
+    return fields
+
+
+def interface_counters(counters):
+    """Map the counters of parse_interface_block to the NAPALM counter keys."""
+    intf_counter = {
+        'tx_errors': 0,
+        'rx_errors': 0,
+        'tx_discards': 0,
+        'rx_discards': 0,
+        'tx_octets': 0,
+        'rx_octets': 0,
+        'tx_unicast_packets': 0,
+        'rx_unicast_packets': 0,
+        'tx_multicast_packets': 0,
+        'rx_multicast_packets': 0,
+        'tx_broadcast_packets': 0,
+        'rx_broadcast_packets': 0
+    }
+
+    errors = counters.get('errors')
+    if errors:
+        intf_counter['rx_errors'] = errors[0]
+        if len(errors) == 2:
+            intf_counter['tx_errors'] = errors[1]
+
+    for counter, rx_key, tx_key in _PAIRED_COUNTERS:
+        values = counters.get(counter)
+        if values and len(values) == 2:
+            intf_counter[rx_key] = values[0]
+            intf_counter[tx_key] = values[1]
+
+    if 'input' in counters:
+        intf_counter['rx_octets'] = counters['input'][0]
+    if 'output' in counters:
+        intf_counter['tx_octets'] = counters['output'][0]
+    return intf_counter
+
+
+def parse_interfaces(blocks):
+    """Build the get_interfaces() dictionary from 'display interface' sections."""
+    interfaces = {}
+    for block in blocks:
+        fields = parse_interface_block(block, counters=False)
+        if fields['protocol'] is None:
+            msg = "Unexpected interface format: {}".format(block)
+            raise ValueError(msg)
+
+        mac_address = fields['mac_address']
+        if mac_address:
+            mac_address = napalm.base.helpers.mac(mac_address)
+        else:
+            mac_address = ""
+
+        speed = fields['speed']
+        if speed is None:
+            speed = -1
+        elif speed.isdigit():
+            speed = int(speed)
+
+        interfaces[fields['name']] = {
+            'description': fields['description'] or '',
+            'is_enabled': bool('up' in fields['state'].lower()),
+            'is_up': bool('up' in fields['protocol'].lower()),
+            'last_flapped': -1.0,
+            'mac_address': mac_address,
+            'mtu': int(fields['mtu']) if fields['mtu'] else -1,
+            'speed': speed
+        }
+    return interfaces
+
+
+def parse_interfaces_counters(blocks):
+    """Build the get_interfaces_counters() dictionary from 'display interface' sections."""
+    interfaces = {}
+    for block in blocks:
+        fields = parse_interface_block(block)
+        interfaces[fields['name']] = interface_counters(fields['counters'])
+    return interfaces
+
+
+def _parse_ip_blocks(blocks, re_name_state, re_address):
+    addresses = {}
+    for block in blocks:
+        match_intf = re_name_state.search(block)
+        if match_intf is None:
+            msg = "Unexpected interface format: {}".format(block)
+            raise ValueError(msg)
+        intf_name = match_intf.group('intf_name')
+        for ip_address, prefix_length in re_address.findall(block):
+            val = {'prefix_length': int(prefix_length)}
+            addresses.setdefault(intf_name, {})[ip_address] = val
+    return addresses
+
+
+def parse_interfaces_ip(v4_blocks, v6_blocks):
+    """Build the get_interfaces_ip() dictionary from 'display ip/ipv6 interface' sections."""
+    interfaces_ip = {}
+    v4_interfaces = _parse_ip_blocks(v4_blocks, _RE_INTF_NAME_STATE, _RE_INTF_IPV4)
+    v6_interfaces = _parse_ip_blocks(v6_blocks, _RE_IPV6_INTF_NAME_STATE, _RE_INTF_IPV6)
+
+    # Join data from intermediate dictionaries.
+    for interface, data in v4_interfaces.items():
+        interfaces_ip.setdefault(interface, {'ipv4': {}})['ipv4'] = data
+
+    for interface, data in v6_interfaces.items():
+        interfaces_ip.setdefault(interface, {'ipv6': {}})['ipv6'] = data
+
+    return interfaces_ip
+
+
+_RE_ARP = re.compile(r"(?P<ip_address>\d+\.\d+\.\d+\.\d+)\s+(?P<mac>\S+)\s+(?P<exp>\d+|)\s+"
+                     r"(?P<type>I|D|S|O)\S+\s+(?P<interface>\S+)")
+_RE_MAC_ADDRESS = re.compile(r"(?P<mac>\S+)\s+(?P<vlan>\d+|-)\S+\s+(?P<interface>\S+)\s+(?P<type>\w+)(?=\s|$)")
+
+
+def split_arp_line(line):
+    """Return the raw (ip, mac, interface) fields of one 'display arp' line, or None."""
+    match = _RE_ARP.search(line)
+    if match is None:
+        return None
+    return match.group('ip_address', 'mac', 'interface')
+
+
+def split_mac_address_line(line):
+    """Return the raw (mac, vlan, interface, type) fields of one 'display mac-address' line, or None."""
+    match = _RE_MAC_ADDRESS.search(line)
+    if match is None:
+        return None
+    return match.group('mac', 'vlan', 'interface', 'type')
+
+
+def parse_arp_line(line):
+    """Return the get_arp_table() entry of one 'display arp' line, or None."""
+    fields = split_arp_line(line)
+    if fields is None:
+        return None
+    return arp_entry(fields)
+
+
+def arp_entry(fields):
+    """Return the get_arp_table() entry of raw (ip, mac, interface) fields."""
+    ip_address, mac, interface = fields
+    return {
+        'interface': interface,
+        'mac': napalm.base.helpers.mac(mac),
+        'ip': ip_address,
+        'age': -1.0,
+    }
+
+
+def parse_mac_address_line(line):
+    """Return the get_mac_address_table() entry of one 'display mac-address' line, or None."""
+    fields = split_mac_address_line(line)
+    if fields is None:
+        return None
+    return mac_address_entry(fields)
+
+
+def mac_address_entry(fields):
+    """Return the get_mac_address_table() entry of raw (mac, vlan, interface, type) fields."""
+    mac, vlan, interface, mac_type = fields
+    return {
+        'mac': napalm.base.helpers.mac(mac),
+        'interface': interface,
+        'vlan': int(vlan),
+        'static': True if mac_type == "static" else False,
+        'active': True if mac_type == "dynamic" else False,
+        'authen': True if mac_type == "authen" else False,
+        'moves': -1,
+        'last_move': -1.0
+    }
+
+
+def parse_arp_table(output):
+    """Build the get_arp_table() list from the whole output of 'display arp'."""
+    return [entry for entry in map(parse_arp_line, output.splitlines()) if entry is not None]
+
+
+def parse_mac_address_table(output):
+    """Build the get_mac_address_table() list from the whole output of 'display mac-address'."""
+    return [entry for entry in map(parse_mac_address_line, output.splitlines()) if entry is not None]
+
+
+_RE_DIR_ENTRY = re.compile(r"^\s*\d+\s+\S+\s+(?P<size>\d+)\s+(?P<mtime>\w{3}\s+\d{1,2}\s+\d{4}\s+[\d:]+)\s+"
+                           r"(?P<name>\S+)\s*$", flags=re.M)
+
+
+def parse_dir_entry(output, filename):
+    """Return (size, mtime) of filename in a 'dir' listing, or None when it is not listed."""
+    name = filename.split('/')[-1].split(':')[-1]
+    for match in _RE_DIR_ENTRY.finditer(output):
+        if match.group('name') == name:
+            return int(match.group('size')), ' '.join(match.group('mtime').split())
+    return None
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Pool of SSH sessions shared by CMWDriver instances.
+
+A driver opened with optional_args['connection_pool'] takes a live session from the pool
+instead of logging in, and close() gives it back when it is idle in user view, or closes it.
+Sessions are keyed by (hostname, port, username, hash of the password and key file), so a
+driver with wrong credentials logs in instead of getting an authenticated session. They are
+checked with CMWDriver.is_alive() before reuse, closed after idle_ttl seconds unused or when
+more than max_idle are idle (least recently used first), and at most max_per_device are open
+to one device at a time, in use or idle.
+
+Idle sessions are expired by acquire() and release() only, no thread reaps them: a pool left
+unused keeps its sessions open until the devices drop them at their VTY idle-timeout, and
+such a session is then closed by the is_alive() check of the next acquire(). Call clear() to
+close them sooner.
+
+Sample usage:
+    pool = ConnectionPool(max_per_device=2, idle_ttl=300)
+    device = CMWDriver('10.0.0.1', 'admin', 'admin', optional_args={'connection_pool': pool})
+    device.open()   # logs in the first time, reuses the session afterwards
+    device.get_interfaces_counters()
+    device.close()  # the session stays open in the pool
+"""
+
+from collections import OrderedDict, defaultdict
+import atexit
+import threading
+import time
+
+from napalm.base.exceptions import ConnectionException
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def default_pool():
+    """Return the process-wide pool, used when optional_args['connection_pool'] is True."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool()
+            atexit.register(_default_pool.clear)
+        return _default_pool
+
+
+def _disconnect(connection):
+    connection.disconnect()
+
+
+class ConnectionPool(object):
+    """Thread-safe pool of sessions, keyed by any hashable value whose first item is the hostname."""
+
+    def __init__(self, max_idle=64, idle_ttl=300, max_per_device=2, acquire_timeout=60, disconnect=_disconnect):
+        """
+        :param max_idle: idle sessions kept in the whole pool, the least recently used are closed first
+        :param idle_ttl: seconds an idle session is kept, below the VTY idle-timeout of the devices
+        :param max_per_device: sessions open to one device at a time, in use or idle
+        :param acquire_timeout: seconds acquire() waits for a session of a busy device
+        :param disconnect: function closing a session
+        """
+        self.max_idle = max_idle
+        self.idle_ttl = idle_ttl
+        self.max_per_device = max_per_device
+        self.acquire_timeout = acquire_timeout
+        self.disconnect = disconnect
+
+        self._condition = threading.Condition()
+        # id(session) -> (key, session, released at), least recently released first
+        self._idle = OrderedDict()
+        # key -> sessions open, in use or idle
+        self._open = defaultdict(int)
+
+    def acquire(self, key, connect, is_alive):
+        """
+        Return a live session for key, calling connect() to open one when none is idle.
+
+        Idle sessions for which is_alive(session) is false are closed and skipped. Raise
+        ConnectionException when the device has max_per_device sessions in use for longer
+        than acquire_timeout.
+        """
+        deadline = time.time() + self.acquire_timeout
+        while True:
+            expired = []
+            try:
+                session = self._reserve(key, deadline, expired)
+            finally:
+                self._close(expired)
+            if session is None:
+                break
+            if is_alive(session):
+                return session
+            self._forget(key, session)
+
+        try:
+            return connect()
+        except Exception:
+            with self._condition:
+                self._release_slot(key)
+            raise
+
+    def release(self, key, session):
+        """Give session back to the pool, as the most recently used one."""
+        with self._condition:
+            self._idle[id(session)] = (key, session, time.time())
+            expired = self._expire()
+            self._condition.notify_all()
+        self._close(expired)
+
+    def discard(self, key, session):
+        """Close a session taken from the pool instead of giving it back."""
+        self._forget(key, session)
+
+    def clear(self):
+        """Close every idle session."""
+        with self._condition:
+            expired = [(key, session) for key, session, _ in self._idle.values()]
+            self._idle.clear()
+            for key, _ in expired:
+                self._release_slot(key)
+        self._close(expired)
+
+    def idle_count(self, key=None):
+        """Return the number of idle sessions, for key only when given."""
+        with self._condition:
+            return sum(1 for idle_key, _, _ in self._idle.values() if key is None or idle_key == key)
+
+    def _reserve(self, key, deadline, expired):
+        """
+        Take the most recently used idle session of key, or None once a new one may be opened.
+
+        Sessions expired meanwhile are added to expired, to be closed outside the lock.
+        """
+        with self._condition:
+            while True:
+                expired.extend(self._expire())
+                for session_id in reversed(self._idle):
+                    if self._idle[session_id][0] == key:
+                        return self._idle.pop(session_id)[1]
+                if self._open.get(key, 0) < self.max_per_device:
+                    self._open[key] += 1
+                    return None
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    msg = '{} sessions already open to {}'.format(self._open[key], key[0])
+                    raise ConnectionException(msg)
+                self._condition.wait(remaining)
+
+    def _expire(self):
+        """Remove the sessions idle for too long or beyond max_idle, return them to be closed."""
+        expired = []
+        now = time.time()
+        while self._idle:
+            session_id, (key, session, released) = next(iter(self._idle.items()))
+            if now - released < self.idle_ttl and len(self._idle) <= self.max_idle:
+                break
+            del self._idle[session_id]
+            self._release_slot(key)
+            expired.append((key, session))
+        return expired
+
+    def _release_slot(self, key):
+        self._open[key] -= 1
+        if self._open[key] <= 0:
+            del self._open[key]
+        self._condition.notify_all()
+
+    def _forget(self, key, session):
+        with self._condition:
+            self._release_slot(key)
+        self._close([(key, session)])
+
+    def _close(self, sessions):
+        for _, session in sessions:
+            try:
+                self.disconnect(session)
+            except Exception:
+                pass
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Rates of the interface counters, from the last samples of every device.
+
+get_interfaces_counters() returns totals. RateEngine keeps the last size samples of every
+device in a CounterRing, one flat array of unsigned 64-bit integers holding a row of
+interfaces x counters per sample, and computes the per second rates of all the interfaces
+of a device in one pass over two rows of it, along with bit and packet rates.
+
+A counter lower than in the older sample wrapped when the older value was in the upper
+half of its width, 32 or 64 bits per counter, and was cleared otherwise, the new value
+being counted from zero. A device whose boot time, the sample time less the get_facts()
+uptime, moves later than boot_tolerance seconds rebooted: its samples are dropped and
+rates are given again from the next sample on.
+
+Sample usage:
+    engine = RateEngine(size=8)
+    for result in FleetRunner('admin', 'admin').run(hosts, ['get_facts', 'get_interfaces_counters']):
+        engine.add_result(result)
+    print(engine.rates('10.0.0.1')['GigabitEthernet1/0/1']['rx_bps'])
+"""
+
+from array import array
+import operator
+import threading
+import time
+
+# get_interfaces_counters() keys, in the order of the columns of a CounterRing
+COUNTERS = (
+    'rx_octets',
+    'rx_unicast_packets',
+    'rx_multicast_packets',
+    'rx_broadcast_packets',
+    'rx_discards',
+    'rx_errors',
+    'tx_octets',
+    'tx_unicast_packets',
+    'tx_multicast_packets',
+    'tx_broadcast_packets',
+    'tx_discards',
+    'tx_errors',
+)
+_WIDTH = len(COUNTERS)
+_values_of = operator.itemgetter(*COUNTERS)
+_RX_OCTETS = COUNTERS.index('rx_octets')
+_TX_OCTETS = COUNTERS.index('tx_octets')
+_RX_PACKETS = [COUNTERS.index(key) for key in ('rx_unicast_packets', 'rx_multicast_packets', 'rx_broadcast_packets')]
+_TX_PACKETS = [COUNTERS.index(key) for key in ('tx_unicast_packets', 'tx_multicast_packets', 'tx_broadcast_packets')]
+
+# Seconds the boot time of a device may move between samples without being a reboot, the
+# uptime of 'display version' being in minutes
+BOOT_TOLERANCE = 120
+
+
+class CounterRing(object):
+    """
+    The last size samples of the counters of one device.
+
+    Interfaces get a column of COUNTERS each the first time they are sampled; rates are
+    given for the interfaces of the newest sample that were in the older one.
+    counter_bits is the width of the counters, 64 or 32, or a dictionary of widths by key.
+    """
+
+    def __init__(self, size=8, counter_bits=64, boot_tolerance=BOOT_TOLERANCE):
+        if size < 2:
+            raise ValueError('a ring of counter samples needs at least 2 of them')
+        self.size = size
+        self.boot_tolerance = boot_tolerance
+        if not isinstance(counter_bits, dict):
+            counter_bits = dict.fromkeys(COUNTERS, counter_bits)
+        self._moduli = [2 ** counter_bits.get(key, 64) for key in COUNTERS]
+        self.interfaces = []
+        self._positions = {}
+        # number of the sample each interface was first and last seen in
+        self._first = array('q')
+        self._last = array('q')
+        self._values = array('Q')
+        self._times = array('d', [0.0] * size)
+        # samples appended and the number of the first one kept, after the last reboot
+        self.count = 0
+        self._start = 0
+        self._boot = None
+        self.reboots = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.size, self.count - self._start)
+
+    def _add_interfaces(self, names):
+        """Give names a column each, widening every row of the ring."""
+        width = len(self.interfaces) * _WIDTH
+        padding = [0] * (len(names) * _WIDTH)
+        values = array('Q')
+        for row in range(self.size):
+            values.extend(self._values[row * width:(row + 1) * width])
+            values.extend(padding)
+        self._values = values
+        for name in names:
+            self._positions[name] = len(self.interfaces)
+            self.interfaces.append(name)
+            self._first.append(self.count)
+            self._last.append(-1)
+
+    def append(self, counters, timestamp=None, uptime=None):
+        """
+        Add a get_interfaces_counters() result sampled at timestamp, return True when the device rebooted.
+
+        uptime is the get_facts() uptime in seconds, ignored when None or negative.
+        Interfaces missing from counters keep their last values.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            rebooted = False
+            if uptime is not None and uptime >= 0:
+                boot = timestamp - uptime
+                if self._boot is not None and boot - self._boot > self.boot_tolerance:
+                    rebooted = True
+                    self.reboots += 1
+                    self._start = self.count
+                if self._boot is None or rebooted:
+                    self._boot = boot
+            new = [name for name in counters if name not in self._positions]
+            if new:
+                self._add_interfaces(new)
+            width = len(self.interfaces) * _WIDTH
+            row = (self.count % self.size) * width
+            if self.count > self._start:
+                previous = ((self.count - 1) % self.size) * width
+                sample = self._values[previous:previous + width].tolist()
+            else:
+                sample = [0] * width
+            for name, counter in counters.items():
+                position = self._positions[name]
+                sample[position * _WIDTH:(position + 1) * _WIDTH] = _values_of(counter)
+                self._last[position] = self.count
+            try:
+                sample = array('Q', sample)
+            except OverflowError:
+                # -1 of a counter the device does not report
+                sample = array('Q', [max(value, 0) for value in sample])
+            self._values[row:row + width] = sample
+            self._times[self.count % self.size] = timestamp
+            self.count += 1
+            return rebooted
+
+    def rates(self, window=1):
+        """
+        Return {interface: {counter: per second}} between the newest sample and window samples before.
+
+        rx_bps and tx_bps are the octet rates in bits, rx_pps and tx_pps the unicast,
+        multicast and broadcast packet rates. Empty until two samples are held.
+        """
+        with self._lock:
+            window = min(window, len(self) - 1)
+            if window < 1:
+                return {}
+            newest = self.count - 1
+            oldest = newest - window
+            interval = self._times[newest % self.size] - self._times[oldest % self.size]
+            if interval <= 0:
+                return {}
+            width = len(self.interfaces) * _WIDTH
+            latest = self._values[(newest % self.size) * width:(newest % self.size + 1) * width]
+            older = self._values[(oldest % self.size) * width:(oldest % self.size + 1) * width]
+            moduli = self._moduli * len(self.interfaces)
+            first, last = self._first, self._last
+            interfaces = [(position, name) for position, name in enumerate(self.interfaces)
+                          if last[position] == newest and first[position] <= oldest]
+        rates = [(n - o if n >= o else (n + m - o if o >= m // 2 else n)) / interval
+                 for n, o, m in zip(latest, older, moduli)]
+        result = {}
+        for position, name in interfaces:
+            values = rates[position * _WIDTH:(position + 1) * _WIDTH]
+            entry = dict(zip(COUNTERS, values))
+            entry['rx_bps'] = values[_RX_OCTETS] * 8
+            entry['tx_bps'] = values[_TX_OCTETS] * 8
+            entry['rx_pps'] = sum(values[index] for index in _RX_PACKETS)
+            entry['tx_pps'] = sum(values[index] for index in _TX_PACKETS)
+            result[name] = entry
+        return result
+
+
+class RateEngine(object):
+    """CounterRings of many devices, fed with getter results and asked for rates by device."""
+
+    def __init__(self, size=8, counter_bits=64, boot_tolerance=BOOT_TOLERANCE):
+        self.size = size
+        self.counter_bits = counter_bits
+        self.boot_tolerance = boot_tolerance
+        self.rings = {}
+        self._lock = threading.Lock()
+
+    def ring(self, device):
+        """Return the CounterRing of device, created on first use."""
+        with self._lock:
+            ring = self.rings.get(device)
+            if ring is None:
+                ring = self.rings[device] = CounterRing(self.size, self.counter_bits, self.boot_tolerance)
+            return ring
+
+    def add(self, device, counters, timestamp=None, uptime=None):
+        """Add a sample of device, see CounterRing.append()."""
+        return self.ring(device).append(counters, timestamp, uptime)
+
+    def add_result(self, result, timestamp=None):
+        """Add the get_interfaces_counters() of a fleet.DeviceResult, with the uptime of its get_facts() if any."""
+        counters = result.results.get('get_interfaces_counters')
+        if counters is None:
+            return False
+        uptime = result.results.get('get_facts', {}).get('uptime')
+        return self.add(result.hostname, counters, timestamp, uptime)
+
+    def poll(self, device, driver):
+        """Sample an open driver, its get_facts() uptime and its counters, as device."""
+        uptime = driver.get_facts()['uptime']
+        return self.add(device, driver.get_interfaces_counters(), uptime=uptime)
+
+    def rates(self, device, window=1):
+        """Return the rates of device, see CounterRing.rates()."""
+        ring = self.rings.get(device)
+        return {} if ring is None else ring.rates(window)
+
+    def all_rates(self, window=1):
+        """Return {device: rates} of every device."""
+        return dict((device, ring.rates(window)) for device, ring in list(self.rings.items()))
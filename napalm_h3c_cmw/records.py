@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Compact containers for the MAC and ARP tables.
+
+MACTable and ARPTable store one column per field: MAC and IPv4 addresses as integers in
+arrays, VLANs in an array of unsigned shorts and interface names interned, so a table with
+100k+ rows costs a few MB instead of one dictionary per row. Iterating yields __slots__
+records, and to_dicts() converts back to the NAPALM schema.
+"""
+
+from array import array
+import re
+import socket
+import struct
+import sys
+
+import napalm.base.helpers
+
+_RE_NOT_HEX = re.compile(r"[^0-9a-fA-F]")
+
+# MAC entry types kept by MACTable, index 0 is any other type
+_MAC_TYPES = (None, 'static', 'dynamic', 'authen')
+_MAC_TYPE_CODES = {mac_type: code for code, mac_type in enumerate(_MAC_TYPES) if mac_type}
+
+
+def mac_to_int(mac):
+    """Return the integer value of a MAC address in any notation."""
+    digits = _RE_NOT_HEX.sub('', mac)
+    if len(digits) != 12:
+        digits = _RE_NOT_HEX.sub('', napalm.base.helpers.mac(mac))
+    return int(digits, 16)
+
+
+def int_to_mac(value):
+    """Return a MAC address integer formatted like napalm.base.helpers.mac()."""
+    digits = '{:012X}'.format(value)
+    return ':'.join(digits[i:i + 2] for i in range(0, 12, 2))
+
+
+class MACEntry(object):
+    """One row of a MACTable."""
+
+    __slots__ = ('mac', 'interface', 'vlan', 'static', 'active', 'authen')
+
+    # Not reported by CMW, the same on every row
+    moves = -1
+    last_move = -1.0
+
+    def __init__(self, mac, interface, vlan, static, active, authen):
+        self.mac = mac
+        self.interface = interface
+        self.vlan = vlan
+        self.static = static
+        self.active = active
+        self.authen = authen
+
+    def to_dict(self):
+        """Return the entry in the get_mac_address_table() schema."""
+        return {
+            'mac': self.mac,
+            'interface': self.interface,
+            'vlan': self.vlan,
+            'static': self.static,
+            'active': self.active,
+            'authen': self.authen,
+            'moves': self.moves,
+            'last_move': self.last_move
+        }
+
+    def __repr__(self):
+        return 'MACEntry({!r})'.format(self.to_dict())
+
+
+class ARPEntry(object):
+    """One row of an ARPTable."""
+
+    __slots__ = ('interface', 'mac', 'ip')
+
+    # Not reported by CMW, the same on every row
+    age = -1.0
+
+    def __init__(self, interface, mac, ip):
+        self.interface = interface
+        self.mac = mac
+        self.ip = ip
+
+    def to_dict(self):
+        """Return the entry in the get_arp_table() schema."""
+        return {
+            'interface': self.interface,
+            'mac': self.mac,
+            'ip': self.ip,
+            'age': self.age,
+        }
+
+    def __repr__(self):
+        return 'ARPEntry({!r})'.format(self.to_dict())
+
+
+class MACTable(object):
+    """Column-oriented MAC address table."""
+
+    def __init__(self):
+        self._macs = array('Q')
+        self._vlans = array('H')
+        self._interfaces = []
+        self._types = bytearray()
+
+    @classmethod
+    def from_fields(cls, rows):
+        """Build a table from raw (mac, vlan, interface, type) rows."""
+        table = cls()
+        for mac, vlan, interface, mac_type in rows:
+            table.append(mac, vlan, interface, mac_type)
+        return table
+
+    def append(self, mac, vlan, interface, mac_type):
+        """Add one row, mac may be in any notation and vlan a string or an integer."""
+        self._macs.append(mac_to_int(mac))
+        self._vlans.append(int(vlan))
+        self._interfaces.append(sys.intern(interface))
+        self._types.append(_MAC_TYPE_CODES.get(mac_type, 0))
+
+    def __len__(self):
+        return len(self._macs)
+
+    def __getitem__(self, index):
+        mac_type = self._types[index]
+        return MACEntry(int_to_mac(self._macs[index]), self._interfaces[index], self._vlans[index],
+                        mac_type == 1, mac_type == 2, mac_type == 3)
+
+    def __iter__(self):
+        for index in range(len(self._macs)):
+            yield self[index]
+
+    def to_dicts(self):
+        """Return the table in the get_mac_address_table() schema."""
+        return [entry.to_dict() for entry in self]
+
+
+class ARPTable(object):
+    """Column-oriented IPv4 ARP table."""
+
+    def __init__(self):
+        # 'I' is 4 bytes where 'L' is 8 on 64-bit Linux and macOS
+        self._ips = array('I')
+        self._macs = array('Q')
+        self._interfaces = []
+
+    @classmethod
+    def from_fields(cls, rows):
+        """Build a table from raw (ip, mac, interface) rows."""
+        table = cls()
+        for ip, mac, interface in rows:
+            table.append(ip, mac, interface)
+        return table
+
+    def append(self, ip, mac, interface):
+        """Add one row, mac may be in any notation."""
+        self._ips.append(struct.unpack('!L', socket.inet_aton(ip))[0])
+        self._macs.append(mac_to_int(mac))
+        self._interfaces.append(sys.intern(interface))
+
+    def __len__(self):
+        return len(self._ips)
+
+    def __getitem__(self, index):
+        ip = socket.inet_ntoa(struct.pack('!L', self._ips[index]))
+        return ARPEntry(self._interfaces[index], int_to_mac(self._macs[index]), ip)
+
+    def __iter__(self):
+        for index in range(len(self._ips)):
+            yield self[index]
+
+    def to_dicts(self):
+        """Return the table in the get_arp_table() schema."""
+        return [entry.to_dict() for entry in self]
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+SNMP counter backend for CMWDriver.get_interfaces_counters().
+
+'display interface' prints about 40 lines per port for the dozen counters NAPALM returns.
+SnmpCounterBackend reads them from the 64-bit IF-MIB counters instead, walking the twelve
+columns side by side with SNMPv2c GETBULK, and names the interfaces by ifName, read once
+and cached by ifIndex. Only the few BER types SNMP uses are implemented, no SNMP library
+is needed.
+
+With optional_args['counters_backend'] = 'snmp', CMWDriver reads its counters over SNMP,
+and falls back to 'display interface' when the agent does not answer.
+
+Sample usage:
+    backend = SnmpCounterBackend('10.0.0.1', community='public')
+    print(backend.get_interfaces_counters())
+"""
+
+from collections import OrderedDict
+import itertools
+import socket
+
+from napalm.base.exceptions import ConnectionException, CommandErrorException
+from napalm_h3c_cmw import parsers
+
+SNMP_PORT = 161
+SNMP_V2C = 1
+
+# BER tags of the types and PDUs used
+INTEGER = 0x02
+OCTET_STRING = 0x04
+NULL = 0x05
+OBJECT_IDENTIFIER = 0x06
+SEQUENCE = 0x30
+IP_ADDRESS = 0x40
+COUNTER32 = 0x41
+GAUGE32 = 0x42
+TIMETICKS = 0x43
+COUNTER64 = 0x46
+NO_SUCH_OBJECT = 0x80
+NO_SUCH_INSTANCE = 0x81
+END_OF_MIB_VIEW = 0x82
+GET_REQUEST = 0xa0
+GET_NEXT_REQUEST = 0xa1
+RESPONSE = 0xa2
+GET_BULK_REQUEST = 0xa5
+
+_UNSIGNED = (COUNTER32, GAUGE32, TIMETICKS, COUNTER64)
+_EXCEPTIONS = (NO_SUCH_OBJECT, NO_SUCH_INSTANCE, END_OF_MIB_VIEW)
+
+IF_NAME = (1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 1)
+
+# IF-MIB column of each get_interfaces_counters() key, HC counters of ifXTable where there is one
+COUNTER_COLUMNS = (
+    ((1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 6), 'rx_octets'),
+    ((1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 7), 'rx_unicast_packets'),
+    ((1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 8), 'rx_multicast_packets'),
+    ((1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 9), 'rx_broadcast_packets'),
+    ((1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 10), 'tx_octets'),
+    ((1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 11), 'tx_unicast_packets'),
+    ((1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 12), 'tx_multicast_packets'),
+    ((1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 13), 'tx_broadcast_packets'),
+    ((1, 3, 6, 1, 2, 1, 2, 2, 1, 13), 'rx_discards'),
+    ((1, 3, 6, 1, 2, 1, 2, 2, 1, 14), 'rx_errors'),
+    ((1, 3, 6, 1, 2, 1, 2, 2, 1, 19), 'tx_discards'),
+    ((1, 3, 6, 1, 2, 1, 2, 2, 1, 20), 'tx_errors'),
+)
+
+# Width in bits of the counters read, the ifTable columns being Counter32
+COUNTER_BITS = dict((key, 64 if column[:7] == IF_NAME[:7] else 32) for column, key in COUNTER_COLUMNS)
+
+
+def _encode_length(length):
+    if length < 0x80:
+        return bytes((length,))
+    encoded = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes((0x80 | len(encoded),)) + encoded
+
+
+def encode_tlv(tag, content):
+    return bytes((tag,)) + _encode_length(len(content)) + content
+
+
+def encode_oid(oid):
+    content = bytearray((oid[0] * 40 + oid[1],))
+    for arc in oid[2:]:
+        chunk = [arc & 0x7f]
+        arc >>= 7
+        while arc:
+            chunk.append(0x80 | (arc & 0x7f))
+            arc >>= 7
+        content.extend(reversed(chunk))
+    return encode_tlv(OBJECT_IDENTIFIER, bytes(content))
+
+
+def encode_value(tag, value):
+    """Return the BER encoding of value, of type tag."""
+    if tag == INTEGER:
+        return encode_tlv(tag, value.to_bytes(value.bit_length() // 8 + 1, 'big', signed=True))
+    if tag in _UNSIGNED:
+        return encode_tlv(tag, value.to_bytes(value.bit_length() // 8 + 1, 'big'))
+    if tag == OBJECT_IDENTIFIER:
+        return encode_oid(value)
+    if tag in (OCTET_STRING, IP_ADDRESS):
+        return encode_tlv(tag, value)
+    return encode_tlv(tag, b'')
+
+
+def encode_varbind(oid, tag, value):
+    return encode_tlv(SEQUENCE, encode_oid(oid) + encode_value(tag, value))
+
+
+def encode_message(community, pdu_type, request_id, varbinds, field1=0, field2=0):
+    """
+    Return an SNMPv2c message of pdu_type carrying varbinds, (oid, tag, value) triples.
+
+    field1 and field2 are error-status and error-index, or non-repeaters and
+    max-repetitions for GETBULK.
+    """
+    bindings = b''.join(encode_varbind(oid, tag, value) for oid, tag, value in varbinds)
+    pdu = encode_tlv(pdu_type, encode_value(INTEGER, request_id) + encode_value(INTEGER, field1)
+                     + encode_value(INTEGER, field2) + encode_tlv(SEQUENCE, bindings))
+    return encode_tlv(SEQUENCE, encode_value(INTEGER, SNMP_V2C) + encode_value(OCTET_STRING, community) + pdu)
+
+
+def _decode_tlv(data, offset):
+    """Return (tag, start, end) of the TLV at offset, its content being data[start:end]."""
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        size = length & 0x7f
+        length = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+    if offset + length > len(data):
+        raise ValueError('truncated BER data')
+    return tag, offset, offset + length
+
+
+def decode_oid(content):
+    arcs = list(divmod(content[0], 40)) if content[0] < 80 else [2, content[0] - 80]
+    arc = 0
+    for byte in content[1:]:
+        arc = (arc << 7) | (byte & 0x7f)
+        if not byte & 0x80:
+            arcs.append(arc)
+            arc = 0
+    return tuple(arcs)
+
+
+def decode_value(tag, content):
+    if tag == INTEGER:
+        return int.from_bytes(content, 'big', signed=True)
+    if tag in _UNSIGNED:
+        return int.from_bytes(content, 'big')
+    if tag == OBJECT_IDENTIFIER:
+        return decode_oid(content)
+    if tag in (OCTET_STRING, IP_ADDRESS):
+        return bytes(content)
+    return None
+
+
+def decode_message(data):
+    """Return (community, pdu_type, request_id, field1, field2, varbinds) of an SNMPv2c message."""
+    _, offset, _ = _decode_tlv(data, 0)
+    _, start, offset = _decode_tlv(data, offset)
+    if decode_value(INTEGER, data[start:offset]) != SNMP_V2C:
+        raise ValueError('not an SNMPv2c message')
+    _, start, offset = _decode_tlv(data, offset)
+    community = bytes(data[start:offset])
+    pdu_type, offset, _ = _decode_tlv(data, offset)
+    numbers = []
+    for _ in range(3):
+        _, start, offset = _decode_tlv(data, offset)
+        numbers.append(decode_value(INTEGER, data[start:offset]))
+    _, offset, end = _decode_tlv(data, offset)
+    varbinds = []
+    while offset < end:
+        _, start, offset = _decode_tlv(data, offset)
+        _, oid_start, oid_end = _decode_tlv(data, start)
+        tag, value_start, value_end = _decode_tlv(data, oid_end)
+        varbinds.append((decode_oid(data[oid_start:oid_end]), tag, decode_value(tag, data[value_start:value_end])))
+    request_id, field1, field2 = numbers
+    return community, pdu_type, request_id, field1, field2, varbinds
+
+
+def _format_oid(oid):
+    return '.'.join(str(arc) for arc in oid)
+
+
+class SnmpClient(object):
+    """SNMPv2c client over UDP, GET, GETNEXT and GETBULK walks of table columns."""
+
+    def __init__(self, host, community='public', port=SNMP_PORT, timeout=2, retries=1, max_repetitions=10):
+        self.host = host
+        self.community = community.encode('utf-8') if not isinstance(community, bytes) else community
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.max_repetitions = max_repetitions
+        self._request_ids = itertools.count(1)
+        self._socket = None
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def request(self, pdu_type, oids, field1=0, field2=0):
+        """Send a request for oids, return the varbinds of the response."""
+        request_id = next(self._request_ids) & 0x7fffffff
+        message = encode_message(self.community, pdu_type, request_id, [(oid, NULL, None) for oid in oids],
+                                 field1, field2)
+        if self._socket is None:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.settimeout(self.timeout)
+        for _ in range(self.retries + 1):
+            try:
+                self._socket.sendto(message, (self.host, self.port))
+                while True:
+                    data = self._socket.recv(65535)
+                    try:
+                        _, response_type, response_id, error_status, error_index, varbinds = decode_message(data)
+                    except (ValueError, IndexError):
+                        continue
+                    if response_type == RESPONSE and response_id == request_id:
+                        break
+            except socket.timeout:
+                continue
+            except socket.error as e:
+                raise ConnectionException('SNMP agent {}:{} unreachable: {}'.format(self.host, self.port, e))
+            if error_status:
+                raise CommandErrorException('SNMP error-status {} at varbind {}'.format(error_status, error_index))
+            return varbinds
+        raise ConnectionException('SNMP agent {}:{} did not answer'.format(self.host, self.port))
+
+    def bulk_walk(self, columns):
+        """
+        Return {column: OrderedDict(index: value)} of the table columns, walked side by side with GETBULK.
+
+        The rows of a response are read column by column: a column is done at the first
+        OID out of it, the others go on. Responses cut short by the agent to fit its
+        maximum message size are fine, the next request starts where they stopped. An
+        OID not past the previous one of its column raises CommandErrorException, the
+        walk of a looping agent would never end.
+        """
+        results = OrderedDict((column, OrderedDict()) for column in columns)
+        cursors = OrderedDict((column, column) for column in columns)
+        while cursors:
+            active = list(cursors)
+            varbinds = self.request(GET_BULK_REQUEST, list(cursors.values()), 0, self.max_repetitions)
+            if not varbinds:
+                break
+            for position, column in enumerate(active):
+                size = len(column)
+                for oid, tag, value in varbinds[position::len(active)]:
+                    if tag in _EXCEPTIONS or oid[:size] != column:
+                        cursors.pop(column, None)
+                        break
+                    if oid <= cursors[column]:
+                        raise CommandErrorException('SNMP agent {}:{} returned {} after {}, OIDs not increasing'.format(
+                            self.host, self.port, _format_oid(oid), _format_oid(cursors[column])))
+                    results[column][oid[size:]] = value
+                    cursors[column] = oid
+        return results
+
+
+class SnmpCounterBackend(object):
+    """get_interfaces_counters() from the IF-MIB counters, over SNMPv2c GETBULK."""
+
+    def __init__(self, hostname, community='public', port=SNMP_PORT, timeout=2, retries=1, max_repetitions=10):
+        self.client = SnmpClient(hostname, community=community, port=port, timeout=timeout, retries=retries,
+                                 max_repetitions=max_repetitions)
+        # ifName by ifIndex, read again only when an unknown ifIndex shows up
+        self._names = None
+
+    def close(self):
+        self.client.close()
+
+    def interface_names(self, refresh=False):
+        """Return the cached {ifIndex: ifName}, read from the agent the first time or on refresh."""
+        if self._names is None or refresh:
+            names = self.client.bulk_walk([IF_NAME])[IF_NAME]
+            self._names = dict((index, name.decode('utf-8', 'replace')) for index, name in names.items())
+        return self._names
+
+    def get_interfaces_counters(self):
+        walked = self.client.bulk_walk([column for column, _ in COUNTER_COLUMNS])
+        names = self.interface_names()
+        refreshed = False
+        counters = {}
+        for column, key in COUNTER_COLUMNS:
+            for index, value in walked[column].items():
+                if index not in names and not refreshed:
+                    names = self.interface_names(refresh=True)
+                    refreshed = True
+                name = names.get(index)
+                if name is None:
+                    continue
+                counter = counters.get(name)
+                if counter is None:
+                    counter = counters[name] = parsers.interface_counters({})
+                counter[key] = value
+        return counters
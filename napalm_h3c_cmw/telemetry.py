@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 2016 Dravetech AB. All rights reserved.
+#
+# The contents of this file are licensed under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with the
+# License. You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""
+Dial-out gRPC telemetry collector, a live view of the interfaces of every device.
+
+Comware 7 devices configured for dial-out telemetry ('telemetry', 'sensor-group',
+'destination-group' and 'subscription') open a gRPC stream to a collector and push the
+sampled tables of their sensor paths on it, e.g. 'ifmgr/interfaces' and 'ifmgr/statistics'
+every minute. TelemetryCollector serves the grpc_dialout.GRPCDialout/Dialout method and keeps
+the last rows of every interface table per device and interface. Its TelemetryView of a
+device answers get_interfaces() and get_interfaces_counters() as CMWDriver does, from
+memory, with the same mapping of the Ifmgr columns as the netconf transport.
+
+The DialoutMsg protobuf messages are decoded here, their few fields need no protobuf
+library, and the JSON data of a message is expected as
+{"notification": {"Timestamp": ..., "Ifmgr": {"Statistics": {"Interface": [rows]}}}}.
+Rows of a table are merged by IfIndex, rows without one are ignored.
+
+With optional_args['telemetry'] set to a running TelemetryCollector, CMWDriver answers
+get_interfaces() and get_interfaces_counters() from the view of the device while its data
+is fresh, and reads the device otherwise.
+
+Sample usage:
+    collector = TelemetryCollector(port=50051)
+    collector.start()
+    print(collector.device('core-1').get_interfaces_counters())
+    collector.stop()
+"""
+
+from concurrent import futures
+import json
+import threading
+import time
+
+from napalm.base.exceptions import ConnectionException
+from napalm.base.utils import py23_compat
+from napalm_h3c_cmw import netconf
+
+try:
+    import grpc
+except ImportError:
+    grpc = None
+
+TELEMETRY_PORT = 50051
+
+SERVICE = 'grpc_dialout.GRPCDialout'
+METHOD = 'Dialout'
+
+# Protobuf wire types
+VARINT = 0
+FIXED64 = 1
+LENGTH_DELIMITED = 2
+FIXED32 = 5
+
+# Tables of the sensor paths the getters are answered from
+INTERFACES = 'Ifmgr/Interfaces'
+STATISTICS = 'Ifmgr/Statistics'
+ETH_STATISTICS = 'Ifmgr/EthPortStatistics'
+
+
+def encode_varint(value):
+    """Return the protobuf varint of a positive integer."""
+    encoded = bytearray()
+    while value > 0x7f:
+        encoded.append(value & 0x7f | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def encode_field(number, value):
+    """Return the length-delimited field number of value, bytes, text or an encoded message."""
+    if not isinstance(value, bytes):
+        value = value.encode('utf-8')
+    return encode_varint(number << 3 | LENGTH_DELIMITED) + encode_varint(len(value)) + value
+
+
+def _decode_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def decode_fields(data):
+    """Return {field number: value} of a protobuf message, the last value of repeated fields."""
+    data = bytearray(data)
+    fields = {}
+    offset = 0
+    while offset < len(data):
+        key, offset = _decode_varint(data, offset)
+        wire_type = key & 0x07
+        if wire_type == VARINT:
+            value, offset = _decode_varint(data, offset)
+        elif wire_type == LENGTH_DELIMITED:
+            length, offset = _decode_varint(data, offset)
+            value = bytes(data[offset:offset + length])
+            offset += length
+        elif wire_type in (FIXED64, FIXED32):
+            size = 8 if wire_type == FIXED64 else 4
+            value = bytes(data[offset:offset + size])
+            offset += size
+        else:
+            raise ValueError('unsupported protobuf wire type {}'.format(wire_type))
+        if offset > len(data):
+            raise ValueError('truncated protobuf message')
+        fields[key >> 3] = value
+    return fields
+
+
+def encode_dialout_msg(message):
+    """Return the DialoutMsg of a dictionary as decode_dialout_msg() returns."""
+    device = (encode_field(1, message.get('producer_name', '')) + encode_field(2, message['device_name'])
+              + encode_field(3, message.get('device_model', '')))
+    return encode_field(1, device) + encode_field(2, message['sensor_path']) + encode_field(3, message['json_data'])
+
+
+def decode_dialout_msg(data):
+    """Return producer_name, device_name, device_model, sensor_path and json_data of a DialoutMsg."""
+    fields = decode_fields(data)
+    device = decode_fields(fields.get(1, b''))
+    return {
+        'producer_name': device.get(1, b'').decode('utf-8'),
+        'device_name': device.get(2, b'').decode('utf-8'),
+        'device_model': device.get(3, b'').decode('utf-8'),
+        'sensor_path': fields.get(2, b'').decode('utf-8'),
+        'json_data': fields.get(3, b'').decode('utf-8'),
+    }
+
+
+def encode_dialout_response(response):
+    """Return the DialoutResponse of a text."""
+    return encode_field(1, response)
+
+
+def decode_dialout_response(data):
+    return decode_fields(data).get(1, b'').decode('utf-8')
+
+
+def _text(value):
+    """Return a JSON value as the text NETCONF would carry."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return py23_compat.text_type(value)
+
+
+def iter_tables(json_data):
+    """Yield ('Module/Table', rows) of the tables of the JSON data of a DialoutMsg."""
+    document = json.loads(json_data)
+    document = document.get('notification', document.get('Notification', document))
+    for module, tables in document.items():
+        if not isinstance(tables, dict):
+            continue
+        for table, entries in tables.items():
+            if not isinstance(entries, dict):
+                continue
+            rows = []
+            for value in entries.values():
+                rows.extend(value if isinstance(value, list) else [value])
+            yield '{}/{}'.format(module, table), [row for row in rows if isinstance(row, dict)]
+
+
+class TelemetryView(object):
+    """
+    Last telemetry of one device, answering get_interfaces() and get_interfaces_counters().
+
+    A getter raises ConnectionException when a table it needs was not received within
+    max_age seconds, so that the view can be a counters_backend of CMWDriver. Rows not
+    received within max_age seconds, those of an interface removed from the device or of a
+    table no longer sent, are left out and dropped.
+    """
+
+    def __init__(self, name, max_age=180):
+        self.name = name
+        self.max_age = max_age
+        self.model = None
+        # rows of every table by IfIndex, the time the table and each of its rows were last received
+        self.tables = {}
+        self.updated = {}
+        self.row_updated = {}
+        self._lock = threading.Lock()
+
+    def update(self, table, rows, received=None):
+        """Merge rows of table into the view, columns missing from a row kept from the last one."""
+        received = time.time() if received is None else received
+        with self._lock:
+            indexed = self.tables.setdefault(table, {})
+            row_updated = self.row_updated.setdefault(table, {})
+            for row in rows:
+                index = row.get('IfIndex')
+                if index is None:
+                    continue
+                index = _text(index)
+                current = indexed.get(index)
+                if current is None:
+                    current = indexed[index] = {}
+                for column, value in row.items():
+                    current[column] = _text(value)
+                row_updated[index] = received
+            self.updated[table] = received
+
+    def age(self, table):
+        """Return the seconds since table was last received, None if never."""
+        updated = self.updated.get(table)
+        return None if updated is None else time.time() - updated
+
+    def _rows(self, *tables):
+        """Return (table name, row) of copies of the fresh rows of tables, required the first."""
+        age = self.age(tables[0])
+        if age is None or age > self.max_age:
+            raise ConnectionException('no telemetry of {} from {} in the last {} s'.format(
+                tables[0], self.name, self.max_age))
+        oldest = time.time() - self.max_age
+        rows = []
+        with self._lock:
+            for table in tables:
+                indexed = self.tables.get(table, {})
+                row_updated = self.row_updated.get(table, {})
+                for index in [index for index, received in row_updated.items() if received < oldest]:
+                    del indexed[index], row_updated[index]
+                rows.extend((table.split('/')[-1], dict(row)) for row in indexed.values())
+        return rows
+
+    def get_interfaces(self):
+        """Return get_interfaces() of the last Ifmgr/Interfaces rows, see netconf.interface_entry()."""
+        return dict((row['Name'], netconf.interface_entry(row)) for _, row in self._rows(INTERFACES)
+                    if 'Name' in row)
+
+    def get_interfaces_counters(self):
+        """Return get_interfaces_counters() of the last Ifmgr/Statistics and Ifmgr/EthPortStatistics rows."""
+        return netconf.interfaces_counters(self._rows(STATISTICS, ETH_STATISTICS))
+
+
+class TelemetryCollector(object):
+    """
+    gRPC server receiving the dial-out telemetry streams of Comware devices.
+
+    Each connected device holds one of max_workers threads for as long as its stream is open,
+    so size it to the number of devices; threads are only started as devices connect.
+    Views are looked up by the device name sent in the messages, or by the address the
+    stream comes from. messages counts the messages received, errors the ones not understood.
+    """
+
+    def __init__(self, host='0.0.0.0', port=TELEMETRY_PORT, max_workers=2048, max_age=180):
+        self.host = host
+        self.port = port
+        self.max_workers = max_workers
+        self.max_age = max_age
+        self.messages = 0
+        self.errors = 0
+        self._views = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        if grpc is None:
+            raise ConnectionException('the telemetry collector requires grpcio, install napalm-h3c-cmw[telemetry]')
+        handler = grpc.method_handlers_generic_handler(SERVICE, {
+            METHOD: grpc.stream_unary_rpc_method_handler(
+                self._dialout, request_deserializer=decode_dialout_msg,
+                response_serializer=encode_dialout_response),
+        })
+        self._server = grpc.server(futures.ThreadPoolExecutor(max_workers=self.max_workers),
+                                   handlers=(handler,), maximum_concurrent_rpcs=self.max_workers)
+        self.port = self._server.add_insecure_port('{}:{}'.format(self.host, self.port))
+        self._server.start()
+
+    def stop(self, grace=None):
+        if self._server is not None:
+            self._server.stop(grace).wait()
+            self._server = None
+
+    def device(self, name):
+        """Return the view of the device name or address, empty until it sends telemetry."""
+        with self._lock:
+            view = self._views.get(name)
+            if view is None:
+                view = self._views[name] = TelemetryView(name, self.max_age)
+            return view
+
+    def devices(self):
+        """Return the names of the devices that sent telemetry."""
+        with self._lock:
+            return sorted(set(view.name for view in self._views.values() if view.updated))
+
+    def _stream_view(self, device_name, address):
+        with self._lock:
+            view = self._views.get(device_name) or self._views.get(address)
+            if view is None:
+                view = TelemetryView(device_name or address, self.max_age)
+            if device_name:
+                self._views[device_name] = view
+            if address:
+                self._views[address] = view
+            return view
+
+    def receive(self, message, address=None):
+        """Update the view of the device of a decoded DialoutMsg, sent from address."""
+        view = self._stream_view(message['device_name'], address)
+        view.model = message['device_model'] or view.model
+        received = time.time()
+        for table, rows in iter_tables(message['json_data']):
+            view.update(table, rows, received)
+        with self._lock:
+            self.messages += 1
+
+    def _dialout(self, messages, context):
+        address = _peer_address(context.peer())
+        for message in messages:
+            try:
+                self.receive(message, address)
+            except (ValueError, KeyError, AttributeError):
+                with self._lock:
+                    self.errors += 1
+        return 'ok'
+
+
+def _peer_address(peer):
+    """Return the address of a gRPC peer, 'ipv4:10.0.0.1:50000' or 'ipv6:[::1]:50000'."""
+    kind, _, address = peer.partition(':')
+    if kind not in ('ipv4', 'ipv6'):
+        return None
+    return address.rsplit(':', 1)[0].strip('[]')
@@ -0,0 +1,54 @@
+"""Running configurations kept between driver instances, checked by a fingerprint."""
+
+import threading
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache():
+    """Return the process-wide cache, used when optional_args['config_cache'] is True."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = RunningConfigCache()
+        return _default_cache
+
+
+class RunningConfigCache(object):
+    """
+    Last running configuration fetched from each device, with the fingerprint it was fetched at.
+
+    The fingerprint is the hash of the output of a cheap command that changes whenever the
+    configuration does. The configuration is only fetched again once the fingerprint moved,
+    so a command that misses some changes serves stale configurations.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._configs = {}
+
+    def __contains__(self, device):
+        with self._lock:
+            return device in self._configs
+
+    def get(self, device, fingerprint):
+        """Return the configuration of device fetched at fingerprint, or None."""
+        with self._lock:
+            entry = self._configs.get(device)
+        if entry is None or entry[0] != fingerprint:
+            return None
+        return entry[1]
+
+    def put(self, device, fingerprint, config):
+        """Store the configuration of device fetched at fingerprint."""
+        with self._lock:
+            self._configs[device] = (fingerprint, config)
+
+    def invalidate(self, device=None):
+        """Forget the configuration of device, or of every device."""
+        with self._lock:
+            if device is None:
+                self._configs.clear()
+            else:
+                self._configs.pop(device, None)
@@ -0,0 +1,59 @@
+"""Per-session snapshots of expensive CLI output."""
+
+import time
+
+
+class CommandSnapshot(object):
+    """
+    Keep the raw output of commands, and the sections split out of it, for a limited time.
+
+    Getters that need the same table (e.g. 'display interface') read it from the device once
+    and share it while the snapshot is fresh. A ttl of 0 disables the snapshot entirely.
+    """
+
+    def __init__(self, ttl=0):
+        self.ttl = ttl
+        self._outputs = {}
+        self._sections = {}
+
+    def _is_fresh(self, timestamp):
+        return (time.time() - timestamp) < self.ttl
+
+    def get(self, command):
+        """Return the cached output of command, or None when missing or expired."""
+        entry = self._outputs.get(command)
+        if entry is None:
+            return None
+        timestamp, output = entry
+        if not self._is_fresh(timestamp):
+            self.invalidate(command)
+            return None
+        return output
+
+    def put(self, command, output):
+        """Store the output of command."""
+        if self.ttl <= 0:
+            return
+        self._outputs[command] = (time.time(), output)
+
+    def get_sections(self, command, separator):
+        """Return the cached sections of command split by separator, or None."""
+        if self.get(command) is None:
+            return None
+        return self._sections.get((command, separator))
+
+    def put_sections(self, command, separator, sections):
+        """Store the sections of command split by separator."""
+        if command not in self._outputs:
+            return
+        self._sections[(command, separator)] = sections
+
+    def invalidate(self, command=None):
+        """Drop the snapshot of command, or of every command when command is None."""
+        if command is None:
+            self._outputs.clear()
+            self._sections.clear()
+            return
+        self._outputs.pop(command, None)
+        for key in [key for key in self._sections if key[0] == command]:
+            del self._sections[key]
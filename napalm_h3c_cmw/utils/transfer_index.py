@@ -0,0 +1,73 @@
+"""Local index of the files uploaded to each device."""
+
+import json
+import os
+
+
+class TransferIndex(object):
+    """
+    JSON-lines record of (device, filename, size, mtime, md5) for files known to be on a device.
+
+    An entry is written after a file was uploaded or its md5 checked on the device. When the
+    size and modification time of the 'dir' listing still match the entry, and the local file
+    has the same md5, the file on the device is the same and neither the upload nor the
+    on-device md5 are needed. Lines are appended, the last one for a file wins.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = None
+
+    def _load(self):
+        if self._entries is not None:
+            return self._entries
+        self._entries = {}
+        lines = 0
+        if os.path.isfile(self.path):
+            with open(self.path) as index_file:
+                for line in index_file:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                        self._entries[(entry['device'], entry['filename'])] = entry
+                    except (ValueError, KeyError, TypeError):
+                        # a line cut short by an interrupted write
+                        continue
+        if lines > 2 * len(self._entries) + 100:
+            self._compact()
+        return self._entries
+
+    def _compact(self):
+        """Rewrite the index with the last entry of each file only."""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as index_file:
+            for entry in self._entries.values():
+                index_file.write(json.dumps(entry, sort_keys=True) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def get(self, device, filename):
+        """Return the entry of filename on device, or None."""
+        return self._load().get((device, filename))
+
+    def matches(self, device, filename, size, mtime, md5):
+        """Tell whether filename on device, listed with size and mtime, is known to have md5."""
+        entry = self.get(device, filename)
+        if entry is None:
+            return False
+        return entry['size'] == size and entry['mtime'] == mtime and entry['md5'] == md5
+
+    def record(self, device, filename, size, mtime, md5):
+        """Remember that filename on device, listed with size and mtime, has md5."""
+        entry = {'device': device, 'filename': filename, 'size': size, 'mtime': mtime, 'md5': md5}
+        self._load()[(device, filename)] = entry
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        line = json.dumps(entry, sort_keys=True) + '\n'
+        with open(self.path, 'ab+') as index_file:
+            if index_file.seek(0, os.SEEK_END) > 0:
+                index_file.seek(-1, os.SEEK_END)
+                if index_file.read(1) != b'\n':
+                    # do not append to a line cut short by an interrupted write
+                    line = '\n' + line
+            index_file.write(line.encode('utf-8'))
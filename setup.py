@@ -31,4 +31,9 @@ setup(
     url="https://github.com/wayneshow/napalm-h3c-cmw.git",
     include_package_data=True,
     install_requires=reqs,
+    extras_require={
+        'async': ['asyncssh'],
+        'netconf': ['ncclient'],
+        'telemetry': ['grpcio'],
+    },
 )
@@ -0,0 +1,61 @@
+"""
+Benchmark every getter on small, medium and giant synthetic devices, with pytest-benchmark.
+
+Each device is a cmw_testing.replay.ReplayConnection serving synthetic outputs
+without latency, on a session prepared as CMWDriver.open() leaves it, so the timings are
+those of the driver: reading the channel and parsing. Every result is checked against the
+size of the device, a parser that drops entries fails the benchmark.
+
+Run with: pytest test/benchmark/bench_getters.py [--benchmark-compare] [-k giant]
+"""
+
+import pytest
+
+from napalm_h3c_cmw import parsers
+from napalm_h3c_cmw.h3c_cmw import CMWDriver
+
+from cmw_testing import synthetic
+from cmw_testing.replay import ReplayConnection
+
+# interfaces, ARP entries, MAC addresses, LLDP neighbors of each device
+DEVICES = {
+    'small': (48, 256, 1024, 8),
+    'medium': (480, 4096, 16384, 48),
+    'giant': (4800, 65536, 262144, 480),
+}
+
+GETTERS = ('get_facts', 'get_interfaces', 'get_interfaces_counters', 'get_mac_address_table', 'get_arp_table',
+           'get_lldp_neighbors')
+
+
+def synthetic_device(size):
+    """Return a CMWDriver on a replayed synthetic device, and the expected size of each getter."""
+    interfaces, arp, mac, lldp = DEVICES[size]
+    outputs = synthetic.device_outputs(interfaces=interfaces, mac_addresses=mac, arp_entries=arp,
+                                       lldp_neighbors=lldp)
+    driver = CMWDriver(synthetic.HOSTNAME, 'admin', 'admin')
+    driver.device = ReplayConnection(outputs, hostname=synthetic.HOSTNAME)
+    driver._paging_disabled = True
+    driver._prompt = parsers.prompt_pattern(driver.device.base_prompt)
+    sizes = {
+        'get_facts': 8,
+        'get_interfaces': interfaces,
+        'get_interfaces_counters': interfaces,
+        'get_mac_address_table': mac,
+        'get_arp_table': arp,
+        'get_lldp_neighbors': lldp,
+    }
+    return driver, sizes
+
+
+@pytest.fixture(scope='module', params=sorted(DEVICES, key=lambda size: DEVICES[size]))
+def device(request):
+    return synthetic_device(request.param)
+
+
+@pytest.mark.parametrize('getter', GETTERS)
+def test_getter(benchmark, device, getter):
+    driver, sizes = device
+    benchmark.group = getter
+    result = benchmark(getattr(driver, getter))
+    assert len(result) == sizes[getter]
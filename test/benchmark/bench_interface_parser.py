@@ -0,0 +1,122 @@
+"""
+Benchmark the 'display interface' parser on a synthetic 1,000-interface dump.
+
+Compares the single-pass parser in napalm_h3c_cmw.parsers with the per-block
+re.search/re.findall implementation it replaced, and checks both agree.
+
+Run from the repository root with:
+
+    PYTHONPATH=.:test python test/benchmark/bench_interface_parser.py [interfaces] [repeat]
+"""
+
+import re
+import sys
+import timeit
+
+from napalm_h3c_cmw import parsers
+from napalm_h3c_cmw.h3c_cmw import CMWDriver
+
+from cmw_testing.synthetic import display_interface
+
+
+def legacy_get_interfaces(new_interfaces):
+    """The per-block implementation that parsers.parse_interfaces replaced."""
+    interfaces = {}
+    re_intf_name_state = r"^(?!Line protocol)(?P<intf_name>\S+).+current state\W+(?P<intf_state>.+)$"
+    re_protocol = r"Line protocol current state\W+(?P<protocol>.+)$"
+    re_mac = r"Hardware address is\W+(?P<mac_address>\S+)"
+    re_speed = r"^Speed\W+(?P<speed>\d+|\w+)"
+    re_description = r"^Description\W+(?P<description>.*)$"
+    for interface in new_interfaces:
+        interface = interface.strip()
+        match_intf = re.search(re_intf_name_state, interface, flags=re.M)
+        match_proto = re.search(re_protocol, interface, flags=re.M)
+        intf_state = match_intf.group('intf_state')
+        protocol = match_proto.group('protocol')
+        match_mac = re.search(re_mac, interface, flags=re.M)
+        mac_address = parsers.napalm.base.helpers.mac(match_mac.group('mac_address')) if match_mac else ""
+        speed = -1
+        match_speed = re.search(re_speed, interface, flags=re.M)
+        if match_speed:
+            speed = match_speed.group('speed')
+            if speed.isdigit():
+                speed = int(speed)
+        description = ''
+        match = re.search(re_description, interface, flags=re.M)
+        if match:
+            description = match.group('description')
+        interfaces[match_intf.group('intf_name')] = {
+            'description': description,
+            'is_enabled': bool('up' in intf_state.lower()),
+            'is_up': bool('up' in protocol.lower()),
+            'last_flapped': -1.0,
+            'mac_address': mac_address,
+            'speed': speed}
+    return interfaces
+
+
+def legacy_get_interfaces_counters(new_interfaces):
+    """The per-block implementation that parsers.parse_interfaces_counters replaced."""
+    def process_counts(tup):
+        for item in tup:
+            if item != "":
+                return int(item)
+        return 0
+
+    interfaces = {}
+    re_intf_name_state = r"^(?!Line protocol)(?P<intf_name>\S+).+current state\W+(?P<intf_state>.+)$"
+    paired = (
+        (r"Discard:\s+(\d+)|(\d+)\s+discard", 'rx_discards', 'tx_discards'),
+        (r"Unicast:\s+(\d+)|(\d+)\s+unicast", 'rx_unicast_packets', 'tx_unicast_packets'),
+        (r"Multicast:\s+(\d+)|(\d+)\s+multicast", 'rx_multicast_packets', 'tx_multicast_packets'),
+        (r"Broadcast:\s+(\d+)|(\d+)\s+broadcast", 'rx_broadcast_packets', 'tx_broadcast_packets'),
+    )
+    for interface in new_interfaces:
+        interface = interface.strip()
+        match_intf = re.search(re_intf_name_state, interface, flags=re.M)
+        intf_counter = dict.fromkeys(parsers.interface_counters({}), 0)
+        match = re.findall(r"Total Error:\s+(\d+)|(\d+)\s+errors", interface, flags=re.M)
+        if match:
+            intf_counter['rx_errors'] = process_counts(match[0])
+        if len(match) == 2:
+            intf_counter['tx_errors'] = process_counts(match[1])
+        for pattern, rx_key, tx_key in paired:
+            match = re.findall(pattern, interface, flags=re.M)
+            if len(match) == 2:
+                intf_counter[rx_key] = process_counts(match[0])
+                intf_counter[tx_key] = process_counts(match[1])
+        match = re.findall(r"Input.+\s+(\d+)\sbytes|Input:.+,(\d+)\sbytes", interface, flags=re.M)
+        if match:
+            intf_counter['rx_octets'] = process_counts(match[0])
+        match = re.findall(r"Output.+\s+(\d+)\sbytes|Output:.+,(\d+)\sbytes", interface, flags=re.M)
+        if match:
+            intf_counter['tx_octets'] = process_counts(match[0])
+        interfaces[match_intf.group('intf_name')] = intf_counter
+    return interfaces
+
+
+def main(count=1000, repeat=5):
+    output = display_interface(count)
+    blocks = CMWDriver._separate_section(parsers.INTERFACE_SEPARATOR, output)
+    print('{} interfaces, {} KB of output'.format(len(blocks), len(output) // 1024))
+
+    # the legacy parser predates mtu
+    interfaces = parsers.parse_interfaces(blocks)
+    for interface in interfaces.values():
+        del interface['mtu']
+    assert interfaces == legacy_get_interfaces(blocks)
+    assert parsers.parse_interfaces_counters(blocks) == legacy_get_interfaces_counters(blocks)
+
+    cases = (
+        ('get_interfaces', legacy_get_interfaces, parsers.parse_interfaces),
+        ('get_interfaces_counters', legacy_get_interfaces_counters, parsers.parse_interfaces_counters),
+    )
+    for name, legacy, current in cases:
+        legacy_time = min(timeit.repeat(lambda: legacy(blocks), number=1, repeat=repeat))
+        current_time = min(timeit.repeat(lambda: current(blocks), number=1, repeat=repeat))
+        print('{:<26} legacy {:8.1f} ms   single-pass {:8.1f} ms   x{:.1f}'.format(
+            name, legacy_time * 1000, current_time * 1000, legacy_time / current_time))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,81 @@
+"""
+Benchmark the merge diff on a synthetic 50,000-line running configuration.
+
+Compares napalm_h3c_cmw.config.merge_diff with the list membership scan _get_merge_diff
+used before, for a candidate of a few thousand lines, half of them already configured.
+
+Run from the repository root with:
+
+    PYTHONPATH=.:test python test/benchmark/bench_merge_diff.py [running_lines] [candidate_lines] [repeat]
+"""
+
+import math
+import sys
+import timeit
+
+from napalm_h3c_cmw import config
+
+from cmw_testing import synthetic
+
+
+def running_config(lines):
+    """Return a synthetic running configuration of about lines lines, 80% of them in interface sections."""
+    sections = int(math.ceil(lines * 0.8 / 9))
+    return synthetic.current_configuration(sections, acl_rules=max(lines - sections * 9, 0))
+
+
+def candidate_config(lines):
+    """Return a candidate of about lines lines, every other interface section already configured."""
+    parts = []
+    count = 0
+    index = 0
+    while count < lines:
+        slot, port = divmod(index, 48)
+        parts.append('interface GigabitEthernet{}/0/{}\n'.format(slot + 1, port + 1))
+        parts.append(' description access port {}\n'.format(index))
+        if index % 2:
+            parts.append(' port access vlan {}\n'.format(index % 4000 + 1))
+        else:
+            parts.append(' port access vlan 999\n')
+        parts.append(' undo poe enable\n')
+        count += 4
+        index += 7
+    return ''.join(parts)
+
+
+def legacy_merge_diff(running_text, candidate_text):
+    """The list membership scan config.merge_diff replaced."""
+    diff = []
+    running_lines = running_text.splitlines()
+    for line in candidate_text.splitlines():
+        if line not in running_lines and line:
+            if line[0].strip() != '!':
+                diff.append(line)
+    return '\n'.join(diff)
+
+
+def main(running_lines=50000, candidate_lines=3000, repeat=3):
+    running_text = running_config(running_lines)
+    candidate_text = candidate_config(candidate_lines)
+    print('running {} lines, candidate {} lines'.format(
+        running_text.count('\n'), candidate_text.count('\n')))
+
+    running = config.parse_config(running_text)
+    diff = config.merge_diff(running, config.parse_config(candidate_text))
+    assert set(line.strip() for line in legacy_merge_diff(running_text, candidate_text).splitlines()) <= \
+        set(line.strip() for line in diff)
+    print('{} lines in the diff'.format(len(diff)))
+
+    legacy_time = min(timeit.repeat(lambda: legacy_merge_diff(running_text, candidate_text),
+                                    number=1, repeat=repeat))
+    parse_time = min(timeit.repeat(lambda: config.parse_config(running_text), number=1, repeat=repeat))
+    diff_time = min(timeit.repeat(lambda: config.merge_diff(running, config.parse_config(candidate_text)),
+                                  number=1, repeat=repeat))
+    print('list scan                 {:8.1f} ms'.format(legacy_time * 1000))
+    print('tree, parse running       {:8.1f} ms'.format(parse_time * 1000))
+    print('tree, diff on parsed tree {:8.1f} ms   x{:.0f} with the parse, x{:.0f} reusing it'.format(
+        diff_time * 1000, legacy_time / (parse_time + diff_time), legacy_time / diff_time))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,107 @@
+"""
+Benchmark getters on CLI text and on the equivalent NETCONF replies.
+
+The same synthetic device is read from 'display interface' and 'display mac-address' with
+the CLI regexes, and from the <rpc-reply> a Comware 7 device would send for the subtree
+filters of the netconf transport, with iterparse. Sizes on the wire are printed too: the
+NETCONF reply carries only the columns asked for, but every value in tags.
+
+Run from the repository root with:
+
+    PYTHONPATH=.:test python test/benchmark/bench_netconf.py [interfaces] [mac_addresses] [repeat]
+"""
+
+import sys
+import timeit
+
+from lxml import etree
+
+from napalm_h3c_cmw import netconf
+from napalm_h3c_cmw import parsers
+
+from cmw_testing import synthetic
+from cmw_testing.netconf_server import build_data, select
+
+
+class CannedSession(netconf.NetconfSession):
+    """NetconfSession answering every <get> from the data of a stand-in device, no network involved."""
+
+    def __init__(self, data):
+        super(CannedSession, self).__init__('bench', 'admin', 'admin')
+        self.data = data
+        self.replies = {}
+
+    def get(self, tables):
+        key = tuple(path for path, _ in tables)
+        if key not in self.replies:
+            selected = select(self.data, netconf.subtree_filter(tables))
+            body = b'' if selected is None else etree.tostring(selected)
+            self.replies[key] = ('<rpc-reply xmlns="{}" message-id="1"><data>'.format(netconf.BASE_NS).encode('utf-8')
+                                 + body + b'</data></rpc-reply>')
+        return self.replies[key]
+
+
+def device_data(interfaces, mac_addresses):
+    """Return the <top> of the tables of a device with the counters of synthetic.display_interface()."""
+    blocks = parsers.separate_sections(parsers.INTERFACE_SEPARATOR, synthetic.display_interface(interfaces))
+    counters = parsers.parse_interfaces_counters(blocks)
+    names, statistics, eth_statistics = [], [], []
+    for index, (name, counter) in enumerate(sorted(counters.items()), 1):
+        names.append({'IfIndex': index, 'Name': name, 'AbbreviatedName': name.replace('GigabitEthernet', 'GE')})
+        statistics.append({'IfIndex': index, 'Name': name, 'InOctets': counter['rx_octets'],
+                           'InUcastPkts': counter['rx_unicast_packets'], 'InDiscards': counter['rx_discards'],
+                           'InErrors': counter['rx_errors'], 'OutOctets': counter['tx_octets'],
+                           'OutUcastPkts': counter['tx_unicast_packets'], 'OutDiscards': counter['tx_discards'],
+                           'OutErrors': counter['tx_errors']})
+        eth_statistics.append({'IfIndex': index, 'InBrdcastPkts': counter['rx_broadcast_packets'],
+                               'InMulticastPkts': counter['rx_multicast_packets'],
+                               'OutBrdcastPkts': counter['tx_broadcast_packets'],
+                               'OutMulticastPkts': counter['tx_multicast_packets']})
+    indexes = dict((row['AbbreviatedName'], row['IfIndex']) for row in names)
+    mac_rows = []
+    for line in synthetic.display_mac_address(mac_addresses).splitlines():
+        fields = parsers.split_mac_address_line(line)
+        if fields is not None:
+            mac, vlan, interface, mac_type = fields
+            mac_rows.append({'VLANID': vlan, 'MacAddress': mac.upper(), 'PortIndex': indexes[interface],
+                             'Status': '2' if mac_type == 'static' else '1', 'Aging': 'true'})
+    return build_data({
+        netconf.INTERFACES[0]: names,
+        netconf.STATISTICS[0]: statistics,
+        netconf.ETH_STATISTICS[0]: eth_statistics,
+        netconf.MAC_ADDRESSES[0]: mac_rows,
+    })
+
+
+def cli_interfaces_counters(output):
+    return parsers.parse_interfaces_counters(parsers.separate_sections(parsers.INTERFACE_SEPARATOR, output))
+
+
+def cli_mac_address_table(output):
+    return [parsers.mac_address_entry(fields) for fields in map(parsers.split_mac_address_line, output.splitlines())
+            if fields is not None]
+
+
+def netconf_mac_address_table(session):
+    return [parsers.mac_address_entry(fields) for fields in session.iter_mac_address_fields()]
+
+
+def main(interfaces=1000, mac_addresses=100000, repeat=3):
+    session = CannedSession(device_data(interfaces, mac_addresses))
+    cases = (
+        ('get_interfaces_counters', cli_interfaces_counters, synthetic.display_interface(interfaces),
+         session.get_interfaces_counters, (netconf.STATISTICS, netconf.ETH_STATISTICS)),
+        ('get_mac_address_table', cli_mac_address_table, synthetic.display_mac_address(mac_addresses),
+         lambda: netconf_mac_address_table(session), (netconf.MAC_ADDRESSES,)),
+    )
+    for name, parse_cli, output, read_netconf, tables in cases:
+        assert parse_cli(output) == read_netconf()
+        cli_time = min(timeit.repeat(lambda: parse_cli(output), number=1, repeat=repeat))
+        netconf_time = min(timeit.repeat(read_netconf, number=1, repeat=repeat))
+        print('{:<26} CLI {:6} KB {:8.1f} ms   NETCONF {:6} KB {:8.1f} ms   x{:.1f}'.format(
+            name, len(output) // 1024, cli_time * 1000, len(session.get(tables)) // 1024, netconf_time * 1000,
+            cli_time / netconf_time))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,44 @@
+"""
+Benchmark the rate engine over a fleet.
+
+devices devices of interfaces ports each are sampled samples times into a RateEngine, then
+the rates of the whole fleet are computed; the time per sample and per interface is printed.
+
+Run from the repository root with:
+
+    PYTHONPATH=.:test python test/benchmark/bench_rates.py [devices] [interfaces] [samples]
+"""
+
+import sys
+import time
+
+from napalm_h3c_cmw import parsers
+from napalm_h3c_cmw.rates import RateEngine
+
+from cmw_testing import synthetic
+
+
+def main(devices=2000, interfaces=48, samples=8):
+    base = parsers.parse_interfaces_counters(
+        parsers.separate_sections(parsers.INTERFACE_SEPARATOR, synthetic.display_interface(interfaces)))
+    engine = RateEngine(size=samples)
+    start = time.time()
+    for sample in range(samples):
+        counters = dict((name, dict((key, value + sample * 1000) for key, value in counter.items()))
+                        for name, counter in base.items())
+        for device in range(devices):
+            engine.add(device, counters, timestamp=sample * 60, uptime=86400 + sample * 60)
+    elapsed = time.time() - start
+    total = devices * samples * interfaces
+    print('added {} interface samples in {:.2f} s, {:.2f} us each'.format(total, elapsed, elapsed * 1e6 / total))
+
+    start = time.time()
+    rates = engine.all_rates()
+    elapsed = time.time() - start
+    assert rates[0][sorted(base)[0]]['rx_octets'] == 1000 / 60.0
+    print('rates of {} interfaces in {:.2f} s, {:.2f} us each'.format(
+        devices * interfaces, elapsed, elapsed * 1e6 / (devices * interfaces)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,60 @@
+"""
+Measure how each parser scales with the size of the device, on synthetic outputs.
+
+Every parser runs on outputs of base, 4x base and 16x base entries generated by
+cmw_testing.synthetic. The time per entry should stay flat: a growth above x1.5
+between two sizes points at a parser doing more than a linear pass over its input.
+
+Run from the repository root with:
+
+    PYTHONPATH=.:test python test/benchmark/bench_scaling.py [factor] [repeat]
+"""
+
+import sys
+import timeit
+
+from napalm_h3c_cmw import config
+from napalm_h3c_cmw import parsers
+
+from cmw_testing import synthetic
+
+SCALES = (1, 4, 16)
+
+
+def _lines(parse_line):
+    return lambda output: [entry for entry in map(parse_line, output.splitlines()) if entry is not None]
+
+
+def _sections(parse_blocks):
+    return lambda output: parse_blocks(parsers.separate_sections(parsers.INTERFACE_SEPARATOR, output))
+
+
+# name, entries at scale 1, generator, parser
+CASES = (
+    ('parse_interfaces', 100, synthetic.display_interface, _sections(parsers.parse_interfaces)),
+    ('parse_interfaces_counters', 100, synthetic.display_interface, _sections(parsers.parse_interfaces_counters)),
+    ('parse_mac_address_line', 10000, synthetic.display_mac_address, _lines(parsers.parse_mac_address_line)),
+    ('parse_arp_line', 10000, synthetic.display_arp, _lines(parsers.parse_arp_line)),
+    ('parse_lldp_neighbors', 1000, synthetic.display_lldp_neighbors, parsers.parse_lldp_neighbors),
+    ('parse_config', 1000, synthetic.current_configuration, config.parse_config),
+    ('CMWConfig.interfaces', 1000, synthetic.current_configuration,
+     lambda output: config.CMWConfig(output).interfaces),
+)
+
+
+def main(factor=1, repeat=3):
+    print('{:<27} {:>9} {:>10} {:>8}'.format('parser', 'entries', 'us/entry', 'growth'))
+    for name, base, generate, parse in CASES:
+        previous = None
+        for scale in SCALES:
+            count = base * scale * factor
+            output = generate(count)
+            seconds = min(timeit.repeat(lambda: parse(output), number=1, repeat=repeat))
+            per_entry = seconds * 1e6 / count
+            growth = '' if previous is None else 'x{:.2f}'.format(per_entry / previous)
+            print('{:<27} {:>9} {:>10.2f} {:>8}'.format(name, count, per_entry, growth))
+            previous = per_entry
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
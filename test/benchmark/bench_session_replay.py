@@ -0,0 +1,99 @@
+"""
+Benchmark the per-command latency of the SSH session on a recorded session replay.
+
+cmw_testing.replay.ReplayConnection replays recorded command outputs, each
+answer arriving one round trip after the command is written. The getters run twice: on a
+session left as netmiko opens it, where every send_command() looks for the prompt again and
+sleeps before its first read, and on a session set up by CMWDriver._prepare_session(),
+where commands are read up to the prompt found once at open().
+
+Run from the repository root with:
+
+    PYTHONPATH=.:test python test/benchmark/bench_session_replay.py [rtt_ms] [interfaces]
+"""
+
+import sys
+import time
+
+from napalm_h3c_cmw.h3c_cmw import CMWDriver
+
+from cmw_testing.replay import ReplayConnection
+from cmw_testing.synthetic import display_interface
+
+HOSTNAME = 'XG.DC06.F058-AS-S5560-101'
+
+RECORDED_SESSION = {
+    'display version': """\
+H3C Comware Software, Version 7.1.070, Release 6126P20
+Copyright (c) 2004-2019 New H3C Technologies Co., Ltd. All rights reserved.
+H3C S5560-30C-EI uptime is 0 weeks, 3 days, 2 hours, 51 minutes
+Last reboot reason : Cold reboot
+""",
+    'display current-configuration | inc sysname': ' sysname {}\n'.format(HOSTNAME),
+    'display ip interface brief': """\
+*down: administratively down
+(s): spoofing  (l): loopback
+Interface                Physical Protocol IP Address      Description
+M-GE0/0/0                up       up       10.0.0.1        --
+Vlan1                    up       up       192.168.1.1     --
+""",
+    'dis device manuinfo': """\
+Slot 1 CPU 0:
+DEVICE_NAME          : S5560-30C-EI
+DEVICE_SERIAL_NUMBER : 210235A1Q9H123000001
+MAC_ADDRESS          : 0023-89b5-6a3c
+""",
+    'display lldp neighbor-information list': """\
+Chassis ID : * -- -- Nearest nontpmr bridge neighbor
+             # -- -- Nearest customer bridge neighbor
+             Default -- -- Nearest bridge neighbor
+System Name               Local Interface Chassis ID      Port ID
+XG.DC06.F060-CS-S6800-100 XGE1/0/51       d461-feab-b3ab  Ten-GigabitEthernet1/2/1
+XG.DC06.F060-CS-S6800-100 XGE1/0/52       d461-feab-b3ab  Ten-GigabitEthernet2/2/1
+""",
+    'display ip interface': '',
+    'display ipv6 interface': '',
+    'screen-length disable': 'Info: The configuration takes effect on the current user terminal interface only.\n',
+    'return': '',
+}
+
+GETTERS = ('get_facts', 'get_interfaces', 'get_interfaces_counters', 'get_interfaces_ip', 'get_lldp_neighbors')
+
+
+def run_getters(driver):
+    timings = {}
+    for getter in GETTERS:
+        start = time.time()
+        getattr(driver, getter)()
+        timings[getter] = time.time() - start
+    return timings
+
+
+def main(rtt_ms=20, count=52):
+    outputs = dict(RECORDED_SESSION, **{'display interface': display_interface(count)})
+    print('replaying with a {} ms round trip, {} interfaces'.format(rtt_ms, count))
+
+    default = CMWDriver(HOSTNAME, 'admin', 'admin')
+    default.device = ReplayConnection(outputs, rtt_ms / 1000.0, hostname=HOSTNAME)
+    prepared = CMWDriver(HOSTNAME, 'admin', 'admin')
+    prepared.device = ReplayConnection(outputs, rtt_ms / 1000.0, hostname=HOSTNAME)
+    start = time.time()
+    prepared._prepare_session()
+    print('session set up once in {:.0f} ms'.format((time.time() - start) * 1000))
+
+    for getter in GETTERS:
+        assert getattr(default, getter)() == getattr(prepared, getter)(), getter
+
+    default_timings = run_getters(default)
+    prepared_timings = run_getters(prepared)
+    for getter in GETTERS + ('total',):
+        if getter == 'total':
+            default_time, prepared_time = sum(default_timings.values()), sum(prepared_timings.values())
+        else:
+            default_time, prepared_time = default_timings[getter], prepared_timings[getter]
+        print('{:<26} send_command {:8.0f} ms   cached prompt {:8.0f} ms   x{:.1f}'.format(
+            getter, default_time * 1000, prepared_time * 1000, default_time / prepared_time))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
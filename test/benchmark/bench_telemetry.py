@@ -0,0 +1,57 @@
+"""
+Benchmark the telemetry collector against polling the CLI.
+
+devices stand-in devices push one sample of the Ifmgr statistics of interfaces ports each,
+in parallel, to a TelemetryCollector on the loopback; the time until every sample is in the
+views is printed, then the time get_interfaces_counters() takes on a view, against parsing
+the 'display interface' output polling would read from one device.
+
+Run from the repository root with:
+
+    PYTHONPATH=.:test python test/benchmark/bench_telemetry.py [devices] [interfaces] [repeat]
+"""
+
+from concurrent import futures
+import sys
+import time
+import timeit
+
+from napalm_h3c_cmw import parsers
+from napalm_h3c_cmw import telemetry
+
+from cmw_testing import synthetic
+from cmw_testing.telemetry_sender import TelemetrySender, statistics_tables
+
+
+def push(target, device_name, tables):
+    with TelemetrySender(target, device_name) as sender:
+        sender.send([tables])
+
+
+def main(devices=200, interfaces=48, repeat=3):
+    output = synthetic.display_interface(interfaces)
+    counters = parsers.parse_interfaces_counters(parsers.separate_sections(parsers.INTERFACE_SEPARATOR, output))
+    tables = statistics_tables(counters)
+    with telemetry.TelemetryCollector(host='127.0.0.1', port=0, max_workers=devices) as collector:
+        target = '127.0.0.1:{}'.format(collector.port)
+        start = time.time()
+        with futures.ThreadPoolExecutor(max_workers=min(devices, 64)) as executor:
+            for result in [executor.submit(push, target, 'device-{}'.format(number), tables)
+                           for number in range(devices)]:
+                result.result()
+        elapsed = time.time() - start
+        print('{} devices x {} interfaces received in {:.2f} s, {:.0f} messages/s'.format(
+            devices, interfaces, elapsed, collector.messages / elapsed))
+
+        view = collector.device('device-0')
+        assert view.get_interfaces_counters() == counters
+        view_time = min(timeit.repeat(view.get_interfaces_counters, number=1, repeat=repeat))
+        cli_time = min(timeit.repeat(
+            lambda: parsers.parse_interfaces_counters(parsers.separate_sections(parsers.INTERFACE_SEPARATOR, output)),
+            number=1, repeat=repeat))
+        print('get_interfaces_counters    view {:8.2f} ms   CLI parse {:8.2f} ms (before any round trip)'.format(
+            view_time * 1000, cli_time * 1000))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,8 @@
+"""Make the package and cmw_testing importable when the benchmarks run from a checkout that is not installed."""
+import os
+import sys
+
+TEST_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+sys.path.insert(0, os.path.dirname(TEST_DIR))
+sys.path.insert(0, TEST_DIR)
@@ -0,0 +1,7 @@
+"""
+Stand-in CMW devices for the unit tests and benchmarks: a replayed CLI session, synthetic
+command outputs, and local NETCONF, SNMP and telemetry peers.
+
+They live under test/ and are not installed with napalm_h3c_cmw; the conftest files of
+test/unit and test/benchmark put test/ on sys.path.
+"""
@@ -0,0 +1,190 @@
+"""A local NETCONF server standing in for a Comware 7 device, for tests and benchmarks."""
+
+import copy
+import socket
+import threading
+
+import paramiko
+from lxml import etree
+
+from napalm_h3c_cmw.netconf import BASE_NS, DATA_NS
+
+# End of message of the NETCONF 1.0 framing
+EOM = b']]>]]>'
+
+HELLO = ('<?xml version="1.0" encoding="UTF-8"?><hello xmlns="{}"><capabilities>'
+         '<capability>urn:ietf:params:netconf:base:1.0</capability></capabilities>'
+         '<session-id>1</session-id></hello>').format(BASE_NS).encode('utf-8')
+
+
+def build_data(tables):
+    """Return the <top> element holding tables, a dictionary of row dictionaries by path of the rows."""
+    top = etree.Element('{{{}}}top'.format(DATA_NS), nsmap={None: DATA_NS})
+    for path, rows in tables.items():
+        names = path.split('/')
+        node = top
+        for name in names[:-1]:
+            tag = '{{{}}}{}'.format(DATA_NS, name)
+            child = node.find(tag)
+            if child is None:
+                child = etree.SubElement(node, tag)
+            node = child
+        row_tag = '{{{}}}{}'.format(DATA_NS, names[-1])
+        for row in rows:
+            element = etree.SubElement(node, row_tag)
+            for column, value in row.items():
+                etree.SubElement(element, '{{{}}}{}'.format(DATA_NS, column)).text = str(value)
+    return top
+
+
+def select(data, selector):
+    """
+    Return a copy of data reduced to what the subtree filter node selector selects, or None.
+
+    Containment and selection nodes are supported, content match nodes are not.
+    """
+    if data.tag != selector.tag:
+        return None
+    if len(selector) == 0:
+        return copy.deepcopy(data)
+    children = dict((child.tag, child) for child in selector)
+    selected = etree.Element(data.tag, nsmap=data.nsmap)
+    for child in data:
+        child_selector = children.get(child.tag)
+        if child_selector is not None:
+            child_selected = select(child, child_selector)
+            if child_selected is not None:
+                selected.append(child_selected)
+    return selected if len(selected) else None
+
+
+class _ServerInterface(paramiko.ServerInterface):
+
+    def __init__(self, username, password):
+        self.username = username
+        self.password = password
+        self.subsystem = threading.Event()
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_auth_password(self, username, password):
+        if (username, password) == (self.username, self.password):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_subsystem_request(self, channel, name):
+        if name != 'netconf':
+            return False
+        self.subsystem.set()
+        return True
+
+
+class NetconfServer(object):
+    """
+    NETCONF 1.0 over SSH on localhost, answering <get> from data, a <top> element.
+
+    Use as a context manager, port is known once started. Only <get>, with or without a
+    subtree filter, and <close-session> are supported; any other operation gets an
+    <rpc-error>. requests counts the <get> served.
+    """
+
+    def __init__(self, data, username='admin', password='admin', host='127.0.0.1', port=0):
+        self.data = data
+        self.username = username
+        self.password = password
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._host_key = paramiko.RSAKey.generate(1024)
+        self._socket = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.listen(8)
+        self.port = self._socket.getsockname()[1]
+        thread = threading.Thread(target=self._accept)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self._socket.accept()
+            except (socket.error, AttributeError):
+                return
+            thread = threading.Thread(target=self._serve, args=(connection,))
+            thread.daemon = True
+            thread.start()
+
+    def _serve(self, connection):
+        transport = paramiko.Transport(connection)
+        transport.add_server_key(self._host_key)
+        server = _ServerInterface(self.username, self.password)
+        try:
+            transport.start_server(server=server)
+            channel = transport.accept(10)
+            if channel is None or not server.subsystem.wait(10):
+                return
+            channel.sendall(HELLO + EOM)
+            buffered = b''
+            while True:
+                data = channel.recv(65536)
+                if not data:
+                    return
+                buffered += data
+                while EOM in buffered:
+                    message, buffered = buffered.split(EOM, 1)
+                    reply, closing = self.answer(message)
+                    if reply is not None:
+                        channel.sendall(reply + EOM)
+                    if closing:
+                        return
+        except (paramiko.SSHException, socket.error, EOFError):
+            return
+        finally:
+            transport.close()
+
+    def answer(self, message):
+        """Return (reply, close the session) of one message received."""
+        request = etree.fromstring(message.strip())
+        if request.tag != '{{{}}}rpc'.format(BASE_NS):
+            return None, False
+        operation = request[0]
+        if operation.tag == '{{{}}}get'.format(BASE_NS):
+            self.requests += 1
+            selected = self.data
+            selector = operation.find('{{{}}}filter'.format(BASE_NS))
+            if selector is not None and len(selector):
+                selected = select(self.data, selector[0])
+            body = b'' if selected is None else etree.tostring(selected)
+            return self._reply(request, b'<data>' + body + b'</data>'), False
+        if operation.tag == '{{{}}}close-session'.format(BASE_NS):
+            return self._reply(request, b'<ok/>'), True
+        error = ('<rpc-error><error-type>protocol</error-type><error-tag>operation-not-supported</error-tag>'
+                 '<error-severity>error</error-severity><error-message>{} is not supported</error-message>'
+                 '</rpc-error>').format(etree.QName(operation).localname)
+        return self._reply(request, error.encode('utf-8')), False
+
+    def _reply(self, request, body):
+        return ('<?xml version="1.0" encoding="UTF-8"?><rpc-reply xmlns="{}" message-id="{}">'.format(
+            BASE_NS, request.get('message-id')).encode('utf-8') + body + b'</rpc-reply>')
@@ -0,0 +1,146 @@
+"""Record the CLI outputs of a device and replay them without one."""
+
+import io
+import os
+import re
+import time
+
+from netmiko.hp.hp_comware import HPComwareBase
+
+# Comware answer to a command it does not know
+UNRECOGNIZED_COMMAND = " ^\n % Unrecognized command found at '^' position.\n"
+
+# Commands CMWDriver sends to set the session up, answered when not recorded
+SESSION_OUTPUTS = {
+    'return': '',
+    'screen-length disable': 'Info: The configuration takes effect on the current user terminal interface only.\n',
+}
+
+
+def output_filename(command):
+    """Return the file name of the output of command, the name napalm's test doubles look for."""
+    return re.sub(r"[^a-zA-Z0-9]", '_', command)[0:150] + '.txt'
+
+
+def load_outputs(directory):
+    """Return the outputs recorded in directory, by file name, for ReplayConnection."""
+    outputs = {}
+    for filename in os.listdir(directory):
+        if filename.endswith('.txt'):
+            with io.open(os.path.join(directory, filename), encoding='utf-8') as output_file:
+                outputs[filename] = output_file.read()
+    return outputs
+
+
+def record(driver, commands, directory):
+    """Run commands on the open driver and save each output in directory, return the outputs."""
+    outputs = driver.cli(commands)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    for command, output in outputs.items():
+        with io.open(os.path.join(directory, output_filename(command)), 'w', encoding='utf-8') as output_file:
+            output_file.write(output if output.endswith('\n') else output + '\n')
+    return outputs
+
+
+class _ReplayTransport(object):
+    """Stands for the paramiko channel and transport, a replayed session never drops."""
+
+    def __init__(self):
+        self.transport = self
+
+    def is_active(self):
+        return True
+
+
+class ReplayConnection(HPComwareBase):
+    """
+    netmiko Comware connection answering from recorded outputs, no network involved.
+
+    outputs maps commands, or their output_filename(), to their output. Each answer starts
+    rtt seconds after its command was written, or after the previous answer ended, and
+    arrives at byte_delay seconds per byte. A command without output is answered like
+    Comware answers an unknown command.
+    """
+
+    def __init__(self, outputs, rtt=0, byte_delay=0, hostname='H3C'):
+        self.outputs = outputs
+        self.rtt = rtt
+        self.byte_delay = byte_delay
+        self.hostname = hostname
+        self.system_view = False
+        # [ready, data, bytes read] of the answers not read yet, in order
+        self.pending = []
+        self.busy_until = 0
+        self.commands = 0
+        # commands written, in order, and the number of channel writes
+        self.sent = []
+        self.writes = 0
+
+        # 'telnet' makes netmiko read through read_channel() only
+        self.protocol = 'telnet'
+        self.remote_conn = _ReplayTransport()
+        self.base_prompt = hostname
+        self.RETURN = '\n'
+        self.RESPONSE_RETURN = '\n'
+        self.TELNET_RETURN = '\r\n'
+        self.ansi_escape_codes = False
+        self.global_delay_factor = 1
+        self.fast_cli = False
+        self.timeout = 100
+        self.session_timeout = 60
+        self.session_log = None
+        self._session_locker = None
+
+    def prompt(self):
+        return ('[{}]' if self.system_view else '<{}>').format(self.hostname)
+
+    def output(self, command):
+        """Return the recorded output of command."""
+        output = self.outputs.get(command)
+        if output is None:
+            output = self.outputs.get(output_filename(command))
+        if output is None:
+            output = SESSION_OUTPUTS.get(command, UNRECOGNIZED_COMMAND)
+        return output
+
+    def write_channel(self, out_data):
+        self.writes += 1
+        for command in out_data.split('\n')[:-1]:
+            command = command.strip()
+            if command:
+                self.commands += 1
+                self.sent.append(command)
+                if command == 'return':
+                    self.system_view = False
+                elif command == 'system-view':
+                    self.system_view = True
+                elif self.system_view and command.startswith('sysname ') and '%' not in self.output(command):
+                    # the prompt that follows already shows the new name, as on a device
+                    self.hostname = command.split(None, 1)[1]
+                data = '{}\r\n{}{}'.format(command, self.output(command).replace('\n', '\r\n'), self.prompt())
+            else:
+                data = '\r\n' + self.prompt()
+            ready = max(time.time(), self.busy_until) + self.rtt
+            self.busy_until = ready + len(data) * self.byte_delay
+            self.pending.append([ready, data, 0])
+
+    def read_channel(self):
+        now = time.time()
+        chunks = []
+        while self.pending:
+            ready, data, sent = self.pending[0]
+            if ready > now:
+                break
+            available = len(data)
+            if self.byte_delay:
+                available = min(available, int((now - ready) / self.byte_delay))
+            chunks.append(data[sent:available])
+            if available < len(data):
+                self.pending[0][2] = available
+                break
+            self.pending.pop(0)
+        return ''.join(chunks)
+
+    def disconnect(self):
+        self.pending = []
@@ -0,0 +1,176 @@
+"""A local SNMPv2c agent answering from snmpsim .snmprec records, for tests and benchmarks."""
+
+import bisect
+import binascii
+import socket
+import threading
+
+from napalm_h3c_cmw import snmp
+
+# snmprec type codes of the BER tags, see snmpsim's documentation
+SNMPREC_TYPES = {
+    '2': snmp.INTEGER,
+    '4': snmp.OCTET_STRING,
+    '5': snmp.NULL,
+    '6': snmp.OBJECT_IDENTIFIER,
+    '64': snmp.IP_ADDRESS,
+    '65': snmp.COUNTER32,
+    '66': snmp.GAUGE32,
+    '67': snmp.TIMETICKS,
+    '70': snmp.COUNTER64,
+}
+_SNMPREC_CODES = dict((tag, code) for code, tag in SNMPREC_TYPES.items())
+
+
+def parse_snmprec(text):
+    """Return the sorted (oid, tag, value) records of the lines 'oid|type|value' of text."""
+    records = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        oid, code, value = line.split('|', 2)
+        hexadecimal = code.endswith('x')
+        tag = SNMPREC_TYPES[code.rstrip('x')]
+        if tag in (snmp.OCTET_STRING, snmp.IP_ADDRESS):
+            value = binascii.unhexlify(value) if hexadecimal else value.encode('utf-8')
+        elif tag == snmp.OBJECT_IDENTIFIER:
+            value = tuple(int(arc) for arc in value.split('.'))
+        elif tag == snmp.NULL:
+            value = None
+        else:
+            value = int(value)
+        records.append((tuple(int(arc) for arc in oid.split('.')), tag, value))
+    return sorted(records)
+
+
+def format_snmprec(records):
+    """Return the snmprec text of (oid, tag, value) records."""
+    lines = []
+    for oid, tag, value in sorted(records):
+        if tag in (snmp.OCTET_STRING, snmp.IP_ADDRESS):
+            code, value = _SNMPREC_CODES[tag] + 'x', binascii.hexlify(value).decode('ascii')
+        elif tag == snmp.OBJECT_IDENTIFIER:
+            code, value = _SNMPREC_CODES[tag], '.'.join(str(arc) for arc in value)
+        else:
+            code = _SNMPREC_CODES[tag]
+            value = '' if value is None else value
+        lines.append('{}|{}|{}'.format('.'.join(str(arc) for arc in oid), code, value))
+    return '\n'.join(lines) + '\n'
+
+
+def if_mib_records(interfaces_counters):
+    """Return the IF-MIB records of a get_interfaces_counters() result, ifIndex in name order from 1."""
+    records = []
+    for index, name in enumerate(sorted(interfaces_counters), 1):
+        records.append((snmp.IF_NAME + (index,), snmp.OCTET_STRING, name.encode('utf-8')))
+        for column, key in snmp.COUNTER_COLUMNS:
+            tag = snmp.COUNTER64 if column[:7] == snmp.IF_NAME[:7] else snmp.COUNTER32
+            records.append((column + (index,), tag, interfaces_counters[name][key]))
+    return sorted(records)
+
+
+class SnmpResponder(object):
+    """
+    SNMPv2c agent on a local UDP port, answering GET, GETNEXT and GETBULK from records.
+
+    Use as a context manager, port is known once started. Requests with another community
+    are dropped, as agents do. Responses are cut to max_size bytes by dropping the last
+    varbinds of a GETBULK. requests counts the requests answered.
+    """
+
+    def __init__(self, records, community='public', host='127.0.0.1', port=0, max_size=1472):
+        self.records = sorted(records)
+        self._oids = [oid for oid, _, _ in self.records]
+        self.community = community.encode('utf-8')
+        self.host = host
+        self.port = port
+        self.max_size = max_size
+        self.requests = 0
+        self._socket = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((self.host, self.port))
+        self.port = self._socket.getsockname()[1]
+        thread = threading.Thread(target=self._serve, args=(self._socket,))
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _serve(self, sock):
+        while True:
+            try:
+                data, address = sock.recvfrom(65535)
+            except (socket.error, OSError):
+                return
+            response = self.answer(data)
+            if response is not None:
+                try:
+                    sock.sendto(response, address)
+                except (socket.error, OSError):
+                    return
+
+    def answer(self, data):
+        """Return the response to the request data, None when it is dropped."""
+        try:
+            community, pdu_type, request_id, field1, field2, varbinds = snmp.decode_message(data)
+        except (ValueError, IndexError):
+            return None
+        if community != self.community:
+            return None
+        self.requests += 1
+        oids = [oid for oid, _, _ in varbinds]
+        if pdu_type == snmp.GET_REQUEST:
+            response = [self._get(oid) for oid in oids]
+        elif pdu_type == snmp.GET_NEXT_REQUEST:
+            response = [self._next(oid) for oid in oids]
+        elif pdu_type == snmp.GET_BULK_REQUEST:
+            return self._bulk(request_id, oids, field1, field2)
+        else:
+            return snmp.encode_message(self.community, snmp.RESPONSE, request_id, varbinds, 5, 0)
+        return snmp.encode_message(self.community, snmp.RESPONSE, request_id, response)
+
+    def _get(self, oid):
+        position = bisect.bisect_left(self._oids, oid)
+        if position < len(self._oids) and self._oids[position] == oid:
+            return self.records[position]
+        return oid, snmp.NO_SUCH_INSTANCE, None
+
+    def _next(self, oid):
+        position = bisect.bisect_right(self._oids, oid)
+        if position < len(self._oids):
+            return self.records[position]
+        return oid, snmp.END_OF_MIB_VIEW, None
+
+    def _bulk(self, request_id, oids, non_repeaters, max_repetitions):
+        response = [self._next(oid) for oid in oids[:non_repeaters]]
+        cursors = oids[non_repeaters:]
+        # the lengths of the message and of the varbinds list may take up to 3 more bytes each
+        size = len(snmp.encode_message(self.community, snmp.RESPONSE, request_id, response)) + 6
+        for _ in range(max_repetitions):
+            if not cursors:
+                break
+            row = [self._next(oid) for oid in cursors]
+            size += sum(len(snmp.encode_varbind(oid, tag, value)) for oid, tag, value in row)
+            if size > self.max_size:
+                break
+            response.extend(row)
+            cursors = [oid for oid, _, _ in row]
+            if all(tag == snmp.END_OF_MIB_VIEW for _, tag, _ in row):
+                break
+        if not response and cursors:
+            # tooBig, not even one row fits
+            return snmp.encode_message(self.community, snmp.RESPONSE, request_id, [], 1, 0)
+        return snmp.encode_message(self.community, snmp.RESPONSE, request_id, response)
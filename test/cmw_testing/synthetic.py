@@ -0,0 +1,192 @@
+"""Synthetic CLI outputs of a device of any size, in the formats the parsers read."""
+
+INTERFACE_TEMPLATE = """\
+GigabitEthernet{slot}/0/{port} current state : {state}
+Line protocol current state : {state}
+Description:GigabitEthernet{slot}/0/{port} Interface
+Route Port,The Maximum Transmit Unit is 1500
+IP Sending Frames' Format is PKTFMT_ETHNT_2, Hardware address is 00e0-fc{slot:02x}-{port:04x}
+Last physical up time   : 2020-03-01 08:12:45
+Last physical down time : 2020-02-28 17:02:11
+Current system time: 2020-03-05 10:21:03
+Port Mode: COMMON COPPER
+Speed : 1000,  Loopback: NONE
+Duplex: FULL,  Negotiation: ENABLE
+Mdi   : AUTO
+Last 300 seconds input rate 2871 bits/sec, 3 packets/sec
+Last 300 seconds output rate 1520 bits/sec, 1 packets/sec
+Input peak rate 101552 bits/sec,Record time: 2020-03-02 14:10:33
+Output peak rate 80944 bits/sec,Record time: 2020-03-02 14:10:33
+
+Input:  {rx_packets} packets, {rx_bytes} bytes
+  Unicast:              {n},  Multicast:              {n1}
+  Broadcast:            {n2},  Jumbo:                  0
+  Discard:                   0,  Total Error:                 {n3}
+
+  CRC:                       0,  Giants:                      0
+  Jabber:                    0,  Throttles:                   0
+  Runts:                     0,  Symbols:                     0
+  Ignoreds:                  0,  Frames:                      0
+
+Output:  {tx_packets} packets, {tx_bytes} bytes
+  Unicast:              {n4},  Multicast:              {n5}
+  Broadcast:            {n6},  Jumbo:                  0
+  Discard:                   0,  Total Error:                 0
+
+  Collisions:                0,  ExcessiveCollisions:         0
+  Late Collisions:           0,  Deferreds:                   0
+  Buffers Purged:            0
+
+    Input bandwidth utilization threshold : 100.00%
+    Output bandwidth utilization threshold: 100.00%
+    Input bandwidth utilization  :    0.01%
+    Output bandwidth utilization :    0.01%
+"""
+
+CONFIG_INTERFACE_TEMPLATE = """\
+#
+interface GigabitEthernet{slot}/0/{port}
+ port link-mode bridge
+ description access port {index}
+ port access vlan {vlan}
+ stp edged-port
+ poe enable
+ broadcast-suppression pps 3000
+ qos trust dscp
+"""
+
+HOSTNAME = 'SYNTHETIC'
+
+# The other commands of get_facts(), their output does not grow with the device
+FACTS_OUTPUTS = {
+    'display version': """\
+H3C Comware Software, Version 7.1.070, Release 6126P20
+Copyright (c) 2004-2019 New H3C Technologies Co., Ltd. All rights reserved.
+H3C S5560-30C-EI uptime is 0 weeks, 3 days, 2 hours, 51 minutes
+Last reboot reason : Cold reboot
+""",
+    'display current-configuration | inc sysname': ' sysname {}\n'.format(HOSTNAME),
+    'display ip interface brief': """\
+*down: administratively down
+(s): spoofing  (l): loopback
+Interface                Physical Protocol IP Address      Description
+M-GE0/0/0                up       up       10.0.0.1        --
+Vlan1                    up       up       192.168.1.1     --
+""",
+    'dis device manuinfo': """\
+Slot 1 CPU 0:
+DEVICE_NAME          : S5560-30C-EI
+DEVICE_SERIAL_NUMBER : 210235A1Q9H123000001
+MAC_ADDRESS          : 0023-89b5-6a3c
+""",
+}
+
+
+def _port(index):
+    """Return the (slot, port) of the index-th port of a stack of 48-port members."""
+    slot, port = divmod(index, 48)
+    return slot + 1, port + 1
+
+
+def display_interface(count):
+    """Return a 'display interface' output with count ports, one in three down."""
+    blocks = []
+    for index in range(count):
+        slot, port = _port(index)
+        blocks.append(INTERFACE_TEMPLATE.format(
+            slot=slot, port=port, state='UP' if index % 3 else 'DOWN',
+            rx_packets=index * 1000, rx_bytes=index * 64000, tx_packets=index * 900,
+            tx_bytes=index * 57600, n=index * 7, n1=index * 3, n2=index, n3=index % 5,
+            n4=index * 6, n5=index * 2, n6=index % 11))
+    return ''.join(blocks)
+
+
+def display_mac_address(count, ports=48):
+    """Return a 'display mac-address' output with count entries learned on ports ports, one in ten static."""
+    lines = ['MAC Address    VLAN/VSI/BD                       Learned-From        Type', '-' * 79]
+    for index in range(count):
+        slot, port = _port(index % ports)
+        lines.append('5c5e-{:04x}-{:04x} {:<33} {:<19} {}'.format(
+            index // 65536, index % 65536, '{}/-/-'.format(index % 4000 + 1), 'GE{}/0/{}'.format(slot, port),
+            'static' if index % 10 == 0 else 'dynamic'))
+    lines.append('')
+    lines.append('Total items displayed = {}'.format(count))
+    return '\n'.join(lines) + '\n'
+
+
+def display_arp(count, ports=48):
+    """Return a 'display arp' output with count entries on ports ports, one in twenty static."""
+    lines = ['ARP Entry Types: D - Dynamic, S - Static, I - Interface, O - OpenFlow',
+             'EXP: Expire-time',
+             '',
+             'IP ADDRESS      MAC ADDRESS    EXP(M) TYPE/VLAN       INTERFACE        VPN-INSTANCE',
+             '-' * 78]
+    for index in range(count):
+        slot, port = _port(index % ports)
+        vlan = index % 4000 + 1
+        if index % 20 == 0:
+            expire, entry_type = '', 'S-{}'.format(vlan)
+        else:
+            expire, entry_type = '20', 'D-{}'.format(vlan)
+        address = '10.{}.{}.{}'.format(index // 65536, index // 256 % 256, index % 256)
+        lines.append('{:<15} 00e0-{:04x}-{:04x} {:>4}   {:<15} GE{}/0/{}'.format(
+            address, index // 65536, index % 65536, expire, entry_type, slot, port))
+    lines.append('-' * 78)
+    lines.append('Total:{:<10}'.format(count))
+    return '\n'.join(lines) + '\n'
+
+
+def display_lldp_neighbors(count):
+    """Return a 'display lldp neighbor-information list' output with count neighbors."""
+    lines = ['Chassis ID : * -- -- Nearest nontpmr bridge neighbor',
+             '             # -- -- Nearest customer bridge neighbor',
+             '             Default -- -- Nearest bridge neighbor',
+             'System Name               Local Interface Chassis ID      Port ID']
+    for index in range(count):
+        slot, port = _port(index)
+        lines.append('ACCESS-{:<18} {:<15} d461-feab-{:04x}  Ten-GigabitEthernet1/0/{}'.format(
+            index, 'GE{}/0/{}'.format(slot, port), index % 65536, index % 48 + 1))
+    return '\n'.join(lines) + '\n'
+
+
+def current_configuration(sections, acl_rules=0):
+    """
+    Return a 'display current-configuration' output with sections interface sections.
+
+    The global commands come first, then the VLANs the ports use, the ports and an
+    advanced ACL with acl_rules rules.
+    """
+    parts = ['#\n version 7.1.070, Release 6126P20\n#\n sysname {}\n#\n'.format(HOSTNAME),
+             ' ntp-service enable\n ntp-service unicast-server 10.0.0.100\n ntp-service unicast-peer 10.0.0.201\n#\n',
+             ' snmp-agent\n snmp-agent community read simple public acl 2000\n'
+             ' snmp-agent sys-info contact noc@example.com\n snmp-agent sys-info location lab\n']
+    for vlan in range(1, min(sections, 4000) + 1):
+        parts.append('#\nvlan {}\n'.format(vlan))
+    for index in range(sections):
+        slot, port = _port(index)
+        parts.append(CONFIG_INTERFACE_TEMPLATE.format(slot=slot, port=port, index=index, vlan=index % 4000 + 1))
+    if acl_rules:
+        parts.append('#\nacl advanced 3000\n')
+        for rule in range(acl_rules):
+            parts.append(' rule {} permit ip source 10.{}.{}.0 0.0.0.255\n'.format(
+                rule * 5, rule // 256 % 256, rule % 256))
+    parts.append('#\nreturn\n')
+    return ''.join(parts)
+
+
+def device_outputs(interfaces=48, mac_addresses=1024, arp_entries=256, lldp_neighbors=8, sections=None):
+    """
+    Return the outputs of the commands of the getters on a device of the given size.
+
+    The dictionary serves a replay.ReplayConnection; sections defaults to one
+    configuration section per interface.
+    """
+    outputs = dict(FACTS_OUTPUTS)
+    outputs.update({
+        'display interface': display_interface(interfaces),
+        'display mac-address': display_mac_address(mac_addresses),
+        'display arp': display_arp(arp_entries),
+        'display lldp neighbor-information list': display_lldp_neighbors(lldp_neighbors),
+        'display current-configuration': current_configuration(interfaces if sections is None else sections),
+    })
+    return outputs
@@ -0,0 +1,81 @@
+"""A stand-in Comware device pushing dial-out telemetry to a collector, for tests and benchmarks."""
+
+import datetime
+import json
+
+import grpc
+
+from napalm_h3c_cmw import netconf
+from napalm_h3c_cmw import telemetry
+
+# get_interfaces_counters() keys of the Statistics and EthPortStatistics columns
+_STATISTICS_KEYS = [(column, key) for column, key in sorted(netconf.COUNTER_COLUMNS.items())
+                    if column in netconf.STATISTICS[1]]
+_ETH_STATISTICS_KEYS = [(column, key) for column, key in sorted(netconf.COUNTER_COLUMNS.items())
+                        if column in netconf.ETH_STATISTICS[1]]
+
+
+def json_data(tables, timestamp=None):
+    """Return the JSON data of a DialoutMsg carrying tables, {'Module/Table/Row': rows}."""
+    notification = {'Timestamp': timestamp or datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')}
+    for path, rows in tables.items():
+        module, table, row = path.split('/')
+        notification.setdefault(module, {})[table] = {row: rows}
+    return json.dumps({'notificationType': 'period', 'notification': notification})
+
+
+def statistics_tables(interfaces_counters):
+    """Return the Ifmgr Statistics and EthPortStatistics tables of a get_interfaces_counters() result."""
+    statistics, eth_statistics = [], []
+    for index, name in enumerate(sorted(interfaces_counters), 1):
+        counter = interfaces_counters[name]
+        row = {'IfIndex': index, 'Name': name}
+        row.update((column, counter[key]) for column, key in _STATISTICS_KEYS)
+        statistics.append(row)
+        row = {'IfIndex': index}
+        row.update((column, counter[key]) for column, key in _ETH_STATISTICS_KEYS)
+        eth_statistics.append(row)
+    return {netconf.STATISTICS[0]: statistics, netconf.ETH_STATISTICS[0]: eth_statistics}
+
+
+class TelemetrySender(object):
+    """
+    Dial-out client of one device, sending the tables of its sensor paths to target, 'host:port'.
+
+    send() opens one stream, as a device does for a subscription, and sends one DialoutMsg per
+    sensor path of every sample.
+    """
+
+    def __init__(self, target, device_name, device_model='S5560-30C-EI'):
+        self.device_name = device_name
+        self.device_model = device_model
+        self._channel = grpc.insecure_channel(target)
+        self._dialout = self._channel.stream_unary(
+            '/{}/{}'.format(telemetry.SERVICE, telemetry.METHOD),
+            request_serializer=telemetry.encode_dialout_msg,
+            response_deserializer=telemetry.decode_dialout_response)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._channel.close()
+
+    def messages(self, tables):
+        """Yield the DialoutMsg of every sensor path of tables, {'Module/Table/Row': rows}."""
+        for path, rows in sorted(tables.items()):
+            yield {
+                'producer_name': 'H3C',
+                'device_name': self.device_name,
+                'device_model': self.device_model,
+                'sensor_path': path.rsplit('/', 1)[0].lower(),
+                'json_data': json_data({path: rows}),
+            }
+
+    def send(self, samples, timeout=10):
+        """Send samples, a list of tables as messages() takes, on one stream and return the response."""
+        return self._dialout((message for tables in samples for message in self.messages(tables)),
+                             timeout=timeout, wait_for_ready=True)
@@ -16,7 +16,7 @@
 
 import unittest
 
-from napalm_huawei_vrp import vrp
+from napalm_h3c_cmw import h3c_cmw
 from napalm.base.test.base import TestConfigNetworkDriver, TestGettersNetworkDriver
 import json
 
@@ -33,8 +33,8 @@ class TestConfigDriver(unittest.TestCase, TestConfigNetworkDriver):
         cls.vendor = 'skeleton'
 
         optional_args = {'port': 12443, }
-        cls.device = vrp.VRPDriver(hostname, username, password, timeout=60,
-                                             optional_args=optional_args)
+        cls.device = h3c_cmw.CMWDriver(hostname, username, password, timeout=60,
+                                       optional_args=optional_args)
         cls.device.open()
 
         cls.device.load_replace_candidate(filename='%s/initial.conf' % cls.vendor)
@@ -55,8 +55,8 @@ class TestGetterDriver(unittest.TestCase, TestGettersNetworkDriver):
         cls.vendor = 'skeleton'
 
         optional_args = {'port': 12443, }
-        cls.device = vrp.VRPDriver(hostname, username, password, timeout=60,
-                                             optional_args=optional_args)
+        cls.device = h3c_cmw.CMWDriver(hostname, username, password, timeout=60,
+                                       optional_args=optional_args)
 
         if cls.mock:
             cls.device.device = FakeDevice()
@@ -16,7 +16,7 @@
 
 import unittest
 
-from napalm_huawei_vrp import vrp
+from napalm_h3c_cmw import h3c_cmw
 from napalm.base.test.base import TestConfigNetworkDriver
 
 
@@ -32,8 +32,8 @@ class TestConfigSkeletonDriver(unittest.TestCase, TestConfigNetworkDriver):
         cls.vendor = 'huawei'
 
         optional_args = {}
-        cls.device = vrp.VRPDriver(hostname, username, password, timeout=60,
-                                             optional_args=optional_args)
+        cls.device = h3c_cmw.CMWDriver(hostname, username, password, timeout=60,
+                                       optional_args=optional_args)
         cls.device.open()
 
         # cls.device.load_replace_candidate(filename='%s/initial.conf' % cls.vendor)
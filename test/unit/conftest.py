@@ -1,12 +1,19 @@
 """Test fixtures."""
 from builtins import super
+import os
+import sys
 
 import pytest
 from napalm.base.test import conftest as parent_conftest
 
 from napalm.base.test.double import BaseTestDouble
 
-from napalm_skeleton import skeleton
+from napalm_h3c_cmw import h3c_cmw
+from napalm_h3c_cmw import parsers
+
+# the stand-in devices of test/cmw_testing, not installed with the package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+from cmw_testing.replay import ReplayConnection  # noqa: E402
 
 
 @pytest.fixture(scope='class')
@@ -16,42 +23,67 @@ def set_device_parameters(request):
         request.cls.device.close()
     request.addfinalizer(fin)
 
-    request.cls.driver = skeleton.SkeletonDriver
-    request.cls.patched_driver = PatchedSkeletonDriver
-    request.cls.vendor = 'skeleton'
+    request.cls.driver = h3c_cmw.CMWDriver
+    request.cls.patched_driver = PatchedCMWDriver
+    request.cls.vendor = 'h3c_cmw'
     parent_conftest.set_device_parameters(request)
 
 
+@pytest.fixture
+def replayed_driver():
+    """
+    Return a function building a CMWDriver on a replayed session, as open() leaves it.
+
+    The function takes the outputs of a new ReplayConnection, with its hostname and other
+    arguments, or a device already built, and the optional_args and timeout of the driver.
+    netmiko's delays are cut so that its waits for a quiet channel are short. With
+    opened=False the session is left for open() to set up, as if just logged in.
+    """
+    def build(outputs=None, optional_args=None, timeout=60, device=None, opened=True, **replay_args):
+        driver = h3c_cmw.CMWDriver('127.0.0.1', 'admin', 'admin', timeout=timeout, optional_args=optional_args)
+        if device is None:
+            device = ReplayConnection(outputs or {}, **replay_args)
+        device.fast_cli = True
+        device.global_delay_factor = 0.05
+        driver._netmiko_open = lambda device_type, netmiko_optional_args=None: device
+        if opened:
+            driver.device = device
+            driver._paging_disabled = True
+            driver._prompt = parsers.prompt_pattern(device.base_prompt)
+        return driver
+    return build
+
+
 def pytest_generate_tests(metafunc):
     """Generate test cases dynamically."""
     parent_conftest.pytest_generate_tests(metafunc, __file__)
 
 
-class PatchedSkeletonDriver(skeleton.SkeletonDriver):
-    """Patched Skeleton Driver."""
+class PatchedCMWDriver(h3c_cmw.CMWDriver):
+    """Patched CMW Driver."""
 
     def __init__(self, hostname, username, password, timeout=60, optional_args=None):
-        """Patched Skeleton Driver constructor."""
+        """Patched CMW Driver constructor."""
         super().__init__(hostname, username, password, timeout, optional_args)
 
         self.patched_attrs = ['device']
-        self.device = FakeSkeletonDevice()
-
+        self.device = FakeCMWDevice()
 
-class FakeSkeletonDevice(BaseTestDouble):
-    """Skeleton device test double."""
+    def open(self):
+        """Leave the fake session as open() leaves a real one, pager off and prompt known."""
+        self._paging_disabled = True
+        self._prompt = parsers.prompt_pattern(self.device.base_prompt)
 
-    def run_commands(self, command_list, encoding='json'):
-        """Fake run_commands."""
-        result = list()
 
-        for command in command_list:
-            filename = '{}.{}'.format(self.sanitize_text(command), encoding)
-            full_path = self.find_file(filename)
+class FakeCMWDevice(ReplayConnection, BaseTestDouble):
+    """CMW device test double, replaying the outputs of the current test case."""
 
-            if encoding == 'json':
-                result.append(self.read_json_file(full_path))
-            else:
-                result.append({'output': self.read_txt_file(full_path)})
+    def __init__(self):
+        """Fake CMW device constructor."""
+        ReplayConnection.__init__(self, {})
+        BaseTestDouble.__init__(self)
 
-        return result
+    def output(self, command):
+        """Return the content of mocked_data/<test>/<test case>/<command>.txt."""
+        filename = '{}.txt'.format(self.sanitize_text(command))
+        return self.read_txt_file(self.find_file(filename))
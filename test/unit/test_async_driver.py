@@ -0,0 +1,259 @@
+"""Tests for AsyncCMWDriver on a replayed asyncssh process."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from napalm.base.exceptions import CommandErrorException, ConnectionException
+
+from napalm_h3c_cmw import async_driver
+from napalm_h3c_cmw import parsers
+from napalm_h3c_cmw.async_driver import AsyncCMWDriver
+
+from cmw_testing import synthetic
+from cmw_testing.replay import SESSION_OUTPUTS, UNRECOGNIZED_COMMAND
+
+OUTPUTS = synthetic.device_outputs(interfaces=8, mac_addresses=64, arp_entries=64)
+ARP_TABLE = parsers.parse_arp_table(OUTPUTS['display arp'])
+MAC_ADDRESS_TABLE = parsers.parse_mac_address_table(OUTPUTS['display mac-address'])
+
+
+class ReplayStream(object):
+    """stdin and stdout of an asyncssh process answering from recorded outputs."""
+
+    def __init__(self, outputs, hostname='H3C', chunk_size=512, page_lines=0):
+        self.outputs = outputs
+        self.hostname = hostname
+        self.chunk_size = chunk_size
+        self.page_lines = page_lines
+        self.commands = []
+        self.chunks = asyncio.Queue()
+        self.pages = []
+
+    def write(self, data):
+        if data == ' ':
+            self._answer(self.pages.pop(0))
+            return
+        for command in data.split('\n')[:-1]:
+            if command:
+                self.commands.append(command)
+            output = self.outputs.get(command, SESSION_OUTPUTS.get(command, UNRECOGNIZED_COMMAND))
+            lines = '{}\r\n{}'.format(command, output).replace('\n', '\r\n').splitlines(True)
+            if self.page_lines:
+                self.pages = [''.join(lines[start:start + self.page_lines]) + '  ---- More ----'
+                              for start in range(0, len(lines), self.page_lines)]
+                self.pages[-1] = self.pages[-1][:-len('  ---- More ----')] + '<{}>'.format(self.hostname)
+                self._answer(self.pages.pop(0))
+            else:
+                self._answer(''.join(lines) + '<{}>'.format(self.hostname))
+
+    def _answer(self, data):
+        for start in range(0, len(data), self.chunk_size):
+            self.chunks.put_nowait(data[start:start + self.chunk_size])
+
+    async def read(self, size):
+        return await self.chunks.get()
+
+    def at_eof(self):
+        return False
+
+
+class ReplayProcess(object):
+
+    def __init__(self, stream):
+        self.stdin = stream
+        self.stdout = stream
+
+
+def streamed_driver(stream, timeout=5):
+    device = AsyncCMWDriver('127.0.0.1', 'admin', 'admin', timeout=timeout)
+    device._process = ReplayProcess(stream)
+    device._lock = asyncio.Lock()
+    device.base_prompt = stream.hostname
+    device._prompt = parsers.prompt_pattern(stream.hostname)
+    return device
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_send_command():
+    async def scenario():
+        device = streamed_driver(ReplayStream(OUTPUTS))
+        return await device.send_command('display version')
+
+    output = run(scenario())
+    assert output.strip() == OUTPUTS['display version'].strip()
+    assert '<H3C>' not in output
+
+
+@pytest.mark.parametrize('chunk_size,page_lines', [(7, 0), (65536, 0), (64, 10)])
+def test_getters_match_parsers(chunk_size, page_lines):
+    async def scenario():
+        device = streamed_driver(ReplayStream(OUTPUTS, chunk_size=chunk_size, page_lines=page_lines))
+        return await device.get_arp_table(), await device.get_mac_address_table(), await device.get_facts()
+
+    arp_table, mac_address_table, facts = run(scenario())
+    assert arp_table == ARP_TABLE
+    assert mac_address_table == MAC_ADDRESS_TABLE
+    assert len(arp_table) == 64
+    assert facts['hostname'] == synthetic.HOSTNAME
+
+
+def test_early_exit_with_aclose():
+    async def scenario():
+        stream = ReplayStream(OUTPUTS, chunk_size=64)
+        device = streamed_driver(stream)
+        entries = device.iter_arp_table()
+        async for _ in entries:
+            break
+        await entries.aclose()
+        assert not device._lock.locked()
+        return await asyncio.wait_for(device.send_command('display version'), 1)
+
+    assert run(scenario()).strip() == OUTPUTS['display version'].strip()
+
+
+def test_early_exit_without_reference():
+    async def scenario():
+        device = streamed_driver(ReplayStream(OUTPUTS, chunk_size=64))
+        async for _ in device.iter_mac_address_table():
+            break
+        # the event loop closes the dropped generator, the next command reads its own output
+        return await asyncio.wait_for(device.send_command('display version'), 1)
+
+    assert run(scenario()).strip() == OUTPUTS['display version'].strip()
+
+
+def test_concurrent_commands_serialized():
+    async def scenario():
+        device = streamed_driver(ReplayStream(OUTPUTS, chunk_size=32))
+        return await asyncio.gather(device.get_arp_table(), device.send_command('display version'))
+
+    arp_table, version = run(scenario())
+    assert arp_table == ARP_TABLE
+    assert version.strip() == OUTPUTS['display version'].strip()
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    """Executor recording the functions submitted to it."""
+
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.functions = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.functions.append(fn)
+        return super().submit(fn, *args, **kwargs)
+
+
+def test_getters_parse_in_executor():
+    async def scenario():
+        device = streamed_driver(ReplayStream(OUTPUTS))
+        device.parse_executor = executor
+        return await device.get_arp_table(), await device.get_mac_address_table()
+
+    with RecordingExecutor() as executor:
+        assert run(scenario()) == (ARP_TABLE, MAC_ADDRESS_TABLE)
+    assert executor.functions == [parsers.parse_arp_table, parsers.parse_mac_address_table]
+
+
+class StallingStream(ReplayStream):
+    """Stream sending the first half of the output of 'display arp', then nothing."""
+
+    def _answer(self, data):
+        if self.commands[-1] == 'display arp':
+            data = data[:len(data) // 2]
+        super()._answer(data)
+
+
+def test_read_timeout_closes_the_session():
+    async def scenario():
+        device = streamed_driver(StallingStream(OUTPUTS), timeout=0.1)
+        with pytest.raises(CommandErrorException):
+            await device.send_command('display arp')
+        assert not device.is_alive()['is_alive']
+        with pytest.raises(ConnectionException):
+            await device.send_command('display version')
+
+    run(scenario())
+
+
+class StubConnection(object):
+    """asyncssh connection running a process on stream, or failing to when stream is None."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.closed = False
+
+    async def create_process(self, term_type=None):
+        if self.stream is None:
+            raise StubAsyncssh.Error('session refused')
+        return ReplayProcess(self.stream)
+
+    def close(self):
+        self.closed = True
+
+    async def wait_closed(self):
+        pass
+
+
+class StubAsyncssh(object):
+    """Stand-in for the asyncssh module, connect() returning a StubConnection on the next stream."""
+
+    class Error(Exception):
+        pass
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.connections = []
+        self.arguments = {}
+
+    async def connect(self, hostname, **kwargs):
+        self.arguments.update(kwargs)
+        connection = StubConnection(self.stream)
+        self.connections.append(connection)
+        return connection
+
+
+class ClosedStream(ReplayStream):
+    """A session closed by the device before it shows a prompt."""
+
+    def write(self, data):
+        self.chunks.put_nowait('')
+
+
+def open_stub(monkeypatch, stream, **optional_args):
+    stub = StubAsyncssh(stream)
+    monkeypatch.setattr(async_driver, 'asyncssh', stub)
+    device = AsyncCMWDriver('127.0.0.1', 'admin', 'admin', timeout=0.1, optional_args=optional_args)
+    with pytest.raises(ConnectionException):
+        run(device.open())
+    assert device._conn is None
+    return stub
+
+
+def test_open_without_prompt(monkeypatch):
+    # a session that never shows a prompt
+    stream = ReplayStream({})
+    stream.write = lambda data: None
+    stub = open_stub(monkeypatch, stream, known_hosts='/etc/ssh/known_hosts')
+    assert stub.connections[0].closed
+    assert stub.arguments['known_hosts'] == '/etc/ssh/known_hosts'
+
+
+def test_open_eof_at_prompt(monkeypatch):
+    stub = open_stub(monkeypatch, ClosedStream({}))
+    assert stub.connections[0].closed
+
+
+def test_open_process_refused(monkeypatch):
+    stub = open_stub(monkeypatch, None)
+    assert stub.connections[0].closed
+
+
+def test_open_requires_asyncssh(monkeypatch):
+    monkeypatch.setattr(async_driver, 'asyncssh', None)
+    with pytest.raises(ConnectionException):
+        run(AsyncCMWDriver('127.0.0.1', 'admin', 'admin').open())
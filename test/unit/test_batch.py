@@ -0,0 +1,60 @@
+"""Tests for batched commands, split on the prompts of a replayed session."""
+
+import pytest
+
+from napalm_h3c_cmw import h3c_cmw
+from napalm_h3c_cmw import parsers
+
+from cmw_testing import synthetic
+
+OUTPUTS = synthetic.device_outputs(interfaces=6)
+OUTPUTS['display clock'] = '10:00:00.000 UTC Fri 01/01/2021\n'
+OUTPUTS['display ip interface'] = 'Vlan-interface1 current state: UP\nInternet Address is 10.0.0.1/24 Primary\n'
+OUTPUTS['display ipv6 interface'] = ''
+
+CLI_COMMANDS = ['display version', 'display clock', 'display bogus', 'display interface', 'display clock']
+
+
+@pytest.fixture
+def batched_driver(replayed_driver):
+    def build(batch_commands, byte_delay=0, hostname='H3C'):
+        return replayed_driver(OUTPUTS, {'batch_commands': batch_commands}, byte_delay=byte_delay, hostname=hostname)
+    return build
+
+
+def test_split_by_prompt():
+    output = '<H3C>display clock\n10:00\n[H3C-vlan10]display this\n#\n vlan 10\n#\n<H3C>'
+    sections = parsers.split_by_prompt(output, 'H3C')
+    assert sections == ['', 'display clock\n10:00\n', 'display this\n#\n vlan 10\n#\n', '']
+
+
+@pytest.mark.parametrize('byte_delay', [0, 1e-6])
+def test_cli_outputs_match_one_by_one(batched_driver, byte_delay):
+    expected = batched_driver(False).cli(CLI_COMMANDS)
+    driver = batched_driver(True, byte_delay=byte_delay)
+    outputs = driver.cli(CLI_COMMANDS)
+    assert outputs == expected
+    assert 'Unrecognized command' in outputs['display bogus']
+    assert driver.device.writes == 1
+
+
+def test_prompt_like_hostname(batched_driver):
+    # a device named like a word of the outputs, the prompts still start the lines
+    expected = batched_driver(False, hostname='UP').cli(CLI_COMMANDS)
+    assert batched_driver(True, hostname='UP').cli(CLI_COMMANDS) == expected
+
+
+def test_single_command_and_empty_batch(batched_driver):
+    driver = batched_driver(True)
+    assert driver._send_command_batch([]) == []
+    assert driver.cli(['display clock']) == batched_driver(False).cli(['display clock'])
+
+
+def test_getters_batched(batched_driver):
+    expected = batched_driver(False)
+    driver = batched_driver(True)
+    assert driver.get_facts() == expected.get_facts()
+    assert driver.get_interfaces_ip() == expected.get_interfaces_ip()
+    # get_facts() and get_interfaces_ip() in one write each
+    assert driver.device.writes == 2
+    assert expected.device.writes == len(h3c_cmw.FACTS_COMMANDS) + 2
@@ -0,0 +1,159 @@
+"""Tests for the commit checkpoints and rollback() on a replayed session."""
+
+import pytest
+from napalm.base.exceptions import CommitError
+
+from napalm_h3c_cmw import h3c_cmw
+from napalm_h3c_cmw.utils.config_cache import RunningConfigCache
+
+from cmw_testing.replay import ReplayConnection
+
+RUNNING = 'sysname H3C\n#\nvlan 1\n#\nreturn\n'
+
+FINGERPRINT = 'display configuration commit changes last 1'
+
+CONFIRM = 'The current configuration will be written to the device. Are you sure? [Y/N]:\n'
+
+
+class CheckpointReplay(ReplayConnection):
+    """
+    Replayed session answering the save, archive and rollback dialogs.
+
+    The questions end with a line break: the replay shows the prompt after every answer, and
+    netmiko strips that last line.
+    """
+
+    def __init__(self, archive_location='flash:/archive'):
+        super(CheckpointReplay, self).__init__({})
+        self.archive_location = archive_location
+        self.last = None
+
+    def output(self, command):
+        last, self.last = self.last, command
+        if command == 'display current-configuration':
+            return RUNNING
+        if command == FINGERPRINT:
+            return 'Commit ID: 1\n'
+        if command == 'system-view':
+            return 'System View: return to User View with Ctrl+Z.\n'
+        if command in ('vlan 10', 'commit'):
+            return ''
+        if command.startswith('dir '):
+            return 'No file found.\n'
+        if command == 'save force' or command == 'y' and last.split()[0] == 'save':
+            return 'Saved the current configuration to mainboard device successfully.\n'
+        if command.split()[0] == 'save':
+            return CONFIRM
+        if command == 'archive configuration':
+            return 'Save the running configuration to an archive file. Continue? [Y/N]:\n'
+        if command == 'y' and last == 'archive configuration':
+            return 'The archive file flash:/archive/H3C_1.cfg was saved successfully.\n'
+        if command == 'display archive configuration':
+            if not self.archive_location:
+                return 'Location: \n'
+            return 'Location: {}\nFilename prefix: H3C\n'.format(self.archive_location)
+        if command.startswith('rollback configuration to file '):
+            return 'Rollback configuration to the specified file. Continue? [Y/N]:\n'
+        if command == 'y' and last.startswith('rollback configuration'):
+            return 'Rollback configuration succeeded.\n'
+        return super(CheckpointReplay, self).output(command)
+
+
+@pytest.fixture
+def checkpoint_driver(replayed_driver):
+    """Return a function building a driver with a checkpoint mode, its uploads recorded."""
+    def build(checkpoint, device=None, **optional_args):
+        optional_args['checkpoint'] = checkpoint
+        driver = replayed_driver(optional_args=optional_args, device=device or CheckpointReplay())
+        uploads = []
+
+        def transfer_file(filename, dest):
+            with open(filename) as local_file:
+                uploads.append((dest, local_file.read()))
+
+        driver._transfer_file = transfer_file
+        return driver, uploads
+    return build
+
+
+def commit(driver):
+    driver.load_merge_candidate(config='vlan 10\n')
+    driver.commit_config()
+    assert set(driver.commit_timings) == {'backup', 'apply', 'save'}
+
+
+def flash_writes(sent):
+    return len([command for command in sent
+                if command.split()[0] == 'save' or command == 'archive configuration'])
+
+
+def test_save_checkpoint(checkpoint_driver):
+    driver, _ = checkpoint_driver('save')
+    commit(driver)
+    sent = driver.device.sent
+    backup = [command for command in sent if command.startswith('save config_')]
+    assert len(backup) == 1
+    assert flash_writes(sent) == 2
+    driver.rollback()
+    assert 'rollback configuration to file {}'.format(backup[0].split()[1]) in driver.device.sent
+
+
+@pytest.mark.parametrize('location,archive_file', [
+    ('flash:/archive', 'flash:/archive/H3C_1.cfg'),
+    ('', 'flash:/archive/H3C_1.cfg'),
+])
+def test_archive_checkpoint(checkpoint_driver, location, archive_file):
+    driver, _ = checkpoint_driver('archive', CheckpointReplay(archive_location=location))
+    commit(driver)
+    sent = driver.device.sent
+    assert 'archive configuration' in sent
+    assert 'save force' in sent
+    assert flash_writes(sent) == 2
+    driver.rollback()
+    assert 'rollback configuration to file {}'.format(archive_file) in driver.device.sent
+
+
+def test_running_checkpoint(checkpoint_driver):
+    driver, uploads = checkpoint_driver('running')
+    commit(driver)
+    sent = driver.device.sent
+    assert flash_writes(sent) == 1
+    assert driver.backup_config.rstrip('\n') == RUNNING.rstrip('\n')
+    driver.rollback()
+    assert uploads == [('napalm_rollback.cfg', driver.backup_config)]
+    assert 'rollback configuration to file napalm_rollback.cfg' in driver.device.sent
+
+
+class StaleCache(RunningConfigCache):
+    """Cache answering a configuration the device no longer runs."""
+
+    def get(self, device, fingerprint):
+        return 'sysname STALE\n'
+
+
+def test_running_checkpoint_bypasses_the_cache(checkpoint_driver):
+    driver, _ = checkpoint_driver('running', config_cache=StaleCache(), config_fingerprint_command=FINGERPRINT)
+    commit(driver)
+    assert driver.backup_config.rstrip('\n') == RUNNING.rstrip('\n')
+
+
+def test_rollback_without_commit(checkpoint_driver):
+    driver, uploads = checkpoint_driver('running')
+    driver.rollback()
+    assert uploads == []
+    assert driver.device.sent == []
+
+
+def test_failed_backup_leaves_nothing_to_roll_back(checkpoint_driver):
+    device = CheckpointReplay()
+    device.output = lambda command: 'Error: The flash is full.\n' if command == 'archive configuration' else ''
+    driver, _ = checkpoint_driver('archive', device)
+    driver.load_merge_candidate(config='vlan 10\n')
+    with pytest.raises(CommitError):
+        driver.commit_config()
+    assert not driver.changed
+
+
+def test_unknown_checkpoint():
+    with pytest.raises(ValueError):
+        h3c_cmw.CMWDriver('127.0.0.1', 'admin', 'admin', optional_args={'checkpoint': 'snapshot'})
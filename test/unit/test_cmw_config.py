@@ -0,0 +1,103 @@
+"""Tests for CMWConfig, the lazily parsed running configuration."""
+
+from napalm_h3c_cmw.config import CMWConfig
+
+RUNNING = """\
+#
+ version 7.1.070, Release 3208P03
+#
+ sysname CORE-1
+#
+ ntp-service unicast-server 10.0.0.1
+ ntp-service unicast-server 10.0.0.2 source Vlan-interface10
+ ntp-service unicast-peer 10.0.0.3
+#
+vlan 1
+#
+vlan 10
+ name users
+#
+interface Vlan-interface10
+ ip address 10.0.10.1 255.255.255.0
+#
+interface GigabitEthernet1/0/1
+ port link-type trunk
+ port trunk permit vlan 1 10
+#
+bgp 65000
+ peer 10.0.0.2 as-number 65001
+#
+acl advanced 3000
+ rule 0 permit ip source 10.0.0.0 0.0.0.255
+#
+ snmp-agent
+ snmp-agent sys-info contact noc@example.com
+ snmp-agent sys-info location DC1 row 2
+ snmp-agent community read simple public acl 2000
+ snmp-agent community write cipher $c$3$secret
+#
+return
+"""
+
+
+def test_sections():
+    config = CMWConfig(RUNNING)
+    assert list(config.interfaces) == ['Vlan-interface10', 'GigabitEthernet1/0/1']
+    assert 'port link-type trunk' in config.interfaces['GigabitEthernet1/0/1']
+    assert list(config.vlans) == ['1', '10']
+    assert 'name users' in config.vlans['10']
+    assert list(config.acls) == ['advanced 3000']
+    assert config.bgp.line == 'bgp 65000'
+    assert CMWConfig('#\n sysname X\n#\nreturn\n').bgp is None
+
+
+def test_globals():
+    config = CMWConfig(RUNNING)
+    assert config.sysname == 'CORE-1'
+    assert config.ntp_servers == ['10.0.0.1', '10.0.0.2']
+    assert config.ntp_peers == ['10.0.0.3']
+    assert config.global_lines('version') == ['version 7.1.070, Release 3208P03']
+    assert CMWConfig('').sysname == ''
+
+
+def test_snmp_information():
+    assert CMWConfig(RUNNING).snmp_information() == {
+        'contact': 'noc@example.com',
+        'location': 'DC1 row 2',
+        'community': {
+            'public': {'acl': '2000', 'mode': 'ro'},
+            '$c$3$secret': {'acl': 'N/A', 'mode': 'rw'},
+        },
+        'chassis_id': '',
+    }
+
+
+def test_sections_parsed_once_on_demand():
+    config = CMWConfig(RUNNING)
+    assert config.sysname == 'CORE-1'
+    assert config._tree is None
+    assert 'interface' not in config._parsed
+    interfaces = config.interfaces
+    assert config.interfaces is interfaces
+    assert 'vlan' not in config._parsed
+    assert config.tree.find('interface GigabitEthernet1/0/1', 'port link-type trunk') is not None
+
+
+def test_getters_read_the_matching_lines(replayed_driver):
+    def include(keyword):
+        return ''.join(line + '\n' for line in RUNNING.splitlines() if keyword in line)
+
+    driver = replayed_driver({
+        'display current-configuration | include ntp-service': include('ntp-service'),
+        'display current-configuration | include snmp-agent': include('snmp-agent'),
+    })
+    assert driver.get_ntp_servers() == {'10.0.0.1': {}, '10.0.0.2': {}}
+    assert driver.get_ntp_peers() == {'10.0.0.3': {}}
+    assert driver.get_snmp_information()['location'] == 'DC1 row 2'
+
+
+def test_parsed_config_reused(replayed_driver):
+    driver = replayed_driver({'display current-configuration': RUNNING})
+    config = driver.get_parsed_config()
+    assert config.sysname == 'CORE-1'
+    assert driver.get_parsed_config() is config
@@ -0,0 +1,75 @@
+"""Tests for the running configuration cache, on a replayed synthetic device."""
+
+import pytest
+
+from napalm_h3c_cmw import h3c_cmw
+from napalm_h3c_cmw.utils.config_cache import RunningConfigCache
+
+from cmw_testing import synthetic
+from cmw_testing.replay import UNRECOGNIZED_COMMAND
+
+FINGERPRINT = 'display configuration commit changes last 1'
+
+
+@pytest.fixture
+def outputs():
+    outputs = synthetic.device_outputs(interfaces=4)
+    outputs[FINGERPRINT] = 'Commit ID: 1\n'
+    return outputs
+
+
+@pytest.fixture
+def cached_driver(replayed_driver):
+    """Return a function building a driver on outputs, its running configuration cached in cache."""
+    def build(outputs, cache, command=FINGERPRINT):
+        optional_args = {'config_cache': cache, 'config_fingerprint_command': command}
+        return replayed_driver(outputs, optional_args, hostname=synthetic.HOSTNAME)
+    return build
+
+
+def test_fingerprint_command_required():
+    with pytest.raises(ValueError):
+        h3c_cmw.CMWDriver('127.0.0.1', 'admin', 'admin', optional_args={'config_cache': True})
+
+
+def test_hit(cached_driver, outputs):
+    cache = RunningConfigCache()
+    running = cached_driver(outputs, cache).get_config()['running']
+
+    driver = cached_driver(outputs, cache)
+    assert driver.get_config()['running'] == running
+    assert driver.device.sent == [FINGERPRINT]
+
+
+def test_miss(cached_driver, outputs):
+    cache = RunningConfigCache()
+    cached_driver(outputs, cache).get_config()
+
+    outputs[FINGERPRINT] = 'Commit ID: 2\n'
+    outputs['display current-configuration'] = synthetic.current_configuration(8)
+    driver = cached_driver(outputs, cache)
+    assert driver.get_config()['running'] == synthetic.current_configuration(8).rstrip('\n')
+    assert driver.device.sent == [FINGERPRINT, 'display current-configuration']
+
+
+def test_rejected_fingerprint_bypasses_the_cache(cached_driver, outputs):
+    outputs[FINGERPRINT] = UNRECOGNIZED_COMMAND
+    cache = RunningConfigCache()
+    driver = cached_driver(outputs, cache)
+    driver.get_config()
+    outputs['display current-configuration'] = synthetic.current_configuration(8)
+    assert driver.get_config()['running'] == synthetic.current_configuration(8).rstrip('\n')
+    assert '127.0.0.1' not in cache
+
+
+def test_get_facts_on_a_cold_cache(cached_driver, outputs):
+    driver = cached_driver(outputs, RunningConfigCache())
+    facts = driver.get_facts()
+    assert driver.device.sent == h3c_cmw.FACTS_COMMANDS
+
+    # the hostname then comes from the cached configuration
+    driver.get_config()
+    del driver.device.sent[:]
+    assert driver.get_facts() == facts
+    assert FINGERPRINT in driver.device.sent
+    assert 'display current-configuration | inc sysname' not in driver.device.sent
@@ -0,0 +1,131 @@
+"""Tests for StagedDeployment, on stand-in drivers recording the steps they were asked."""
+
+import threading
+
+import pytest
+from napalm.base.exceptions import CommitError, ConnectionException
+
+from napalm_h3c_cmw import deploy
+
+
+class StandInDriver(object):
+    """Driver of a device whose behaviour is set by its hostname, e.g. 'commit-fails-1'."""
+
+    steps = []
+    lock = threading.Lock()
+
+    def __init__(self, hostname, username, password, timeout=60, optional_args=None):
+        self.hostname = hostname
+        self.loaded = False
+        self.replace = False
+
+    def _step(self, step):
+        with self.lock:
+            self.steps.append((self.hostname, step))
+
+    def open(self):
+        if self.hostname.startswith('unreachable'):
+            raise ConnectionException('cannot connect to {}'.format(self.hostname))
+        self._step('open')
+
+    def load_merge_candidate(self, filename=None, config=None):
+        self.loaded = True
+
+    def load_replace_candidate(self, filename=None, config=None):
+        self.loaded = self.replace = True
+
+    def compare_config(self):
+        return '' if self.hostname.startswith('unchanged') else '+vlan 10'
+
+    def commit_config(self):
+        self._step('commit')
+        if self.hostname.startswith('commit-fails'):
+            raise CommitError('line 1: vlan 10')
+        self.loaded = False
+
+    def rollback(self):
+        self._step('rollback')
+        if 'no-rollback' in self.hostname:
+            raise ConnectionException('connection to {} lost'.format(self.hostname))
+
+    def discard_config(self):
+        self._step('discard')
+        self.loaded = False
+
+    def close(self):
+        self._step('close')
+
+
+@pytest.fixture(autouse=True)
+def steps():
+    del StandInDriver.steps[:]
+    return StandInDriver.steps
+
+
+def deployment(**kwargs):
+    return deploy.StagedDeployment('admin', 'admin', driver=StandInDriver, **kwargs)
+
+
+def statuses(result):
+    return dict((hostname, change.status) for hostname, change in result.devices.items())
+
+
+def test_within_budget(steps):
+    result = deployment(failure_budget=1).run({'ok-1': 'vlan 10', 'commit-fails-1': 'vlan 10', 'ok-2': 'vlan 10'})
+    assert not result.aborted
+    assert result.failures == 1
+    assert statuses(result) == {'ok-1': deploy.COMMITTED, 'commit-fails-1': deploy.COMMIT_FAILED,
+                                'ok-2': deploy.COMMITTED}
+    assert isinstance(result.devices['commit-fails-1'].error, CommitError)
+    # the lines it may have applied are rolled back, the others stay
+    assert [hostname for hostname, step in steps if step == 'rollback'] == ['commit-fails-1']
+    assert sorted(hostname for hostname, step in steps if step == 'close') == sorted(result.devices)
+
+
+def test_abort_then_rollback(steps):
+    changes = [('ok-1', 'vlan 10'), ('commit-fails-1', 'vlan 10'), ('commit-fails-2', 'vlan 10'),
+               ('ok-2', 'vlan 10')]
+    result = deployment(commit_workers=1, failure_budget=1).run(changes)
+    assert result.aborted
+    assert statuses(result) == {'ok-1': deploy.ROLLED_BACK, 'commit-fails-1': deploy.COMMIT_FAILED,
+                                'commit-fails-2': deploy.COMMIT_FAILED, 'ok-2': deploy.NOT_COMMITTED}
+    assert ('ok-2', 'commit') not in steps
+    assert sorted(hostname for hostname, step in steps if step == 'rollback') == [
+        'commit-fails-1', 'commit-fails-2', 'ok-1']
+    # the candidate of the device never committed is discarded
+    assert ('ok-2', 'discard') in steps
+
+
+def test_stage_failures_count(steps):
+    result = deployment(failure_budget=0.5).run({'unreachable-1': 'vlan 10', 'unreachable-2': 'vlan 10',
+                                                 'ok-1': 'vlan 10'})
+    assert result.aborted
+    assert statuses(result)['ok-1'] == deploy.NOT_COMMITTED
+    assert not [step for _, step in steps if step == 'commit']
+    # the drivers whose open() failed are closed as well
+    assert sorted(hostname for hostname, step in steps if step == 'close') == sorted(result.devices)
+
+
+def test_rollback_fails(steps):
+    result = deployment(failure_budget=1).run({'commit-fails-no-rollback-1': 'vlan 10', 'ok-1': 'vlan 10'})
+    change = result.devices['commit-fails-no-rollback-1']
+    assert change.status == deploy.ROLLBACK_FAILED
+    commit_error, rollback_error = change.error
+    assert isinstance(commit_error, CommitError)
+    assert isinstance(rollback_error, ConnectionException)
+
+
+@pytest.mark.parametrize('replace', [False, True])
+def test_unchanged(steps, replace):
+    result = deployment().run({'unchanged-1': 'vlan 10', 'ok-1': 'vlan 10'}, replace=replace)
+    assert statuses(result) == {'unchanged-1': deploy.UNCHANGED, 'ok-1': deploy.COMMITTED}
+    assert ('unchanged-1', 'commit') not in steps
+    assert ('unchanged-1', 'close') in steps
+    # only merge candidates are discarded, that of a replace would be deleted from the device
+    assert (('unchanged-1', 'discard') in steps) is not replace
+
+
+def test_duplicate_targets(steps):
+    with pytest.raises(ValueError):
+        deployment().run([('ok-1', 'vlan 10'), ({'hostname': 'ok-1'}, 'vlan 20')])
+    assert not steps
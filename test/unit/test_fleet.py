@@ -0,0 +1,187 @@
+"""Tests for FleetRunner retries, backoff and per-device timeout, with stand-in drivers."""
+
+import threading
+import time
+
+import paramiko
+from napalm.base.exceptions import ConnectionException
+
+from napalm_h3c_cmw import fleet
+from napalm_h3c_cmw.fleet import DeviceTimeout, FleetRunner
+
+
+class StandInDriver(object):
+    """
+    Driver whose behaviour depends on the hostname.
+
+    'flaky-N' refuses the first N connections, 'locked' fails authentication, 'slow' takes
+    its timeout to answer get_facts, 'hangs' ignores its timeout and answers get_facts only
+    once closed, 'late' opens past its timeout, 'pause-N' takes 10 ms to answer get_facts,
+    'drops' loses the session on get_facts and 'broken' raises a ValueError from get_facts.
+    """
+
+    lock = threading.Lock()
+    opened = []
+    timeouts = []
+    closed = []
+
+    def __init__(self, hostname, username, password, timeout=60, optional_args=None):
+        self.hostname = hostname
+        self.timeout = timeout
+        self.closing = threading.Event()
+
+    @classmethod
+    def reset(cls):
+        cls.opened = []
+        cls.timeouts = []
+        cls.closed = []
+
+    def open(self):
+        with self.lock:
+            self.opened.append(self.hostname)
+            self.timeouts.append(self.timeout)
+            attempt = self.opened.count(self.hostname)
+        if self.hostname.startswith('flaky-') and attempt <= int(self.hostname.split('-')[1]):
+            raise ConnectionException('refused')
+        if self.hostname == 'locked':
+            raise paramiko.AuthenticationException('bad password')
+        if self.hostname == 'late':
+            time.sleep(self.timeout + 0.1)
+
+    def close(self):
+        with self.lock:
+            self.closed.append(self.hostname)
+        self.closing.set()
+
+    def get_facts(self):
+        if self.hostname.startswith('pause-'):
+            time.sleep(0.01)
+        if self.hostname == 'hangs':
+            self.closing.wait(5)
+            raise EOFError('session closed')
+        if self.hostname == 'slow':
+            time.sleep(self.timeout)
+            raise EOFError('no answer')
+        if self.hostname == 'drops':
+            raise EOFError('session closed')
+        if self.hostname == 'broken':
+            raise ValueError('unexpected output')
+        return {'hostname': self.hostname}
+
+    def get_interfaces(self):
+        return {}
+
+
+def run(inventory, getters=('get_facts', 'get_interfaces'), **kwargs):
+    StandInDriver.reset()
+    runner = FleetRunner(driver=StandInDriver, **kwargs)
+    return {result.hostname: result for result in runner.run(inventory, list(getters))}
+
+
+def test_results():
+    results = run(['ok-1', 'ok-2'])
+    assert results['ok-1'].results == {'get_facts': {'hostname': 'ok-1'}, 'get_interfaces': {}}
+    assert results['ok-2'].error is None
+    assert results['ok-2'].attempts == 1
+
+
+def test_retry_with_backoff(monkeypatch):
+    delays = []
+    monkeypatch.setattr(fleet.time, 'sleep', delays.append)
+    result = run(['flaky-3'], retries=3, backoff=1.0)['flaky-3']
+    assert result.error is None
+    assert result.attempts == 4
+    assert delays == [1.0, 2.0, 4.0]
+    assert 'get_facts' in result.results
+
+
+def test_backoff_capped(monkeypatch):
+    delays = []
+    monkeypatch.setattr(fleet.time, 'sleep', delays.append)
+    result = run(['flaky-9'], retries=4, backoff=2.0, max_backoff=5.0, timeout=600)['flaky-9']
+    assert isinstance(result.error, ConnectionException)
+    assert result.attempts == 5
+    assert delays == [2.0, 4.0, 5.0, 5.0]
+
+
+def test_no_retry_past_deadline(monkeypatch):
+    delays = []
+    now = [1000.0]
+
+    def sleep(delay):
+        delays.append(delay)
+        now[0] += delay
+
+    monkeypatch.setattr(fleet.time, 'time', lambda: now[0])
+    monkeypatch.setattr(fleet.time, 'sleep', sleep)
+    result = run(['flaky-9'], retries=5, backoff=4.0, timeout=10)['flaky-9']
+    # the third attempt would start after 4 + 8 seconds
+    assert result.attempts == 2
+    assert delays == [4.0]
+
+
+def test_authentication_failure_not_retried(monkeypatch):
+    monkeypatch.setattr(fleet.time, 'sleep', lambda delay: None)
+    result = run(['locked'], retries=3)['locked']
+    assert isinstance(result.error, paramiko.AuthenticationException)
+    assert result.attempts == 1
+
+
+def test_getter_errors_not_retried():
+    results = run(['drops', 'broken'], retries=3)
+    drops = results['drops']
+    assert isinstance(drops.error, EOFError)
+    assert drops.attempts == 1
+    assert drops.results == {}
+    broken = results['broken']
+    assert broken.error is None
+    assert isinstance(broken.errors['get_facts'], ValueError)
+    assert broken.results == {'get_interfaces': {}}
+    assert StandInDriver.opened.count('drops') == StandInDriver.opened.count('broken') == 1
+
+
+def test_timeout():
+    result = run(['slow'], timeout=0.3)['slow']
+    assert isinstance(result.error, DeviceTimeout)
+    assert result.elapsed < 1
+    # the driver waits no longer than the time left to the device
+    assert 0 < StandInDriver.timeouts[0] <= 0.3
+    assert 'get_interfaces' not in result.results
+
+
+def test_timeout_bounds_a_hung_getter():
+    result = run(['hangs'], timeout=0.3)['hangs']
+    assert isinstance(result.error, DeviceTimeout)
+    assert result.elapsed < 1
+    assert StandInDriver.closed == ['hangs']
+
+
+def test_timeouts_start_no_thread_per_device():
+    threads = threading.active_count()
+    results = run(['hangs'] * 8, timeout=0.3, max_workers=8)
+    assert all(isinstance(result.error, DeviceTimeout) for result in results.values())
+    # the pool threads and one watchdog at most
+    assert threading.active_count() <= threads + 1
+
+
+def test_late_open_closed():
+    result = run(['late'], timeout=0.2)['late']
+    assert isinstance(result.error, DeviceTimeout)
+    assert StandInDriver.closed == ['late']
+    assert result.attempts == 1
+
+
+def test_failed_open_closes_the_driver(monkeypatch):
+    monkeypatch.setattr(fleet.time, 'sleep', lambda delay: None)
+    result = run(['flaky-9'], retries=2)['flaky-9']
+    assert result.attempts == 3
+    assert StandInDriver.closed == ['flaky-9'] * 3
+
+
+def test_early_exit_cancels_pending_devices():
+    StandInDriver.reset()
+    runner = FleetRunner(driver=StandInDriver, max_workers=1)
+    results = runner.run(['pause-{}'.format(index) for index in range(20)], ['get_facts'])
+    next(results)
+    results.close()
+    assert len(StandInDriver.opened) < 20
@@ -1,11 +1,90 @@
 """Tests for getters."""
 
-from napalm.base.test.getters import BaseTestGetters
+import functools
+import inspect
+
+from napalm.base import NetworkDriver
+from napalm.base.test import helpers
+from napalm.base.test import models
+from napalm.base.test.getters import BaseTestGetters, wrap_test_cases
+from napalm.base.utils.py23_compat import argspec
 
 
 import pytest
 
+# getters the driver declares without implementing them yet
+NOT_IMPLEMENTED = (
+    'test_get_ipv6_neighbors_table',
+    'test_get_ntp_stats',
+    'test_get_route_to',
+    'test_get_probes_config',
+    'test_get_probes_results',
+    'test_traceroute',
+    'test_get_users',
+    'test_get_optics',
+    'test_get_network_instances',
+)
+
+# get_mac_address_table() also tells whether an entry comes from NAC authentication
+MAC_ADDRESS_TABLE_MODEL = dict(models.mac_address_table, authen=bool)
+
+
+def discard_results(cls):
+    """
+    Make the test-case tests of cls, its own and napalm's, return None to pytest.
+
+    wrap_test_cases compares the result of a getter with the expected one, then returns it;
+    the assertion stays, the return value is dropped.
+    """
+    for name, test in inspect.getmembers(cls, inspect.isfunction):
+        if getattr(test, 'build_test_cases', False):
+            setattr(cls, name, _discard_result(test))
+    return cls
+
+
+def _discard_result(test):
+    @functools.wraps(test)
+    def wrapper(self, test_case):
+        test(self, test_case)
+    return wrapper
 
+
+@discard_results
 @pytest.mark.usefixtures("set_device_parameters")
 class TestGetter(BaseTestGetters):
     """Test get_* methods."""
+
+    @pytest.fixture(autouse=True)
+    def skip_not_implemented(self, request):
+        if request.function.__name__ in NOT_IMPLEMENTED:
+            pytest.skip("Method not implemented")
+
+    def test_method_signatures(self):
+        """Test that the methods of napalm.base keep their signature, trailing keyword arguments aside."""
+        errors = {}
+        for attr, func in inspect.getmembers(self.driver, inspect.isfunction):
+            if attr.startswith("_") or not hasattr(NetworkDriver, attr):
+                continue
+            orig_spec = argspec(getattr(NetworkDriver, attr))
+            func_spec = argspec(func)
+            orig_defaults = orig_spec.defaults or ()
+            func_defaults = func_spec.defaults or ()
+            extra = len(func_spec.args) - len(orig_spec.args)
+            if (func_spec.args[:len(orig_spec.args)] != orig_spec.args or
+                    func_defaults[:len(orig_defaults)] != orig_defaults or
+                    len(func_defaults) - len(orig_defaults) != extra or
+                    func_spec[1:3] != orig_spec[1:3]):
+                errors[attr] = (orig_spec, func_spec)
+
+        assert not errors, "Some methods vary. \n{}".format(errors.keys())
+
+    @wrap_test_cases
+    def test_get_mac_address_table(self, test_case):
+        """Test get_mac_address_table."""
+        get_mac_address_table = self.device.get_mac_address_table()
+        assert len(get_mac_address_table) > 0
+
+        for mac_table_entry in get_mac_address_table:
+            assert helpers.test_model(MAC_ADDRESS_TABLE_MODEL, mac_table_entry)
+
+        return get_mac_address_table
@@ -0,0 +1,105 @@
+"""Tests for the interfaces filter of get_interfaces() and get_interfaces_counters()."""
+
+import pytest
+from napalm.base.exceptions import CommandErrorException
+
+from napalm_h3c_cmw import parsers
+
+from cmw_testing import synthetic
+
+INTERFACES = 48
+
+
+class CountersBackend(object):
+    """counters_backend answering from parsed CLI output."""
+
+    def __init__(self, counters):
+        self.counters = counters
+
+    def get_interfaces_counters(self):
+        return self.counters
+
+
+@pytest.fixture(scope='module')
+def sections():
+    return parsers.separate_sections(parsers.INTERFACE_SEPARATOR, synthetic.display_interface(INTERFACES))
+
+
+@pytest.fixture
+def scoped_driver(replayed_driver):
+    """Return a function building a driver answering 'display interface' for all or one of sections."""
+    def build(sections, optional_args=None):
+        outputs = {'display interface': ''.join(sections)}
+        for section in sections:
+            name = parsers.parse_interface_block(section, counters=False)['name']
+            outputs['display interface {}'.format(name)] = section
+            outputs['display interface {}'.format(name.replace('GigabitEthernet', 'GE'))] = section
+        return replayed_driver(outputs, optional_args, hostname=synthetic.HOSTNAME)
+    return build
+
+
+@pytest.mark.parametrize('interfaces, names', [
+    (['GE1/0/1 to GE1/0/3'], ['GE1/0/1', 'GE1/0/2', 'GE1/0/3']),
+    (['GigabitEthernet1/0/9-11', 'GigabitEthernet1/0/10'],
+     ['GigabitEthernet1/0/9', 'GigabitEthernet1/0/10', 'GigabitEthernet1/0/11']),
+    (['Vlan-interface10', 'Bridge-Aggregation1-2'], ['Vlan-interface10', 'Bridge-Aggregation1', 'Bridge-Aggregation2']),
+])
+def test_expand_interfaces(interfaces, names):
+    assert parsers.expand_interfaces(interfaces) == names
+
+
+@pytest.mark.parametrize('interface', ['GE1/0/1 to XGE1/0/3', 'GE1/0/4-2'])
+def test_unexpected_range(interface):
+    with pytest.raises(ValueError):
+        parsers.expand_interfaces([interface])
+
+
+@pytest.mark.parametrize('batch_commands', [False, True])
+def test_get_interfaces(scoped_driver, sections, batch_commands):
+    everything = scoped_driver(sections)
+    interfaces = everything.get_interfaces()
+    counters = everything.get_interfaces_counters()
+
+    driver = scoped_driver(sections, {'batch_commands': batch_commands})
+    names = ['GigabitEthernet1/0/2', 'GigabitEthernet1/0/40', 'GigabitEthernet1/0/41']
+    wanted = ['GigabitEthernet1/0/2', 'GigabitEthernet1/0/40-41']
+    assert driver.get_interfaces(interfaces=wanted) == dict((name, interfaces[name]) for name in names)
+    assert driver.device.commands == 3
+    assert driver.get_interfaces_counters(interfaces=wanted) == dict((name, counters[name]) for name in names)
+    assert driver.device.commands == 6
+
+
+def test_snapshot_shared_between_getters(scoped_driver, sections):
+    driver = scoped_driver(sections, {'snapshot_ttl': 60})
+    driver.get_interfaces(interfaces=['GE1/0/1 to GE1/0/3'])
+    counters = driver.get_interfaces_counters(interfaces=['GE1/0/1 to GE1/0/3'])
+    assert sorted(counters) == ['GigabitEthernet1/0/1', 'GigabitEthernet1/0/2', 'GigabitEthernet1/0/3']
+    assert driver.device.commands == 3
+
+
+def test_unknown_interface(scoped_driver, sections):
+    driver = scoped_driver(sections)
+    with pytest.raises(CommandErrorException):
+        driver.get_interfaces(interfaces=['GigabitEthernet9/0/1'])
+
+
+@pytest.mark.parametrize('name, canonical', [
+    ('GE1/0/1', 'GigabitEthernet1/0/1'),
+    ('XGE1/0/49', 'Ten-GigabitEthernet1/0/49'),
+    ('BAGG1', 'Bridge-Aggregation1'),
+    ('Vlan10', 'Vlan-interface10'),
+    ('vlan-interface10', 'vlan-interface10'),
+    ('Ten-GigabitEthernet1/0/49', 'Ten-GigabitEthernet1/0/49'),
+    ('NULL0', 'NULL0'),
+])
+def test_canonical_interface_name(name, canonical):
+    assert parsers.canonical_interface_name(name) == canonical
+
+
+def test_counters_backend_filtered(scoped_driver, sections):
+    counters = parsers.parse_interfaces_counters(sections)
+    driver = scoped_driver(sections, {'counters_backend': CountersBackend(counters)})
+    result = driver.get_interfaces_counters(interfaces=['GigabitEthernet1/0/1-2', 'GE1/0/3', 'ge1/0/4 to ge1/0/5'])
+    names = ['GigabitEthernet1/0/{}'.format(number) for number in range(1, 6)]
+    assert result == dict((name, counters[name]) for name in names)
+    assert driver.device.commands == 0
@@ -0,0 +1,63 @@
+"""Tests for merge commits, applied in windows of lines on a replayed session."""
+
+import pytest
+from napalm.base.exceptions import CommitError
+
+
+RUNNING = 'sysname OLD\n#\nvlan 1\n#\nreturn\n'
+
+OUTPUTS = {
+    'display current-configuration': RUNNING,
+    'system-view': 'System View: return to User View with Ctrl+Z.\n',
+    'vlan 10': '',
+    'vlan 20': '',
+    'sysname NEW': '',
+    'commit': '',
+    'save force': ('Validating file. Please wait...\n'
+                   'Saved the current configuration to mainboard device successfully.\n'),
+}
+
+
+@pytest.fixture
+def merge_driver(replayed_driver):
+    """Return a function building a driver on outputs, the device named OLD, checkpoints kept in memory."""
+    def build(outputs, optional_args=None):
+        optional_args = dict({'checkpoint': 'running'}, **(optional_args or {}))
+        return replayed_driver(outputs, optional_args, timeout=5, hostname='OLD')
+    return build
+
+
+@pytest.mark.parametrize('merge_window', [1, 2, 100])
+def test_merge_renaming_the_device(merge_driver, merge_window):
+    driver = merge_driver(OUTPUTS, {'merge_window': merge_window})
+    driver.load_merge_candidate(config='vlan 10\nsysname NEW\nvlan 20\n')
+    driver.commit_config()
+    assert not driver.device.system_view
+    assert driver.device.base_prompt == 'NEW'
+    assert driver.cli(['display current-configuration'])
+
+
+def test_rejected_line(merge_driver):
+    outputs = dict(OUTPUTS, **{'vlan 20': " ^\n % Unrecognized command found at '^' position.\n"})
+    driver = merge_driver(outputs, {'merge_window': 2})
+    driver.load_merge_candidate(config='vlan 10\nvlan 20\nvlan 30\n')
+    with pytest.raises(CommitError) as excinfo:
+        driver.commit_config()
+    assert 'line 2: vlan 20' in str(excinfo.value)
+    assert not driver.device.system_view
+    # vlan 10 was applied, rollback() returns to the checkpoint
+    assert driver.changed
+
+
+@pytest.mark.parametrize('merge_window', [1, 100])
+def test_rejected_sysname(merge_driver, merge_window):
+    outputs = dict(OUTPUTS, **{'sysname NEW': ' % Wrong parameter found at \'^\' position.\n'})
+    driver = merge_driver(outputs, {'merge_window': merge_window})
+    driver.load_merge_candidate(config='vlan 10\nsysname NEW\nvlan 20\n')
+    with pytest.raises(CommitError) as excinfo:
+        driver.commit_config()
+    assert 'line 2: sysname NEW' in str(excinfo.value)
+    # the prompt is still the one the device shows
+    assert driver.device.base_prompt == 'OLD'
+    assert not driver.device.system_view
+    assert driver.cli(['display current-configuration'])
@@ -0,0 +1,92 @@
+"""Tests for the configuration tree and the merge diff."""
+
+from napalm_h3c_cmw.config import merge_diff, parse_config
+
+RUNNING = """\
+#
+ version 7.1.070, Release 3208P03
+#
+ sysname H3C
+#
+ ntp-service unicast-server 10.0.0.1
+#
+vlan 10
+ name users
+#
+interface GigabitEthernet1/0/1
+ port link-type trunk
+ port trunk permit vlan 1 10
+#
+bgp 65000
+ peer 10.0.0.2 as-number 65001
+ #
+ address-family ipv4 unicast
+  peer 10.0.0.2 enable
+#
+return
+"""
+
+
+def test_tree():
+    root = parse_config(RUNNING)
+    assert [node.line for node in root] == [
+        'version 7.1.070, Release 3208P03', 'sysname H3C', 'ntp-service unicast-server 10.0.0.1', 'vlan 10',
+        'interface GigabitEthernet1/0/1', 'bgp 65000']
+    assert 'port link-type trunk' in root.get('interface GigabitEthernet1/0/1')
+    assert root.find('bgp 65000', 'address-family ipv4 unicast', 'peer 10.0.0.2 enable') is not None
+    assert root.find('bgp 65000', 'peer 10.0.0.2 enable') is None
+    assert len(root.get('vlan 10')) == 1
+    assert len(root.get('sysname H3C')) == 0
+
+
+def test_lines_round_trip():
+    root = parse_config(RUNNING)
+    assert parse_config('\n'.join(root.lines())).find('bgp 65000', 'address-family ipv4 unicast',
+                                                      'peer 10.0.0.2 enable') is not None
+
+
+def test_nothing_missing():
+    candidate = 'vlan 10\n name users\ninterface GigabitEthernet1/0/1\n port link-type trunk\n'
+    assert merge_diff(parse_config(RUNNING), parse_config(candidate)) == []
+
+
+def test_missing_line_with_its_sections():
+    candidate = """\
+interface GigabitEthernet1/0/1
+ port link-type trunk
+ description uplink
+bgp 65000
+ address-family ipv4 unicast
+  peer 10.0.0.2 enable
+  peer 10.0.0.3 enable
+"""
+    assert merge_diff(parse_config(RUNNING), parse_config(candidate)) == [
+        'interface GigabitEthernet1/0/1',
+        ' description uplink',
+        'bgp 65000',
+        ' address-family ipv4 unicast',
+        '  peer 10.0.0.3 enable',
+    ]
+
+
+def test_missing_section_with_all_its_lines():
+    candidate = 'vlan 20\n name servers\nntp-service unicast-server 10.0.0.1\nsnmp-agent\n'
+    assert merge_diff(parse_config(RUNNING), parse_config(candidate)) == [
+        'vlan 20',
+        ' name servers',
+        'snmp-agent',
+    ]
+
+
+def test_section_lines_written_once():
+    candidate = 'vlan 10\n description a\n description b\n'
+    assert merge_diff(parse_config(RUNNING), parse_config(candidate)) == [
+        'vlan 10', ' description a', ' description b']
+
+
+def test_compare_config_on_a_merge(replayed_driver):
+    driver = replayed_driver({'display current-configuration': RUNNING})
+    driver.load_merge_candidate(config='vlan 10\n name users\nvlan 30\n')
+    assert driver.compare_config() == 'vlan 30'
+    driver.discard_config()
+    assert driver.compare_config() == ''
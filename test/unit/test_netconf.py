@@ -0,0 +1,130 @@
+"""Tests for the netconf transport, against a local stand-in NETCONF server."""
+
+import pytest
+from napalm.base.exceptions import CommandErrorException
+from napalm.base.test import helpers
+from napalm.base.test import models
+
+from napalm_h3c_cmw import h3c_cmw
+from napalm_h3c_cmw import netconf
+
+from cmw_testing.netconf_server import NetconfServer, build_data
+
+TABLES = {
+    'Ifmgr/Interfaces/Interface': [
+        {'IfIndex': 1, 'Name': 'GigabitEthernet1/0/1', 'AbbreviatedName': 'GE1/0/1', 'Description': 'uplink',
+         'AdminStatus': 1, 'OperStatus': 1, 'ActualSpeed': 1000000, 'MAC': '00-E0-FC-01-00-01', 'MTU': 1500,
+         'PortLayer': 1},
+        {'IfIndex': 2, 'Name': 'GigabitEthernet1/0/2', 'AbbreviatedName': 'GE1/0/2', 'AdminStatus': 2,
+         'OperStatus': 2, 'MAC': '00-E0-FC-01-00-02', 'MTU': 1500, 'PortLayer': 1},
+        {'IfIndex': 10, 'Name': 'Vlan-interface10', 'AbbreviatedName': 'Vlan10', 'AdminStatus': 1,
+         'OperStatus': 1, 'MAC': '00-E0-FC-01-00-0A', 'MTU': 1500},
+    ],
+    'Ifmgr/Statistics/Interface': [
+        {'IfIndex': 1, 'Name': 'GigabitEthernet1/0/1', 'InOctets': 6400, 'InUcastPkts': 90, 'InNUcastPkts': 10,
+         'InDiscards': 2, 'InErrors': 1, 'OutOctets': 3200, 'OutUcastPkts': 45, 'OutNUcastPkts': 5,
+         'OutDiscards': 0, 'OutErrors': 0},
+        {'IfIndex': 10, 'Name': 'Vlan-interface10', 'InOctets': 640, 'OutOctets': 320},
+    ],
+    'Ifmgr/EthPortStatistics/Interface': [
+        {'IfIndex': 1, 'InBrdcastPkts': 4, 'InMulticastPkts': 6, 'OutBrdcastPkts': 2, 'OutMulticastPkts': 3},
+    ],
+    'ARP/ArpTable/ArpEntry': [
+        {'IfIndex': 10, 'PortIndex': 1, 'Ipv4Addr': '10.0.10.2', 'MacAddress': '00-11-22-33-44-55',
+         'VLANID': 10, 'VrfIndex': 0},
+    ],
+    'MAC/MacUnicastTable/Unicast': [
+        {'VLANID': 10, 'MacAddress': '00-11-22-33-44-55', 'PortIndex': 1, 'Status': 1, 'Aging': 'true'},
+        {'VLANID': 10, 'MacAddress': '00-11-22-33-44-66', 'PortIndex': 2, 'Status': 2, 'Aging': 'false'},
+    ],
+    'LLDP/NeighborSystems/Neighbor': [
+        {'IfIndex': 1, 'AgentID': 1, 'SystemName': 'core-1', 'PortId': 'Ten-GigabitEthernet1/0/1'},
+    ],
+}
+
+
+@pytest.fixture(scope='module')
+def server():
+    with NetconfServer(build_data(TABLES)) as server:
+        yield server
+
+
+@pytest.fixture
+def driver(server):
+    driver = h3c_cmw.CMWDriver('127.0.0.1', 'admin', 'admin', timeout=10,
+                               optional_args={'transport': 'netconf', 'netconf_port': server.port})
+    driver._open_netconf()
+    yield driver
+    driver.close()
+
+
+def test_transport_options():
+    driver = h3c_cmw.CMWDriver('127.0.0.1', 'admin', 'admin', optional_args={'transport': 'netconf'})
+    assert driver.use_netconf
+    assert driver.transport == 'ssh'
+    assert driver.netconf_port == netconf.NETCONF_PORT
+    assert driver.netmiko_optional_args['port'] == 22
+
+
+def test_get_interfaces(driver):
+    interfaces = driver.get_interfaces()
+    for interface in interfaces.values():
+        assert helpers.test_model(models.interface, interface)
+    assert interfaces['GigabitEthernet1/0/1'] == {
+        'description': 'uplink', 'is_enabled': True, 'is_up': True, 'last_flapped': -1.0,
+        'mac_address': '00:E0:FC:01:00:01', 'mtu': 1500, 'speed': 1000,
+    }
+    assert not interfaces['GigabitEthernet1/0/2']['is_enabled']
+    assert interfaces['Vlan-interface10']['speed'] == -1
+
+
+def test_get_interfaces_counters(driver):
+    counters = driver.get_interfaces_counters()
+    assert sorted(counters) == ['GigabitEthernet1/0/1', 'Vlan-interface10']
+    for counter in counters.values():
+        assert helpers.test_model(models.interface_counters, counter)
+    assert counters['GigabitEthernet1/0/1']['rx_octets'] == 6400
+    assert counters['GigabitEthernet1/0/1']['rx_unicast_packets'] == 90
+    assert counters['GigabitEthernet1/0/1']['rx_multicast_packets'] == 6
+    assert counters['GigabitEthernet1/0/1']['tx_broadcast_packets'] == 2
+    assert counters['Vlan-interface10']['tx_octets'] == 320
+    assert counters['Vlan-interface10']['rx_broadcast_packets'] == 0
+
+
+def test_get_arp_table(driver):
+    assert driver.get_arp_table() == [
+        {'interface': 'GE1/0/1', 'mac': '00:11:22:33:44:55', 'ip': '10.0.10.2', 'age': -1.0},
+    ]
+    assert driver.get_arp_table(compact=True).to_dicts() == driver.get_arp_table()
+
+
+def test_get_mac_address_table(driver):
+    table = driver.get_mac_address_table()
+    assert [(entry['interface'], entry['static'], entry['active']) for entry in table] == [
+        ('GE1/0/1', False, True), ('GE1/0/2', True, False)]
+    assert table[0]['vlan'] == 10
+    assert driver.get_mac_address_table(compact=True).to_dicts() == table
+
+
+def test_get_lldp_neighbors(driver):
+    assert driver.get_lldp_neighbors() == {'GE1/0/1': [{'hostname': 'core-1', 'port': 'Ten-GigabitEthernet1/0/1'}]}
+
+
+def test_filter_selects_used_columns(server):
+    requests = server.requests
+    session = netconf.NetconfSession('127.0.0.1', 'admin', 'admin', port=server.port, timeout=10)
+    session.open()
+    try:
+        reply = session.get([netconf.MAC_ADDRESSES])
+    finally:
+        session.close()
+    assert server.requests == requests + 1
+    assert b'Aging' not in reply and b'Ifmgr' not in reply
+    assert reply.count(b'<MacAddress>') == 2
+
+
+def test_rpc_error():
+    reply = ('<rpc-reply xmlns="{}" message-id="1"><rpc-error><error-type>application</error-type>'
+             '<error-message>table not supported</error-message></rpc-error></rpc-reply>').format(netconf.BASE_NS)
+    with pytest.raises(CommandErrorException):
+        list(netconf.iter_rows(reply.encode('utf-8'), [netconf.ARP]))
@@ -0,0 +1,114 @@
+"""Tests for the single-pass 'display interface' parser and the prompt pattern, on mocked outputs and edited blocks."""
+
+import io
+import json
+import os
+
+import pytest
+
+from napalm_h3c_cmw import parsers
+
+MOCKED_DATA = os.path.join(os.path.dirname(__file__), 'mocked_data')
+
+# every descriptive marker before the counters, the pass may stop early without them
+COMPLETE_BLOCK = """GigabitEthernet1/0/5 current state : UP
+Line protocol current state : UP
+Description:to core
+Route Port,The Maximum Transmit Unit is 9000
+IP Sending Frames' Format is PKTFMT_ETHNT_2, Hardware address is 0023-89b5-6a41
+Speed : 10000,  Loopback: NONE
+
+Input:  30 packets, 4000 bytes
+  Unicast:                 20,  Multicast:                   6
+  Broadcast:                4,  Jumbo:                       0
+  Discard:                  1,  Total Error:                 2
+
+Output:  50 packets, 6000 bytes
+  Unicast:                 40,  Multicast:                   7
+  Broadcast:                3,  Jumbo:                       0
+  Discard:                  0,  Total Error:                 5
+"""
+
+
+def load(getter, filename):
+    with io.open(os.path.join(MOCKED_DATA, getter, 'normal', filename), encoding='utf-8') as data:
+        return data.read()
+
+
+def mocked_blocks(getter):
+    return parsers.separate_sections(parsers.INTERFACE_SEPARATOR, load(getter, 'display_interface.txt'))
+
+
+@pytest.mark.parametrize('getter,parse', [
+    ('test_get_interfaces', parsers.parse_interfaces),
+    ('test_get_interfaces_counters', parsers.parse_interfaces_counters),
+])
+def test_mocked_outputs(getter, parse):
+    expected = json.loads(load(getter, 'expected_result.json'))
+    result = parse(mocked_blocks(getter))
+    assert sorted(result) == sorted(expected)
+    for name, fields in expected.items():
+        for field, value in fields.items():
+            assert result[name][field] == value, '{} {}'.format(name, field)
+
+
+def test_mocked_block_fields():
+    blocks = dict((parsers.parse_interface_block(block)['name'], block)
+                  for block in mocked_blocks('test_get_interfaces'))
+    port = parsers.parse_interface_block(blocks['GigabitEthernet1/0/2'])
+    assert (port['state'], port['protocol']) == ('Administratively DOWN', 'DOWN')
+    assert (port['mac_address'], port['speed'], port['mtu']) == ('0023-89b5-6a3e', '1000', None)
+    vlan = parsers.parse_interface_block(blocks['Vlan-interface10'])
+    assert (vlan['description'], vlan['mtu'], vlan['speed']) == ('servers', '1500', None)
+    assert vlan['counters'] == {}
+
+
+def test_early_stop():
+    fields = parsers.parse_interface_block(COMPLETE_BLOCK, counters=False)
+    assert (fields['description'], fields['mtu'], fields['speed']) == ('to core', '9000', '10000')
+    assert fields['mac_address'] == '0023-89b5-6a41'
+    # all five markers were found before the counters, they are not read
+    assert fields['counters'] == {}
+    counters = parsers.parse_interfaces_counters([COMPLETE_BLOCK])['GigabitEthernet1/0/5']
+    assert (counters['rx_unicast_packets'], counters['tx_unicast_packets']) == (20, 40)
+    assert (counters['rx_errors'], counters['tx_errors']) == (2, 5)
+    assert (counters['rx_octets'], counters['tx_octets']) == (4000, 6000)
+
+
+@pytest.mark.parametrize('marker,field', [
+    ('Description', 'description'),
+    ('Route Port', 'mtu'),
+    ('IP Sending Frames', 'mac_address'),
+    ('Speed', 'speed'),
+])
+def test_missing_marker(marker, field):
+    block = '\n'.join(line for line in COMPLETE_BLOCK.splitlines() if not line.startswith(marker))
+    interface = parsers.parse_interfaces([block])['GigabitEthernet1/0/5']
+    # the pass goes on to the end of the block, the other fields are still read
+    for name, default in (('description', ''), ('mtu', -1), ('mac_address', ''), ('speed', -1)):
+        assert (interface[name] == default) == (name == field), name
+    assert interface['is_up'] and interface['is_enabled']
+
+
+def test_marker_after_counters():
+    lines = COMPLETE_BLOCK.splitlines()
+    block = '\n'.join(lines[:2] + lines[3:] + [lines[2]])
+    fields = parsers.parse_interface_block(block, counters=False)
+    assert fields['description'] == 'to core'
+
+
+def test_missing_line_protocol():
+    block = '\n'.join(line for line in COMPLETE_BLOCK.splitlines() if not line.startswith('Line protocol'))
+    with pytest.raises(ValueError):
+        parsers.parse_interfaces([block])
+
+
+@pytest.mark.parametrize('buffer,found', [
+    ('<H3C>', True),
+    ('output\r\n[H3C-vlan10] ', True),
+    ('\r<H3C>', True),
+    ('GE1/0/1              UP   to <H3C>', False),
+    ('<H3C-2>\nmore output', False),
+])
+def test_prompt_pattern(buffer, found):
+    assert (parsers.prompt_pattern('H3C').search(buffer) is not None) == found
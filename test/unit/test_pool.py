@@ -0,0 +1,164 @@
+"""Tests for the session pool and how CMWDriver.close() gives sessions back to it."""
+
+import threading
+
+import pytest
+from napalm.base.exceptions import ConnectionException
+
+from napalm_h3c_cmw import h3c_cmw
+from napalm_h3c_cmw import pool as pool_module
+from napalm_h3c_cmw.pool import ConnectionPool
+
+from cmw_testing.replay import ReplayConnection
+
+KEY_A = ('10.0.0.1', 22, 'admin')
+KEY_B = ('10.0.0.2', 22, 'admin')
+
+
+class Session(object):
+
+    def __init__(self, name):
+        self.name = name
+
+
+def connector(name):
+    return lambda: Session(name)
+
+
+def alive(session):
+    return True
+
+
+def test_idle_session_reused():
+    pool = ConnectionPool(disconnect=lambda session: None)
+    first = pool.acquire(KEY_A, connector('first'), alive)
+    pool.release(KEY_A, first)
+    assert pool.acquire(KEY_A, connector('second'), alive) is first
+    assert pool.idle_count() == 0
+
+
+def test_dead_session_replaced():
+    closed = []
+    pool = ConnectionPool(disconnect=closed.append)
+    first = pool.acquire(KEY_A, connector('first'), alive)
+    pool.release(KEY_A, first)
+    second = pool.acquire(KEY_A, connector('second'), lambda session: False)
+    assert second.name == 'second'
+    assert closed == [first]
+
+
+def test_idle_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pool_module.time, 'time', lambda: now[0])
+    closed = []
+    pool = ConnectionPool(idle_ttl=300, disconnect=closed.append)
+    first = pool.acquire(KEY_A, connector('first'), alive)
+    pool.release(KEY_A, first)
+
+    now[0] += 299
+    assert pool.idle_count(KEY_A) == 1
+    now[0] += 1
+    second = pool.acquire(KEY_A, connector('second'), alive)
+    assert second.name == 'second'
+    assert closed == [first]
+
+
+def test_max_idle_closes_least_recently_used():
+    closed = []
+    pool = ConnectionPool(max_idle=2, max_per_device=3, disconnect=closed.append)
+    sessions = [pool.acquire(KEY_A, connector(name), alive) for name in ('one', 'two')]
+    sessions.append(pool.acquire(KEY_B, connector('three'), alive))
+    pool.release(KEY_A, sessions[0])
+    pool.release(KEY_B, sessions[2])
+    pool.release(KEY_A, sessions[1])
+    assert closed == [sessions[0]]
+    assert pool.idle_count(KEY_A) == 1
+    assert pool.idle_count(KEY_B) == 1
+    # the most recently used session of the device is taken first
+    assert pool.acquire(KEY_A, connector('four'), alive) is sessions[1]
+
+
+def test_per_device_cap():
+    pool = ConnectionPool(max_per_device=2, acquire_timeout=0.1, disconnect=lambda session: None)
+    first = pool.acquire(KEY_A, connector('first'), alive)
+    pool.acquire(KEY_A, connector('second'), alive)
+    with pytest.raises(ConnectionException):
+        pool.acquire(KEY_A, connector('third'), alive)
+    # other devices are not held back
+    assert pool.acquire(KEY_B, connector('other'), alive).name == 'other'
+
+    pool.discard(KEY_A, first)
+    assert pool.acquire(KEY_A, connector('third'), alive).name == 'third'
+
+
+def test_acquire_waits_for_release():
+    pool = ConnectionPool(max_per_device=1, acquire_timeout=5, disconnect=lambda session: None)
+    first = pool.acquire(KEY_A, connector('first'), alive)
+    timer = threading.Timer(0.1, pool.release, (KEY_A, first))
+    timer.start()
+    try:
+        assert pool.acquire(KEY_A, connector('second'), alive) is first
+    finally:
+        timer.join()
+
+
+def test_failed_connect_frees_its_slot():
+    def refuse():
+        raise ConnectionException('refused')
+
+    pool = ConnectionPool(max_per_device=1, acquire_timeout=0.1, disconnect=lambda session: None)
+    with pytest.raises(ConnectionException):
+        pool.acquire(KEY_A, refuse, alive)
+    assert pool.acquire(KEY_A, connector('first'), alive).name == 'first'
+
+
+@pytest.fixture
+def pooled_driver(replayed_driver):
+    """Return a function building a driver on session, acquired from pool."""
+    def build(pool, session):
+        driver = replayed_driver(optional_args={'connection_pool': pool}, device=session)
+        assert pool.acquire(driver._pool_key(), lambda: session, alive) is session
+        return driver
+    return build
+
+
+def test_close_gives_back_clean_session(pooled_driver):
+    pool = ConnectionPool(disconnect=lambda session: session.disconnect())
+    session = ReplayConnection({})
+    driver = pooled_driver(pool, session)
+    driver.close()
+    assert driver.device is None
+    assert pool.idle_count() == 1
+
+
+def test_close_discards_session_outside_user_view(pooled_driver):
+    closed = []
+    pool = ConnectionPool(disconnect=closed.append)
+    session = ReplayConnection({})
+    driver = pooled_driver(pool, session)
+    session.system_view = True
+    driver.close()
+    assert pool.idle_count() == 0
+    assert closed == [session]
+
+
+def test_close_discards_session_with_unread_output(pooled_driver):
+    closed = []
+    pool = ConnectionPool(disconnect=closed.append)
+    session = ReplayConnection({'display version': 'H3C Comware Software\n'})
+    driver = pooled_driver(pool, session)
+    # a command whose output was never read, as after a read timeout
+    session.write_channel('display version\n')
+    driver.close()
+    assert pool.idle_count() == 0
+    assert closed == [session]
+
+
+def test_key_depends_on_credentials():
+    def key(password, **optional_args):
+        return h3c_cmw.CMWDriver('127.0.0.1', 'admin', password, optional_args=optional_args)._pool_key()
+
+    assert key('admin') == key('admin')
+    # a wrong password does not get the session logged in with the right one
+    assert key('admin') != key('wrong')
+    assert key('admin') != key('admin', key_file='/root/.ssh/id_rsa')
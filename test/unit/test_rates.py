@@ -0,0 +1,104 @@
+"""Tests for the counter rate engine."""
+
+import pytest
+
+from napalm_h3c_cmw import parsers
+from napalm_h3c_cmw import snmp
+from napalm_h3c_cmw.fleet import DeviceResult
+from napalm_h3c_cmw.rates import CounterRing, RateEngine
+
+
+def counters(**values):
+    counter = parsers.interface_counters({})
+    counter.update(values)
+    return counter
+
+
+def test_rates():
+    ring = CounterRing(size=4)
+    ring.append({'GE1/0/1': counters(rx_octets=1000, rx_unicast_packets=10, tx_broadcast_packets=4)}, 100)
+    assert ring.rates() == {}
+    ring.append({'GE1/0/1': counters(rx_octets=3000, rx_unicast_packets=30, rx_multicast_packets=10,
+                                     tx_broadcast_packets=24, rx_errors=2)}, 110)
+    rates = ring.rates()['GE1/0/1']
+    assert rates['rx_octets'] == 200
+    assert rates['rx_bps'] == 1600
+    assert rates['rx_pps'] == 3
+    assert rates['tx_pps'] == 2
+    assert rates['rx_errors'] == 0.2
+    assert rates['tx_octets'] == 0
+
+
+@pytest.mark.parametrize('bits, older, newer, delta', [
+    (32, 2 ** 32 - 100, 50, 150),
+    (64, 2 ** 64 - 10, 5, 15),
+    # cleared, counted from zero
+    (64, 1000, 10, 10),
+    (32, 1000, 10, 10),
+])
+def test_counter_going_back(bits, older, newer, delta):
+    ring = CounterRing(counter_bits={'rx_octets': bits})
+    ring.append({'GE1/0/1': counters(rx_octets=older)}, 0)
+    ring.append({'GE1/0/1': counters(rx_octets=newer)}, 1)
+    assert ring.rates()['GE1/0/1']['rx_octets'] == delta
+
+
+def test_snmp_counter_bits():
+    assert snmp.COUNTER_BITS['rx_octets'] == 64
+    assert snmp.COUNTER_BITS['rx_errors'] == 32
+
+
+def test_window_over_a_full_ring():
+    ring = CounterRing(size=4)
+    for second in range(20):
+        ring.append({'GE1/0/1': counters(tx_octets=second * 100)}, second)
+    assert len(ring) == 4
+    assert ring.rates(window=10)['GE1/0/1']['tx_octets'] == 100
+    assert ring.rates(window=3)['GE1/0/1']['tx_octets'] == 100
+
+
+def test_reboot():
+    ring = CounterRing()
+    ring.append({'GE1/0/1': counters(rx_octets=10 ** 9)}, 1000, uptime=900)
+    assert not ring.append({'GE1/0/1': counters(rx_octets=10 ** 9 + 600)}, 1060, uptime=960)
+    assert ring.rates()['GE1/0/1']['rx_octets'] == 10
+    # display version has minutes only
+    assert not ring.append({'GE1/0/1': counters(rx_octets=10 ** 9 + 1200)}, 1120, uptime=960)
+    # rebooted 30 s ago, the counters started again
+    assert ring.append({'GE1/0/1': counters(rx_octets=300)}, 1180, uptime=30)
+    assert ring.reboots == 1
+    assert ring.rates() == {}
+    ring.append({'GE1/0/1': counters(rx_octets=900)}, 1240, uptime=90)
+    assert ring.rates()['GE1/0/1']['rx_octets'] == 10
+
+
+def test_interfaces_come_and_go():
+    ring = CounterRing()
+    ring.append({'GE1/0/1': counters(rx_octets=0), 'GE1/0/2': counters(rx_octets=0)}, 0)
+    ring.append({'GE1/0/1': counters(rx_octets=10), 'GE1/0/3': counters(rx_octets=10 ** 6)}, 1)
+    assert list(ring.rates()) == ['GE1/0/1']
+    ring.append({'GE1/0/1': counters(rx_octets=20), 'GE1/0/3': counters(rx_octets=10 ** 6 + 5)}, 2)
+    assert sorted(ring.rates()) == ['GE1/0/1', 'GE1/0/3']
+    assert ring.rates()['GE1/0/3']['rx_octets'] == 5
+    assert list(ring.rates(window=2)) == ['GE1/0/1']
+
+
+def test_engine_fleet_results():
+    engine = RateEngine(size=2)
+    for timestamp, octets in ((0, 0), (60, 6000)):
+        result = DeviceResult('10.0.0.1', {'get_facts': {'uptime': 3600 + timestamp},
+                                           'get_interfaces_counters': {'GE1/0/1': counters(tx_octets=octets)}},
+                              {}, None, 1.0, 1)
+        engine.add_result(result, timestamp)
+    failed = DeviceResult('10.0.0.2', {}, {}, EOFError(), 1.0, 3)
+    assert not engine.add_result(failed)
+    assert engine.all_rates() == {'10.0.0.1': engine.rates('10.0.0.1')}
+    assert engine.rates('10.0.0.1')['GE1/0/1']['tx_bps'] == 800
+    assert engine.rates('10.0.0.2') == {}
+
+
+def test_unreported_counter():
+    ring = CounterRing()
+    ring.append({'GE1/0/1': counters(rx_discards=-1, rx_octets=5)}, 0)
+    ring.append({'GE1/0/1': counters(rx_discards=-1, rx_octets=10)}, 1)
+    assert ring.rates()['GE1/0/1']['rx_discards'] == 0
@@ -0,0 +1,81 @@
+"""Tests for the compact MAC and ARP table containers."""
+
+import sys
+
+import pytest
+
+from napalm_h3c_cmw import records
+
+from cmw_testing import synthetic
+
+
+@pytest.mark.parametrize('mac', ['0011-22aa-bbcc', '00:11:22:AA:BB:CC', '0011.22aa.bbcc', '001122aabbcc'])
+def test_mac_round_trip(mac):
+    value = records.mac_to_int(mac)
+    assert value == 0x001122aabbcc
+    assert records.int_to_mac(value) == '00:11:22:AA:BB:CC'
+
+
+def test_mac_table():
+    table = records.MACTable.from_fields([
+        ('0011-22aa-bbcc', '10', 'GigabitEthernet1/0/1', 'dynamic'),
+        ('0011-22aa-bbcd', 4094, 'Bridge-Aggregation1', 'static'),
+        ('0011-22aa-bbce', '1', 'GigabitEthernet1/0/2', 'authen'),
+        ('0011-22aa-bbcf', '1', 'GigabitEthernet1/0/2', 'snooping'),
+    ])
+    assert len(table) == 4
+    first = table[0]
+    assert (first.mac, first.vlan, first.interface) == ('00:11:22:AA:BB:CC', 10, 'GigabitEthernet1/0/1')
+    assert (first.static, first.active, first.authen) == (False, True, False)
+    assert table[1].static and table[1].vlan == 4094
+    assert table[2].authen
+    assert not (table[3].static or table[3].active or table[3].authen)
+    assert table.to_dicts()[0] == {
+        'mac': '00:11:22:AA:BB:CC', 'interface': 'GigabitEthernet1/0/1', 'vlan': 10, 'static': False,
+        'active': True, 'authen': False, 'moves': -1, 'last_move': -1.0,
+    }
+    # interface names are shared between rows
+    assert table[2].interface is table[3].interface
+
+
+def test_arp_table():
+    table = records.ARPTable.from_fields([
+        ('10.0.0.1', '0011-22aa-bbcc', 'Vlan-interface10'),
+        ('255.255.255.254', '0011-22aa-bbcd', 'Vlan-interface10'),
+    ])
+    assert len(table) == 2
+    assert [entry.ip for entry in table] == ['10.0.0.1', '255.255.255.254']
+    assert table.to_dicts()[0] == {
+        'interface': 'Vlan-interface10', 'mac': '00:11:22:AA:BB:CC', 'ip': '10.0.0.1', 'age': -1.0,
+    }
+    # one IPv4 address takes 4 bytes
+    assert table._ips.itemsize == 4
+
+
+def test_entries_have_no_instance_dict():
+    entry = records.ARPTable.from_fields([('10.0.0.1', '0011-22aa-bbcc', 'Vlan-interface10')])[0]
+    assert not hasattr(entry, '__dict__')
+    with pytest.raises(AttributeError):
+        entry.vrf = 'mgmt'
+
+
+def test_compact_getters_match_the_dictionaries(replayed_driver):
+    driver = replayed_driver(synthetic.device_outputs(interfaces=4, mac_addresses=300, arp_entries=120))
+
+    mac_table = driver.get_mac_address_table(compact=True)
+    assert isinstance(mac_table, records.MACTable)
+    assert mac_table.to_dicts() == driver.get_mac_address_table()
+    arp_table = driver.get_arp_table(compact=True)
+    assert isinstance(arp_table, records.ARPTable)
+    assert arp_table.to_dicts() == driver.get_arp_table()
+
+
+def test_compact_table_is_smaller():
+    rows = [('0011-22aa-{:04x}'.format(index), '10', 'GigabitEthernet1/0/{}'.format(index % 48), 'dynamic')
+            for index in range(5000)]
+    table = records.MACTable.from_fields(rows)
+    compact_size = sum(sys.getsizeof(column) for column in
+                       (table._macs, table._vlans, table._interfaces, table._types))
+    dicts = table.to_dicts()
+    dicts_size = sys.getsizeof(dicts) + sum(sys.getsizeof(entry) for entry in dicts)
+    assert compact_size * 5 < dicts_size
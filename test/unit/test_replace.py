@@ -0,0 +1,71 @@
+"""Tests for replace candidates given as config strings, with the transfer index."""
+
+import hashlib
+import os
+
+import pytest
+
+CANDIDATE = 'sysname NEW\n#\nvlan 10\n#\nreturn\n'
+REMOTE_NAME = 'napalm_{}.cfg'.format(hashlib.md5(CANDIDATE.encode('utf-8')).hexdigest())
+MD5 = hashlib.md5(CANDIDATE.encode('utf-8')).hexdigest()
+
+DIR_FLASH = """\
+Directory of flash:
+   0 -rw-        1024 Jan 02 2020 10:00:00   startup.cfg
+
+1046512 KB total (1002200 KB free)
+"""
+
+
+def dir_entry(name, size, mtime='Jan 03 2020 11:22:33'):
+    return 'Directory of flash:\n   1 -rw-  {:>10} {}   {}\n\n1046512 KB total (1002200 KB free)\n'.format(
+        size, mtime, name)
+
+
+@pytest.fixture
+def indexed_driver(replayed_driver, tmpdir):
+    """Return a function building a driver on outputs, with a transfer index and its uploads recorded."""
+    def build(outputs):
+        driver = replayed_driver(outputs, {'transfer_index': str(tmpdir.join('index.jsonl'))})
+        uploads = []
+
+        def transfer_file(filename, dest):
+            with open(filename) as local_file:
+                uploads.append((dest, local_file.read()))
+            outputs['dir {}'.format(dest)] = dir_entry(dest, len(CANDIDATE))
+
+        driver._transfer_file = transfer_file
+        return driver, uploads
+    return build
+
+
+def test_config_string_uploaded_once(indexed_driver):
+    outputs = {
+        'dir flash:': DIR_FLASH,
+        'dir {}'.format(REMOTE_NAME): 'No file found.\n',
+        'display system file-md5 {}'.format(REMOTE_NAME): '{}   {}\n'.format(REMOTE_NAME, MD5),
+    }
+    driver, uploads = indexed_driver(outputs)
+    driver.load_replace_candidate(config=CANDIDATE)
+    assert uploads == [(REMOTE_NAME, CANDIDATE)]
+    # the local copy is gone, the device one is named after the content
+    assert not os.path.exists(driver.replace_file)
+    assert os.path.basename(driver.replace_file) == REMOTE_NAME
+
+    commands = driver.device.commands
+    driver.load_replace_candidate(config=CANDIDATE)
+    assert len(uploads) == 1
+    # answered by 'dir flash:' and the listing of the file, the index spares the md5
+    assert driver.device.commands - commands == 2
+
+
+def test_changed_config_uploaded(indexed_driver):
+    outputs = {
+        'dir flash:': DIR_FLASH,
+        'dir {}'.format(REMOTE_NAME): 'No file found.\n',
+    }
+    driver, uploads = indexed_driver(outputs)
+    driver.load_replace_candidate(config=CANDIDATE)
+    driver.load_replace_candidate(config=CANDIDATE.replace('vlan 10', 'vlan 20'))
+    assert len(uploads) == 2
+    assert uploads[0][0] != uploads[1][0]
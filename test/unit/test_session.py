@@ -0,0 +1,57 @@
+"""Tests for the session set up once by open(), on a replayed session."""
+
+from napalm_h3c_cmw import parsers
+
+from cmw_testing import synthetic
+from cmw_testing.replay import ReplayConnection
+
+OUTPUTS = synthetic.device_outputs(interfaces=4, mac_addresses=50, arp_entries=50)
+# a description that reads like the pager prompt, left alone once the pager is off
+OUTPUTS['display interface brief description'] = 'GE1/0/1              UP   ---- More ----\n'
+
+
+class LoginReplay(ReplayConnection):
+    """Replayed session left in system-view by napalm's login, counting the pager answers."""
+
+    def __init__(self, *args, **kwargs):
+        super(LoginReplay, self).__init__(*args, **kwargs)
+        self.system_view = True
+        self.pager_answers = 0
+
+    def write_channel(self, out_data):
+        if out_data == ' ':
+            self.pager_answers += 1
+            return
+        super(LoginReplay, self).write_channel(out_data)
+
+
+def opened_driver(replayed_driver):
+    driver = replayed_driver(device=LoginReplay(OUTPUTS, hostname=synthetic.HOSTNAME), timeout=5, opened=False)
+    driver.open()
+    return driver
+
+
+def test_open_sets_the_session_up(replayed_driver):
+    driver = opened_driver(replayed_driver)
+    assert driver.device.sent == ['return', 'screen-length disable']
+    assert not driver.device.system_view
+    assert driver._paging_disabled
+    assert driver._prompt.search('<{}>'.format(synthetic.HOSTNAME))
+    assert not driver._prompt.search('<other>')
+
+
+def test_getters_without_paging_round_trips(replayed_driver):
+    driver = opened_driver(replayed_driver)
+    assert driver.get_arp_table() == parsers.parse_arp_table(OUTPUTS['display arp'])
+    assert driver.get_mac_address_table() == parsers.parse_mac_address_table(OUTPUTS['display mac-address'])
+    # the pager is disabled once, and never answered
+    assert driver.device.sent.count('screen-length disable') == 1
+    assert driver.device.pager_answers == 0
+
+
+def test_pager_prompt_in_output_left_alone(replayed_driver):
+    driver = opened_driver(replayed_driver)
+    command = 'display interface brief description'
+    output = driver.cli([command])[command]
+    assert output.strip() == OUTPUTS[command].strip()
+    assert driver.device.pager_answers == 0
@@ -0,0 +1,197 @@
+"""Tests for SFTP uploads over the open session transport, and the fallback to a new login."""
+
+import os
+
+import paramiko
+import pytest
+
+from napalm_h3c_cmw import h3c_cmw
+
+
+class RemoteFile(object):
+
+    def __init__(self, files, name):
+        self.files = files
+        self.name = name
+        self.pipelined = False
+        self.writes = 0
+
+    def __enter__(self):
+        self.files[self.name] = b''
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set_pipelined(self, pipelined=True):
+        self.pipelined = pipelined
+
+    def write(self, data):
+        self.writes += 1
+        self.files[self.name] += data
+
+
+class StandInSFTP(object):
+    """SFTP client keeping the files written in memory."""
+
+    def __init__(self, transport, lose_bytes=0):
+        self.transport = transport
+        self.lose_bytes = lose_bytes
+        self.files = {}
+        self.opened = []
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.closed = True
+        return False
+
+    def open(self, name, mode, bufsize):
+        remote_file = RemoteFile(self.files, name)
+        self.opened.append(remote_file)
+        return remote_file
+
+    def stat(self, name):
+        attributes = paramiko.SFTPAttributes()
+        attributes.st_size = len(self.files[name]) - self.lose_bytes
+        return attributes
+
+
+class Transport(object):
+
+    def __init__(self, active=True):
+        self.active = active
+
+    def is_active(self):
+        return self.active
+
+
+class Session(object):
+    """netmiko connection exposing the paramiko client of the session."""
+
+    def __init__(self, transport):
+        self.remote_conn_pre = self
+        self.transport = transport
+
+    def get_transport(self):
+        return self.transport
+
+
+class Login(object):
+    """paramiko.SSHClient of a second login."""
+
+    def __init__(self):
+        self.transport = Transport()
+        self.closed = False
+
+    def get_transport(self):
+        return self.transport
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def sftp(monkeypatch):
+    """Record the SFTP clients opened, by transport; channels on refused transports fail."""
+    clients = []
+
+    def from_transport(transport):
+        if getattr(transport, 'refuse', False):
+            raise paramiko.SSHException('Administratively prohibited')
+        client = StandInSFTP(transport, lose_bytes=getattr(transport, 'lose_bytes', 0))
+        clients.append(client)
+        return client
+
+    monkeypatch.setattr(paramiko.SFTPClient, 'from_transport', staticmethod(from_transport))
+    return clients
+
+
+@pytest.fixture
+def candidate(tmpdir):
+    path = tmpdir.join('candidate.cfg')
+    path.write_binary(b'sysname H3C\n' * 10000)
+    return str(path)
+
+
+def driver_with(session, transport='ssh'):
+    driver = h3c_cmw.CMWDriver('127.0.0.1', 'admin', 'admin', optional_args={'transport': transport})
+    driver.device = session
+    logins = []
+
+    def ssh_login():
+        login = Login()
+        logins.append(login)
+        return login
+
+    driver._ssh_login = ssh_login
+    return driver, logins
+
+
+def test_session_transport_reused(sftp, candidate):
+    transport = Transport()
+    driver, logins = driver_with(Session(transport))
+    stats = driver._transfer_file(candidate, 'candidate.cfg')
+    assert logins == []
+    assert sftp[0].transport is transport
+    assert sftp[0].files['candidate.cfg'] == open(candidate, 'rb').read()
+    assert sftp[0].closed
+    assert stats['reused_transport']
+    assert stats['bytes'] == os.path.getsize(candidate)
+    assert stats['file'] == 'candidate.cfg'
+
+
+def test_writes_pipelined_in_chunks(sftp, candidate):
+    driver, _ = driver_with(Session(Transport()))
+    driver._transfer_file(candidate, 'candidate.cfg')
+    remote_file = sftp[0].opened[0]
+    assert remote_file.pipelined
+    assert remote_file.writes == -(-os.path.getsize(candidate) // h3c_cmw.SFTP_CHUNK_SIZE)
+
+
+def test_refused_channel_falls_back_to_login(sftp, candidate):
+    transport = Transport()
+    transport.refuse = True
+    driver, logins = driver_with(Session(transport))
+    stats = driver._transfer_file(candidate, 'candidate.cfg')
+    assert len(logins) == 1 and logins[0].closed
+    assert sftp[0].transport is logins[0].transport
+    assert not stats['reused_transport']
+
+
+@pytest.mark.parametrize('session,transport', [
+    (Session(Transport(active=False)), 'ssh'),
+    (Session(None), 'ssh'),
+    (object(), 'ssh'),
+    (Session(Transport()), 'telnet'),
+])
+def test_no_usable_transport(sftp, candidate, session, transport):
+    driver, logins = driver_with(session, transport)
+    stats = driver._transfer_file(candidate, 'candidate.cfg')
+    assert len(logins) == 1 and logins[0].closed
+    assert not stats['reused_transport']
+
+
+def test_short_upload_detected(sftp, candidate):
+    transport = Transport()
+    transport.lose_bytes = 1
+    driver, _ = driver_with(Session(transport))
+    with pytest.raises(IOError):
+        driver._transfer_file(candidate, 'candidate.cfg')
+
+
+def test_login_closed_on_error(sftp, candidate):
+    driver, logins = driver_with(Session(None))
+
+    def ssh_login():
+        login = Login()
+        login.transport.lose_bytes = 1
+        logins.append(login)
+        return login
+
+    driver._ssh_login = ssh_login
+    with pytest.raises(IOError):
+        driver._transfer_file(candidate, 'candidate.cfg')
+    assert logins[0].closed
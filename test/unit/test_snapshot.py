@@ -0,0 +1,89 @@
+"""Tests for the command snapshot, its TTL and what invalidates it."""
+
+import pytest
+
+from napalm_h3c_cmw.utils import snapshot
+from napalm_h3c_cmw.utils.snapshot import CommandSnapshot
+
+from cmw_testing import synthetic
+
+OUTPUTS = dict(synthetic.device_outputs(interfaces=4), **{'reset counters interface': ''})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(snapshot.time, 'time', lambda: now[0])
+    return now
+
+
+def test_ttl(clock):
+    cache = CommandSnapshot(ttl=10)
+    cache.put('display interface', 'output')
+    cache.put_sections('display interface', 'sep', ['a', 'b'])
+    clock[0] += 9.9
+    assert cache.get('display interface') == 'output'
+    assert cache.get_sections('display interface', 'sep') == ['a', 'b']
+    clock[0] += 0.1
+    assert cache.get('display interface') is None
+    assert cache.get_sections('display interface', 'sep') is None
+
+
+def test_disabled():
+    cache = CommandSnapshot(ttl=0)
+    cache.put('display interface', 'output')
+    cache.put_sections('display interface', 'sep', ['a'])
+    assert cache.get('display interface') is None
+    assert cache.get_sections('display interface', 'sep') is None
+
+
+def test_invalidate(clock):
+    cache = CommandSnapshot(ttl=10)
+    cache.put('display interface', 'interfaces')
+    cache.put_sections('display interface', 'sep', ['a'])
+    cache.put('display arp', 'arp')
+    cache.invalidate('display interface')
+    assert cache.get('display interface') is None
+    assert cache.get_sections('display interface', 'sep') is None
+    assert cache.get('display arp') == 'arp'
+    cache.invalidate()
+    assert cache.get('display arp') is None
+
+
+def test_getters_share_the_snapshot(replayed_driver):
+    driver = replayed_driver(OUTPUTS, {'snapshot_ttl': 60})
+    interfaces = driver.get_interfaces()
+    commands = driver.device.commands
+    driver.get_interfaces_counters()
+    assert driver.get_interfaces() == interfaces
+    assert driver.device.commands == commands
+
+
+@pytest.mark.parametrize('cli_commands', [['display version'], ['dis clock', 'disp arp']])
+def test_display_commands_keep_the_snapshot(replayed_driver, cli_commands):
+    driver = replayed_driver(OUTPUTS, {'snapshot_ttl': 60})
+    driver.get_interfaces()
+    driver.cli(cli_commands)
+    commands = driver.device.commands
+    driver.get_interfaces_counters()
+    assert driver.device.commands == commands
+
+
+@pytest.mark.parametrize('cli_commands', [
+    ['reset counters interface'],
+    ['display version', 'reset counters interface'],
+])
+def test_other_commands_invalidate_the_snapshot(replayed_driver, cli_commands):
+    driver = replayed_driver(OUTPUTS, {'snapshot_ttl': 60})
+    driver.get_interfaces()
+    driver.cli(cli_commands)
+    commands = driver.device.commands
+    driver.get_interfaces_counters()
+    assert driver.device.commands == commands + 1
+
+
+def test_close_invalidates_the_snapshot(replayed_driver):
+    driver = replayed_driver(OUTPUTS, {'snapshot_ttl': 60})
+    driver.get_interfaces()
+    driver.close()
+    assert driver._snapshot.get('display interface') is None
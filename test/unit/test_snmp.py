@@ -0,0 +1,130 @@
+"""Tests for the SNMP counter backend, against a local snmpsim-style responder."""
+
+import pytest
+from napalm.base.exceptions import CommandErrorException, ConnectionException
+from napalm.base.test import helpers
+from napalm.base.test import models
+
+from napalm_h3c_cmw import parsers
+from napalm_h3c_cmw import snmp
+
+from cmw_testing import synthetic
+from cmw_testing.snmp_responder import SnmpResponder, format_snmprec, if_mib_records, parse_snmprec
+
+INTERFACES = 60
+
+
+@pytest.fixture(scope='module')
+def counters():
+    blocks = parsers.separate_sections(parsers.INTERFACE_SEPARATOR, synthetic.display_interface(INTERFACES))
+    counters = parsers.parse_interfaces_counters(blocks)
+    # wraps a 32-bit counter
+    counters['GigabitEthernet1/0/2']['rx_octets'] = 2 ** 64 - 1
+    return counters
+
+
+@pytest.fixture
+def responder(counters):
+    with SnmpResponder(if_mib_records(counters)) as responder:
+        yield responder
+
+
+@pytest.fixture
+def snmp_driver(replayed_driver):
+    """Return a function building a driver answering 'display interface' of the synthetic device."""
+    def build(optional_args):
+        outputs = {'display interface': synthetic.display_interface(INTERFACES)}
+        return replayed_driver(outputs, optional_args, hostname=synthetic.HOSTNAME)
+    return build
+
+
+def test_ber_round_trip():
+    varbinds = [
+        ((1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 6, 4294967296), snmp.COUNTER64, 2 ** 64 - 1),
+        ((1, 3, 6, 1, 2, 1, 2, 2, 1, 14, 1), snmp.COUNTER32, 0),
+        ((1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 1, 1), snmp.OCTET_STRING, b'GigabitEthernet1/0/1' * 10),
+        ((1, 3, 6, 1, 2, 1, 1, 2, 0), snmp.OBJECT_IDENTIFIER, (1, 3, 6, 1, 4, 1, 25506, 1, 1)),
+        ((1, 3, 6, 1, 2, 1, 1, 9), snmp.END_OF_MIB_VIEW, None),
+    ]
+    message = snmp.encode_message(b'public', snmp.RESPONSE, 2 ** 31 - 1, varbinds, 0, 25)
+    assert snmp.decode_message(message) == (b'public', snmp.RESPONSE, 2 ** 31 - 1, 0, 25, varbinds)
+
+
+def test_snmprec_round_trip(counters):
+    records = if_mib_records(counters)
+    assert parse_snmprec(format_snmprec(records)) == records
+
+
+@pytest.mark.parametrize('max_size', [1472, 300])
+def test_get_interfaces_counters(counters, max_size):
+    with SnmpResponder(if_mib_records(counters), max_size=max_size) as responder:
+        backend = snmp.SnmpCounterBackend('127.0.0.1', port=responder.port, timeout=1)
+        result = backend.get_interfaces_counters()
+        assert result == counters
+        for counter in result.values():
+            assert helpers.test_model(models.interface_counters, counter)
+
+        requests = responder.requests
+        backend.get_interfaces_counters()
+        # ifName is not walked again
+        assert responder.requests - requests < requests
+
+
+def test_unknown_community(counters):
+    with SnmpResponder(if_mib_records(counters), community='private') as responder:
+        backend = snmp.SnmpCounterBackend('127.0.0.1', port=responder.port, timeout=0.2, retries=0)
+        with pytest.raises(ConnectionException):
+            backend.get_interfaces_counters()
+
+
+class LoopingResponder(SnmpResponder):
+    """Agent answering the ifName of ifIndex 3 with the OID asked for, or with the first ifName when back."""
+
+    def __init__(self, records, back=False):
+        super(LoopingResponder, self).__init__(records)
+        self.back = back
+
+    def _next(self, oid):
+        if oid == snmp.IF_NAME + (3,):
+            return self.records[self._oids.index(snmp.IF_NAME + (1,))] if self.back else self._get(oid)
+        return super(LoopingResponder, self)._next(oid)
+
+
+@pytest.mark.parametrize('back', [False, True])
+def test_walk_not_increasing(counters, back):
+    with LoopingResponder(if_mib_records(counters), back=back) as responder:
+        client = snmp.SnmpClient('127.0.0.1', port=responder.port, timeout=1)
+        with pytest.raises(CommandErrorException):
+            client.bulk_walk([snmp.IF_NAME])
+        assert responder.requests == 1
+
+
+def test_driver_backend(snmp_driver, counters, responder):
+    driver = snmp_driver({'counters_backend': 'snmp', 'snmp_port': responder.port})
+    assert driver.get_interfaces_counters() == counters
+    assert driver.device.commands == 0
+
+
+def test_driver_falls_back_to_cli(snmp_driver, counters):
+    with SnmpResponder(if_mib_records(counters), community='private') as responder:
+        driver = snmp_driver({'counters_backend': 'snmp', 'snmp_port': responder.port, 'snmp_timeout': 0.2})
+        result = driver.get_interfaces_counters()
+    assert isinstance(driver.counters_backend_error, ConnectionException)
+    assert driver.device.commands > 0
+    assert result['GigabitEthernet1/0/3'] == counters['GigabitEthernet1/0/3']
+
+
+def test_driver_falls_back_on_agent_error(snmp_driver, counters):
+    with LoopingResponder(if_mib_records(counters)) as responder:
+        driver = snmp_driver({'counters_backend': 'snmp', 'snmp_port': responder.port})
+        result = driver.get_interfaces_counters()
+    assert isinstance(driver.counters_backend_error, CommandErrorException)
+    assert result['GigabitEthernet1/0/3'] == counters['GigabitEthernet1/0/3']
+
+
+def test_close_closes_the_socket(snmp_driver, counters, responder):
+    driver = snmp_driver({'counters_backend': 'snmp', 'snmp_port': responder.port})
+    driver.get_interfaces_counters()
+    assert driver.counters_backend.client._socket is not None
+    driver.close()
+    assert driver.counters_backend.client._socket is None
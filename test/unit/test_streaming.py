@@ -0,0 +1,77 @@
+"""Tests for the MAC and ARP tables streamed from a replayed session."""
+
+import time
+
+import pytest
+
+from napalm_h3c_cmw import parsers
+
+from cmw_testing import synthetic
+from cmw_testing.replay import ReplayConnection
+
+OUTPUTS = synthetic.device_outputs(interfaces=4, mac_addresses=200, arp_entries=150)
+
+MORE = '  ---- More ----\x1b[16D                \x1b[16D'
+
+
+ARP_TABLE = parsers.parse_arp_table(OUTPUTS['display arp'])
+MAC_ADDRESS_TABLE = parsers.parse_mac_address_table(OUTPUTS['display mac-address'])
+
+
+class PagedReplay(ReplayConnection):
+    """Replayed session with the pager on, page_lines lines per page."""
+
+    def __init__(self, outputs, page_lines=24, **kwargs):
+        super(PagedReplay, self).__init__(outputs, **kwargs)
+        self.page_lines = page_lines
+        self.pages = []
+
+    def write_channel(self, out_data):
+        if out_data == ' ':
+            self._queue_page()
+            return
+        super(PagedReplay, self).write_channel(out_data)
+        # split the answer just queued into pages, each but the last ending with the pager prompt
+        data = self.pending.pop()[1]
+        lines = data[:-len(self.prompt())].splitlines(True)
+        self.pages = [''.join(lines[start:start + self.page_lines])
+                      for start in range(0, len(lines), self.page_lines)]
+        self._queue_page()
+
+    def _queue_page(self):
+        page = self.pages.pop(0)
+        self.pending.append([time.time(), page + (MORE if self.pages else self.prompt()), 0])
+
+
+@pytest.mark.parametrize('byte_delay', [0, 2e-6])
+def test_tables_match_the_parsers(replayed_driver, byte_delay):
+    # with a byte delay the output arrives in chunks cut anywhere in a line
+    driver = replayed_driver(OUTPUTS, byte_delay=byte_delay)
+    assert list(driver.iter_arp_table()) == ARP_TABLE
+    assert list(driver.iter_mac_address_table()) == MAC_ADDRESS_TABLE
+    assert driver.get_arp_table() == ARP_TABLE
+    assert driver.get_mac_address_table() == MAC_ADDRESS_TABLE
+
+
+def test_pages_answered(replayed_driver):
+    device = PagedReplay(OUTPUTS, page_lines=24)
+    driver = replayed_driver(device=device)
+    driver._paging_disabled = False
+    assert driver.get_mac_address_table() == MAC_ADDRESS_TABLE
+    assert driver.get_arp_table() == ARP_TABLE
+    assert not device.pages
+
+
+def test_early_exit_drains_the_output(replayed_driver):
+    driver = replayed_driver(OUTPUTS, byte_delay=2e-6)
+    entries = driver.iter_mac_address_table()
+    assert [next(entries) for _ in range(3)] == MAC_ADDRESS_TABLE[:3]
+    entries.close()
+    # the next command reads its own output, not the rest of the table
+    output = driver.cli(['display version'])['display version']
+    assert output.strip() == OUTPUTS['display version'].strip()
+
+
+def test_empty_table(replayed_driver):
+    driver = replayed_driver({'display arp': ''})
+    assert driver.get_arp_table() == []
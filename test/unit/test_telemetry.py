@@ -0,0 +1,130 @@
+"""Tests for the dial-out telemetry collector, fed by a local stand-in device."""
+
+import time
+
+import pytest
+from napalm.base.exceptions import ConnectionException
+from napalm.base.test import helpers
+from napalm.base.test import models
+
+from napalm_h3c_cmw import parsers
+from napalm_h3c_cmw import telemetry
+
+from cmw_testing import synthetic
+from cmw_testing.telemetry_sender import TelemetrySender, statistics_tables
+
+INTERFACES = 60
+
+TABLES = {
+    'Ifmgr/Interfaces/Interface': [
+        {'IfIndex': 1, 'Name': 'GigabitEthernet1/0/1', 'AbbreviatedName': 'GE1/0/1', 'Description': 'uplink',
+         'AdminStatus': 1, 'OperStatus': 1, 'ActualSpeed': 1000000, 'MAC': '00-E0-FC-01-00-01', 'MTU': 1500},
+        {'IfIndex': 2, 'Name': 'GigabitEthernet1/0/2', 'AbbreviatedName': 'GE1/0/2', 'AdminStatus': 2,
+         'OperStatus': 2, 'MAC': '00-E0-FC-01-00-02', 'MTU': 1500},
+    ],
+    'Ifmgr/Statistics/Interface': [
+        {'IfIndex': 1, 'Name': 'GigabitEthernet1/0/1', 'InOctets': 6400, 'InUcastPkts': 90, 'InDiscards': 2,
+         'InErrors': 1, 'OutOctets': 3200, 'OutUcastPkts': 45, 'OutDiscards': 0, 'OutErrors': 0},
+    ],
+    'Ifmgr/EthPortStatistics/Interface': [
+        {'IfIndex': 1, 'InBrdcastPkts': 4, 'InMulticastPkts': 6, 'OutBrdcastPkts': 2, 'OutMulticastPkts': 3},
+    ],
+}
+
+
+@pytest.fixture
+def collector():
+    with telemetry.TelemetryCollector(host='127.0.0.1', port=0, max_workers=4) as collector:
+        yield collector
+
+
+def send(collector, device_name, *samples):
+    with TelemetrySender('127.0.0.1:{}'.format(collector.port), device_name) as sender:
+        return sender.send(list(samples))
+
+
+def test_dialout_msg_round_trip():
+    message = {'producer_name': 'H3C', 'device_name': u'core-1é', 'device_model': 'S6850-56HF',
+               'sensor_path': 'ifmgr/statistics', 'json_data': '{"notification": {}}' + ' ' * 300}
+    data = telemetry.encode_dialout_msg(message)
+    assert telemetry.decode_dialout_msg(data) == message
+    # unknown varint field
+    assert telemetry.decode_dialout_msg(data + b'\x20\x96\x01') == message
+    with pytest.raises(ValueError):
+        telemetry.decode_fields(data[:-1])
+
+
+def test_view_answers_getters(collector):
+    assert send(collector, 'core-1', TABLES) == 'ok'
+    view = collector.device('core-1')
+    assert collector.devices() == ['core-1']
+    assert view.model == 'S5560-30C-EI'
+
+    interfaces = view.get_interfaces()
+    assert interfaces['GigabitEthernet1/0/1'] == {
+        'description': 'uplink', 'is_enabled': True, 'is_up': True, 'last_flapped': -1.0,
+        'mac_address': '00:E0:FC:01:00:01', 'mtu': 1500, 'speed': 1000}
+    assert not interfaces['GigabitEthernet1/0/2']['is_enabled']
+    for interface in interfaces.values():
+        assert helpers.test_model(models.interface, interface)
+
+    counters = view.get_interfaces_counters()
+    assert counters['GigabitEthernet1/0/1']['rx_octets'] == 6400
+    assert counters['GigabitEthernet1/0/1']['tx_multicast_packets'] == 3
+    assert helpers.test_model(models.interface_counters, counters['GigabitEthernet1/0/1'])
+
+    # the stream came from the loopback, the view is found by address too
+    assert collector.device('127.0.0.1') is view
+
+
+def test_samples_update_the_view(collector):
+    counters = parsers.parse_interfaces_counters(
+        parsers.separate_sections(parsers.INTERFACE_SEPARATOR, synthetic.display_interface(INTERFACES)))
+    later = dict((name, dict(counter, rx_octets=counter['rx_octets'] + 1000)) for name, counter in counters.items())
+    send(collector, 'access-1', statistics_tables(counters), statistics_tables(later))
+    assert collector.messages == 4
+    assert collector.device('access-1').get_interfaces_counters() == later
+
+    # on-change rows carry only the columns that changed
+    collector.device('access-1').update(telemetry.STATISTICS, [{'IfIndex': 1, 'InOctets': 1}])
+    assert collector.device('access-1').get_interfaces_counters()[sorted(counters)[0]]['rx_octets'] == 1
+
+
+def test_stale_view(collector):
+    view = collector.device('core-1')
+    with pytest.raises(ConnectionException):
+        view.get_interfaces()
+    view.update(telemetry.INTERFACES, TABLES['Ifmgr/Interfaces/Interface'], received=0)
+    with pytest.raises(ConnectionException):
+        view.get_interfaces()
+
+
+def test_stale_rows_dropped():
+    view = telemetry.TelemetryView('core-1', max_age=60)
+    now = time.time()
+    view.update(telemetry.INTERFACES, TABLES['Ifmgr/Interfaces/Interface'], received=now - 120)
+    # GigabitEthernet1/0/2 was removed, only GigabitEthernet1/0/1 is still sent
+    view.update(telemetry.INTERFACES, TABLES['Ifmgr/Interfaces/Interface'][:1], received=now)
+    view.update(telemetry.STATISTICS, TABLES['Ifmgr/Statistics/Interface'], received=now)
+    # the EthPortStatistics path is no longer sent, its row goes stale with the others fresh
+    view.update(telemetry.ETH_STATISTICS, TABLES['Ifmgr/EthPortStatistics/Interface'], received=now - 120)
+    assert list(view.get_interfaces()) == ['GigabitEthernet1/0/1']
+    assert view.get_interfaces_counters()['GigabitEthernet1/0/1']['tx_multicast_packets'] == 0
+    assert list(view.tables[telemetry.INTERFACES]) == ['1']
+    assert not view.tables[telemetry.ETH_STATISTICS]
+
+
+def test_driver(replayed_driver, collector):
+    driver = replayed_driver({'display interface': synthetic.display_interface(INTERFACES)},
+                             {'telemetry': collector}, hostname=synthetic.HOSTNAME)
+
+    # nothing received yet, read from the device
+    assert len(driver.get_interfaces_counters()) == INTERFACES
+    assert isinstance(driver.telemetry_error, ConnectionException)
+    commands = driver.device.commands
+
+    send(collector, 'core-1', TABLES)
+    assert list(driver.get_interfaces_counters()) == ['GigabitEthernet1/0/1']
+    assert len(driver.get_interfaces()) == 2
+    assert list(driver.get_interfaces_counters(interfaces=['GE1/0/1'])) == ['GigabitEthernet1/0/1']
+    assert driver.device.commands == commands
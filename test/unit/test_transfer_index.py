@@ -0,0 +1,50 @@
+"""Tests for the local index of the files uploaded to devices."""
+
+import json
+
+from napalm_h3c_cmw.utils.transfer_index import TransferIndex
+
+MTIME = 'Jan 03 2020 11:22:33'
+
+
+def test_matches(tmpdir):
+    index = TransferIndex(str(tmpdir.join('index.jsonl')))
+    assert not index.matches('sw1', 'a.cfg', 10, MTIME, 'md5a')
+    index.record('sw1', 'a.cfg', 10, MTIME, 'md5a')
+    assert index.matches('sw1', 'a.cfg', 10, MTIME, 'md5a')
+    assert not index.matches('sw1', 'a.cfg', 11, MTIME, 'md5a')
+    assert not index.matches('sw1', 'a.cfg', 10, 'Jan 03 2020 11:22:34', 'md5a')
+    assert not index.matches('sw1', 'a.cfg', 10, MTIME, 'md5b')
+    assert not index.matches('sw2', 'a.cfg', 10, MTIME, 'md5a')
+
+
+def test_persisted_last_entry_wins(tmpdir):
+    path = str(tmpdir.join('sub', 'index.jsonl'))
+    index = TransferIndex(path)
+    index.record('sw1', 'a.cfg', 10, MTIME, 'md5a')
+    index.record('sw1', 'a.cfg', 12, MTIME, 'md5b')
+    reloaded = TransferIndex(path)
+    assert reloaded.get('sw1', 'a.cfg')['md5'] == 'md5b'
+    assert reloaded.matches('sw1', 'a.cfg', 12, MTIME, 'md5b')
+
+
+def test_interrupted_line_skipped(tmpdir):
+    path = tmpdir.join('index.jsonl')
+    entry = {'device': 'sw1', 'filename': 'a.cfg', 'size': 10, 'mtime': MTIME, 'md5': 'md5a'}
+    path.write(json.dumps(entry) + '\n' + json.dumps(entry)[:20])
+    index = TransferIndex(str(path))
+    assert index.matches('sw1', 'a.cfg', 10, MTIME, 'md5a')
+    index.record('sw1', 'b.cfg', 10, MTIME, 'md5b')
+    assert TransferIndex(str(path)).get('sw1', 'b.cfg') is not None
+
+
+def test_compacted_on_load(tmpdir):
+    path = str(tmpdir.join('index.jsonl'))
+    index = TransferIndex(path)
+    for size in range(300):
+        index.record('sw1', 'a.cfg', size, MTIME, 'md5')
+    with open(path) as index_file:
+        assert len(index_file.readlines()) == 300
+    assert TransferIndex(path).matches('sw1', 'a.cfg', 299, MTIME, 'md5')
+    with open(path) as index_file:
+        assert len(index_file.readlines()) == 1